@@ -0,0 +1,185 @@
+"""
+Benchmarks reprodutíveis dos caminhos críticos do backtest sobre cotações sintéticas (sem rede).
+
+Cada cenário (ativos × anos) gera cotações com semente fixa, monta as variáveis de um rompimento de
+canal Donchian e executa o ciclo de negociação do README (abertura, fechamento, stops e marcação
+diária), seguido de compute_metrics e getMetricas. São medidos a latência de cada operação do
+TradingBook, o tempo total e o pico de memória residente. Cada cenário roda em um processo novo.
+
+Uso:
+    python benchmarks/cenarios_backtest.py [--cenarios 10x1,100x5] [--gravar-baseline] [--tolerancia 0.25]
+
+Sem --gravar-baseline, os resultados são comparados com benchmarks/baselines.json (se existir) e o
+script termina com código 1 quando algum tempo piora além da tolerância ou quando o resultado da
+estratégia (saldo final e posições) difere do registrado.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARQUIVO_BASELINE = os.path.join(RAIZ, 'benchmarks', 'baselines.json')
+CENARIOS = [f'{ativos}x{anos}' for ativos in (10, 100, 500) for anos in (1, 5, 20)]
+OPERACOES = ('abrirPosicao', 'fecharPosicao', 'atualizarPatrimonio', 'getResultadoPosicoesAbertas', 'compute_metrics', 'getMetricas')
+SEMENTE = 42
+
+
+def _resumo_latencias(amostras):
+    import numpy as np
+    if not amostras:
+        return {'chamadas': 0}
+    microssegundos = np.asarray(amostras, dtype=np.float64) / 1000
+    return {
+        'chamadas': len(amostras),
+        'total_ms': float(microssegundos.sum() / 1000),
+        'media_us': float(microssegundos.mean()),
+        'p50_us': float(np.percentile(microssegundos, 50)),
+        'p95_us': float(np.percentile(microssegundos, 95)),
+    }
+
+
+def executar_cenario(nome):
+    """Executa um cenário no processo atual e retorna o dicionário de medições."""
+    import numpy as np
+    import pandas as pd
+    from pytraders.carteira import Carteira
+    from pytraders.instrumentacao import Instrumentacao
+    from pytraders.mercado_sintetico import gerar_cotacoes, montar_pregoes
+
+    ativos, anos = (int(parte) for parte in nome.split('x'))
+    inicio = time.perf_counter()
+    cotacoes = gerar_cotacoes(ativos, 252 * anos, semente=SEMENTE, falhas=0.01)
+    pregoes = montar_pregoes(cotacoes)
+    # Variáveis da estratégia: canais Donchian do dia anterior
+    novas = {}
+    for ativo in cotacoes.columns.get_level_values('Ticker').unique():
+        novas[(ativo, 'fechamento_ontem')] = cotacoes[('Close', ativo)].shift(1)
+        novas[(ativo, 'dcHighOntem')] = cotacoes[('High', ativo)].rolling(20).max().shift(1)
+        novas[(ativo, 'dcLowOntem')] = cotacoes[('Low', ativo)].rolling(10).min().shift(1)
+    pregoes = pregoes.join(pd.DataFrame(novas, index=pregoes.index))
+    preparacao = time.perf_counter() - inicio
+
+    carteira = Carteira('SINT', pregoes.index[0], pregoes.index[-1])
+    carteira.setup_backtest(100000, 10, True, 0.0004, pregoes)
+    book = carteira.book_execucao
+    # Chamadas internas do próprio book (ex: atualizarPatrimonio dentro de abrirPosicao) também são medidas
+    instrumentacao = Instrumentacao().instrumentar(book, 'book', OPERACOES)
+
+    inicio = time.perf_counter()
+    codigos = list(carteira.cubo.ativos)
+    for pregao, dia in carteira.iterar_pregoes():
+        for ativo in codigos:
+            cotacao = dia[ativo]
+            fechamento = cotacao.Close
+            if np.isnan(fechamento) or np.isnan(cotacao.fechamento_ontem) or np.isnan(cotacao.dcHighOntem):
+                continue
+            if carteira.temPosicaoAberta(ativo):
+                stop = carteira.getStopLossPosicaoAberta(ativo)
+                if cotacao.Low <= stop:
+                    carteira.fecharPosicao(pregao, ativo, min(stop, cotacao.Open))
+                elif fechamento < cotacao.dcLowOntem:
+                    carteira.fecharPosicao(pregao, ativo, fechamento)
+            if not carteira.temPosicaoAberta(ativo) and fechamento > cotacao.dcHighOntem and cotacao.fechamento_ontem < cotacao.dcHighOntem:
+                volume = carteira.getVolumeOperacao(fechamento)
+                if volume > 0 and carteira.temSaldoLiquido(volume * fechamento) and carteira.getQuantidadePosicoesAbertas() < 10:
+                    carteira.abrirPosicao(pregao, ativo, 'BUY', volume, fechamento, fechamento / cotacao.fechamento_ontem, cotacao.dcLowOntem)
+        carteira.atualizar_patrimonio_resultado_posicoes_abertas(pregao)
+    ciclo = time.perf_counter() - inicio
+    metricas = book.compute_metrics()
+    with contextlib.redirect_stdout(io.StringIO()):
+        book.getMetricas()
+    total = time.perf_counter() - inicio
+
+    try:
+        import resource
+        # ru_maxrss: KiB no Linux, bytes no macOS
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    except ImportError:
+        pico = None
+    return {
+        'pregoes': len(pregoes),
+        'ativos': ativos,
+        'preparacao_s': preparacao,
+        'ciclo_s': ciclo,
+        'total_s': total,
+        'pico_memoria_mb': pico,
+        'saldo_final': round(metricas['saldo_atual'], 2),
+        'total_posicoes': metricas['total_posicoes'],
+        'operacoes': {operacao: _resumo_latencias(instrumentacao.latencias[f'book.{operacao}']) for operacao in OPERACOES},
+    }
+
+
+def medir(nome):
+    processo = subprocess.run([sys.executable, os.path.abspath(__file__), '--executar', nome], capture_output=True, text=True, cwd=RAIZ)
+    if processo.returncode != 0:
+        raise RuntimeError(f'Cenário {nome} falhou:\n{processo.stderr}')
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def comparar(nome, atual, referencia, tolerancia):
+    """Lista de regressões do cenário em relação à baseline."""
+    problemas = []
+    if (atual['saldo_final'], atual['total_posicoes']) != (referencia['saldo_final'], referencia['total_posicoes']):
+        problemas.append(f"{nome}: resultado da estratégia mudou ({referencia['saldo_final']}, {referencia['total_posicoes']}) -> ({atual['saldo_final']}, {atual['total_posicoes']})")
+    medidas = [('total_s', atual['total_s'], referencia['total_s'])]
+    for operacao, latencia in atual['operacoes'].items():
+        anterior = referencia['operacoes'].get(operacao, {})
+        if 'p50_us' in latencia and 'p50_us' in anterior:
+            medidas.append((f'{operacao}.p50_us', latencia['p50_us'], anterior['p50_us']))
+    for medida, valor, base in medidas:
+        if base > 0 and valor > base * (1 + tolerancia):
+            problemas.append(f'{nome}: {medida} {base:.1f} -> {valor:.1f} (+{(valor / base - 1) * 100:.0f}%)')
+    return problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks dos caminhos críticos do backtest')
+    parser.add_argument('--cenarios', default=','.join(CENARIOS), help='Cenários <ativos>x<anos> separados por vírgula')
+    parser.add_argument('--baseline', default=ARQUIVO_BASELINE, help='Arquivo JSON de baselines')
+    parser.add_argument('--gravar-baseline', action='store_true', help='Grava os resultados como nova baseline')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='Piora relativa tolerada antes de acusar regressão')
+    parser.add_argument('--executar', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executar:
+        sys.path.insert(0, RAIZ)
+        print(json.dumps(executar_cenario(args.executar)))
+        return 0
+
+    resultados = {}
+    for nome in args.cenarios.split(','):
+        resultados[nome] = medir(nome)
+        r = resultados[nome]
+        memoria = f"{r['pico_memoria_mb']:.0f} MB" if r['pico_memoria_mb'] is not None else 'n/d'
+        print(f"{nome:>7s} | {r['pregoes']:5d} pregões | total {r['total_s']:8.2f} s | ciclo {r['ciclo_s']:8.2f} s | preparação {r['preparacao_s']:6.2f} s | memória {memoria} | posições {r['total_posicoes']}")
+        for operacao, latencia in r['operacoes'].items():
+            if latencia['chamadas']:
+                print(f"          {operacao:28s} {latencia['chamadas']:8d} x | média {latencia['media_us']:9.1f} us | p50 {latencia['p50_us']:9.1f} us | p95 {latencia['p95_us']:9.1f} us")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as arquivo:
+            baselines = json.load(arquivo)
+    if args.gravar_baseline:
+        baselines.update({nome: {**r, 'maquina': platform.node(), 'python': platform.python_version()} for nome, r in resultados.items()})
+        with open(args.baseline, 'w') as arquivo:
+            json.dump(baselines, arquivo, indent=1, sort_keys=True)
+        print(f'Baseline gravada em {args.baseline}')
+        return 0
+
+    problemas = [problema for nome, r in resultados.items() if nome in baselines for problema in comparar(nome, r, baselines[nome], args.tolerancia)]
+    for problema in problemas:
+        print('REGRESSÃO', problema)
+    if not any(nome in baselines for nome in resultados):
+        print('Sem baseline para comparação (use --gravar-baseline).')
+    return 1 if problemas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
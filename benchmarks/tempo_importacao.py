@@ -0,0 +1,65 @@
+"""
+Mede o tempo de importação do caminho principal de backtest (TradingBook e motores) e verifica o
+orçamento: nenhuma dependência pesada opcional pode ser carregada e os tempos devem ficar abaixo
+dos limites informados. Cada medição roda em um processo novo, com 'python -X importtime'.
+
+Uso:
+    python benchmarks/tempo_importacao.py [--orcamento-ms 750] [--orcamento-pytraders-ms 50] [--repeticoes 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Dependências que só podem ser carregadas pelas funcionalidades que as utilizam
+DEPENDENCIAS_SOB_DEMANDA = ('yfinance', 'selenium', 'matplotlib', 'chromedriver_autoinstaller', 'ta')
+
+ALVOS = {
+    'pacote': 'import pytraders',
+    'backtest': 'from pytraders import TradingBook',
+}
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def medir(codigo):
+    """Executa 'codigo' em um processo novo e retorna (tempo total em ms, tempo próprio do pytraders em ms, módulos pesados carregados)."""
+    verificacao = f"{codigo}; import sys, json; print(json.dumps([m for m in {DEPENDENCIAS_SOB_DEMANDA!r} if m in sys.modules]))"
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', verificacao], capture_output=True, text=True, cwd=RAIZ, check=True)
+    total_us = 0
+    proprio_us = 0
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, cumulativo, modulo = linha[len('import time:'):].split('|')
+        modulo = modulo[1:]
+        # Módulos de nível zero (sem indentação) somam o tempo total da importação
+        if not modulo.startswith(' '):
+            total_us += int(cumulativo)
+        if modulo.strip().startswith('pytraders'):
+            proprio_us += int(proprio)
+    return total_us / 1000, proprio_us / 1000, json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Orçamento de tempo de importação do pytraders')
+    parser.add_argument('--orcamento-ms', type=float, default=750.0, help='Tempo total máximo de importação do caminho de backtest')
+    parser.add_argument('--orcamento-pytraders-ms', type=float, default=50.0, help='Tempo máximo gasto nos módulos do próprio pytraders')
+    parser.add_argument('--repeticoes', type=int, default=5, help='Medições por alvo (vale a mediana)')
+    args = parser.parse_args()
+
+    dentro_do_orcamento = True
+    for nome, codigo in ALVOS.items():
+        medicoes = sorted(medir(codigo)[:2] for _ in range(args.repeticoes))
+        total_ms, proprio_ms = medicoes[len(medicoes) // 2]
+        carregados = medir(codigo)[2]
+        print(f'{nome:10s} total: {total_ms:8.1f} ms | pytraders: {proprio_ms:6.1f} ms | dependências pesadas: {carregados or "nenhuma"}')
+        if carregados or total_ms > args.orcamento_ms or proprio_ms > args.orcamento_pytraders_ms:
+            dentro_do_orcamento = False
+    print('Dentro do orçamento' if dentro_do_orcamento else 'Fora do orçamento')
+    return 0 if dentro_do_orcamento else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
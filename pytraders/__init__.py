@@ -1,15 +1,30 @@
-from .carteira import Carteira
+# Carteira e TradingBook são importados sob demanda (PEP 562): 'import pytraders' não carrega
+# pandas, yfinance, selenium ou matplotlib, e nenhuma dependência pesada é carregada antes do uso.
+_EXPORTACOES = {
+    'Carteira': '.carteira',
+    'TradingBook': '.trading_book',
+}
+
+
+def __getattr__(nome):
+    if nome in _EXPORTACOES:
+        import importlib
+        valor = getattr(importlib.import_module(_EXPORTACOES[nome], __name__), nome)
+        globals()[nome] = valor
+        return valor
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTACOES))
 
-import os
-import subprocess
-import sys
-import chromedriver_autoinstaller
 
 def install_system_dependencies():
     """
     Tenta instalar o Google Chrome em ambiente Linux (Debian/Ubuntu/Colab).
     Requer permissões de root/sudo.
     """
+    import subprocess
     print("Verificando e instalando dependências do sistema (Google Chrome)...")
     
     # Comandos que você usava no Colab
@@ -27,6 +42,7 @@ def install_system_dependencies():
         
         # Instala/Atualiza o driver
         print("Configurando ChromeDriver...")
+        import chromedriver_autoinstaller
         chromedriver_autoinstaller.install()
         print("Ambiente pronto para uso.")
         
@@ -0,0 +1,42 @@
+import numpy as np
+
+
+def maiores(pontuacao, quantidade):
+    """
+    Posições dos 'quantidade' maiores valores de 'pontuacao', em ordem decrescente; empates mantêm a
+    ordem original (como a ordenação estável de executar_sinais). A seleção é parcial (np.partition,
+    O(n)) e apenas os escolhidos são ordenados.
+
+    Parâmetros:
+    pontuacao (np.ndarray): pontuações sem NaN.
+    quantidade (int): quantidade de posições desejada.
+
+    Retorna:
+    np.ndarray: posições em 'pontuacao'.
+    """
+    n = len(pontuacao)
+    if quantidade <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if quantidade >= n:
+        return np.argsort(-pontuacao, kind='stable')
+    # k-ésimo maior valor; os empatados com ele entram todos antes do corte para preservar a ordem original
+    limite = np.partition(pontuacao, n - quantidade)[n - quantidade]
+    escolhidos = np.flatnonzero(pontuacao >= limite)
+    return escolhidos[np.argsort(-pontuacao[escolhidos], kind='stable')][:quantidade]
+
+
+def dimensionar(precos, saldo, capital_inicial, diversificacao_maxima, reinvestir_lucros):
+    """
+    Volumes (lotes de 100) de uma entrada em cada preço, pelas regras de TradingBook.getVolumeOperacao:
+    saldo / diversificacao_maxima com reinvestimento dos lucros ou saldo abaixo do capital inicial,
+    senão capital_inicial / diversificacao_maxima. Preços não positivos ou ausentes resultam em zero.
+    """
+    precos = np.asarray(precos, dtype=np.float64)
+    if reinvestir_lucros or (saldo < capital_inicial):
+        valor_operacao = saldo / diversificacao_maxima
+    else:
+        valor_operacao = capital_inicial / diversificacao_maxima
+    validos = precos > 0
+    volumes = np.zeros(len(precos), dtype=np.int64)
+    volumes[validos] = 100 * np.trunc(valor_operacao / 100 / precos[validos]).astype(np.int64)
+    return volumes
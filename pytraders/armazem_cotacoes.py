@@ -0,0 +1,226 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from .cache_cotacoes import CAMPOS_COTACAO
+from .cubo_pregoes import CuboPregoes
+
+# Tipo de armazenamento de cada campo; volume ausente é gravado como -1
+TIPOS_CAMPOS = {'Close': np.float32, 'High': np.float32, 'Low': np.float32, 'Open': np.float32, 'Volume': np.int64}
+VOLUME_AUSENTE = -1
+
+
+class ArmazemCotacoes:
+    """
+    Armazém compacto de cotações de um intervalo ('1d', '5m', ...): um índice de datas comum a todos os
+    ativos (datas.npy) e um arquivo por ativo e campo (<ticker>.<campo>.npy), em float32 para os preços
+    e int64 para o volume. Os arquivos são abertos mapeados em memória, somente leitura, de modo que
+    vários processos de backtest compartilham as mesmas páginas sem cópia.
+
+    Parâmetros:
+    diretorio (str): raiz do armazém (um subdiretório por intervalo).
+    intervalo (str): intervalo das cotações.
+    """
+
+    def __init__(self, diretorio, intervalo='1d'):
+        self.intervalo = intervalo
+        self.diretorio = os.path.join(diretorio, intervalo)
+        self.__datas = None
+        self.__indice = None
+        self.__colunas = {}
+
+    @property
+    def indice(self):
+        # {'tickers': [...]}: ativos presentes no armazém, na ordem de inclusão
+        if self.__indice is None:
+            caminho = os.path.join(self.diretorio, 'indice.json')
+            if os.path.exists(caminho):
+                with open(caminho) as arquivo:
+                    self.__indice = json.load(arquivo)
+            else:
+                self.__indice = {'tickers': []}
+        return self.__indice
+
+    @property
+    def tickers(self):
+        return list(self.indice['tickers'])
+
+    @property
+    def datas(self):
+        """Índice de datas comum (datetime64[ns]), mapeado em memória."""
+        if self.__datas is None:
+            caminho = os.path.join(self.diretorio, 'datas.npy')
+            self.__datas = np.load(caminho, mmap_mode='r') if os.path.exists(caminho) else np.array([], dtype='datetime64[ns]')
+        return self.__datas
+
+    def __len__(self):
+        return len(self.datas)
+
+    def __caminho(self, ticker, campo):
+        return os.path.join(self.diretorio, f'{ticker}.{campo}.npy')
+
+    def __gravar_array(self, caminho, array):
+        # Substituição atômica: outros processos podem estar com a versão anterior mapeada
+        np.save(caminho + '.tmp.npy', array)
+        os.replace(caminho + '.tmp.npy', caminho)
+
+    def coluna(self, ticker, campo):
+        """Array mapeado em memória (somente leitura) do campo do ativo, alinhado a 'datas'."""
+        chave = (ticker, campo)
+        if chave not in self.__colunas:
+            self.__colunas[chave] = np.load(self.__caminho(ticker, campo), mmap_mode='r')
+        return self.__colunas[chave]
+
+    def linhas(self, inicio=None, fim=None):
+        """Intervalo de linhas [a, b) das datas em [inicio, fim)."""
+        datas = self.datas
+        a = 0 if inicio is None else int(np.searchsorted(datas, pd.Timestamp(inicio).to_datetime64(), side='left'))
+        b = len(datas) if fim is None else int(np.searchsorted(datas, pd.Timestamp(fim).to_datetime64(), side='left'))
+        return a, b
+
+    def matriz(self, campo, tickers=None, linhas=None, dtype=np.float64):
+        """
+        Matriz (datas × ativos) do campo, com NaN nas cotações ausentes. 'linhas' é um intervalo (a, b)
+        de posições; apenas esse trecho de cada arquivo é lido.
+        """
+        tickers = self.tickers if tickers is None else list(tickers)
+        a, b = linhas if linhas is not None else (0, len(self.datas))
+        resultado = np.empty((b - a, len(tickers)), dtype=dtype)
+        for j, ticker in enumerate(tickers):
+            valores = self.coluna(ticker, campo)[a:b]
+            if campo == 'Volume':
+                resultado[:, j] = np.where(valores == VOLUME_AUSENTE, np.nan, valores)
+            else:
+                resultado[:, j] = valores
+        return resultado
+
+    def gravar(self, cotacoes):
+        """
+        Incorpora cotações no formato de Carteira.cotacoes (colunas (Price, Ticker)). O índice comum passa
+        a ser a união das datas; para datas já existentes, os valores novos (não ausentes) prevalecem.
+        """
+        novas_datas = pd.DatetimeIndex(cotacoes.index)
+        if novas_datas.tz is not None:
+            novas_datas = novas_datas.tz_convert('UTC').tz_localize(None)
+        novas_datas = novas_datas.as_unit('ns').to_numpy()
+        antigas = np.asarray(self.datas)
+        datas = np.union1d(antigas, novas_datas)
+        os.makedirs(self.diretorio, exist_ok=True)
+        tickers = self.tickers
+        novos_tickers = list(dict.fromkeys(cotacoes.columns.get_level_values(1)))
+        destino_antigas = np.searchsorted(datas, antigas)
+        destino_novas = np.searchsorted(datas, novas_datas)
+        for ticker in dict.fromkeys(tickers + novos_tickers):
+            for campo, tipo in TIPOS_CAMPOS.items():
+                if ticker not in novos_tickers and datas.size == antigas.size:
+                    continue
+                vazio = VOLUME_AUSENTE if campo == 'Volume' else np.nan
+                valores = np.full(datas.size, vazio, dtype=tipo)
+                if ticker in tickers:
+                    valores[destino_antigas] = self.coluna(ticker, campo)
+                if ticker in novos_tickers and (campo, ticker) in cotacoes.columns:
+                    novos = cotacoes[(campo, ticker)].to_numpy(dtype=np.float64)
+                    presentes = ~np.isnan(novos)
+                    valores[destino_novas[presentes]] = novos[presentes].astype(tipo)
+                self.__gravar_array(self.__caminho(ticker, campo), valores)
+        self.__colunas = {}
+        self.__gravar_array(os.path.join(self.diretorio, 'datas.npy'), datas)
+        self.__datas = None
+        self.indice['tickers'] = list(dict.fromkeys(tickers + novos_tickers))
+        temporario = os.path.join(self.diretorio, 'indice.json.tmp')
+        with open(temporario, 'w') as arquivo:
+            json.dump(self.indice, arquivo, indent=1)
+        os.replace(temporario, os.path.join(self.diretorio, 'indice.json'))
+
+    def importar(self, cache_cotacoes, tickers, inicio, fim, bloco=50):
+        """
+        Copia para o armazém as cotações de [inicio, fim) obtidas pelo CacheCotacoes (que deve ser do mesmo
+        intervalo), em blocos de 'bloco' ativos para limitar a memória do DataFrame intermediário.
+        """
+        if cache_cotacoes.intervalo != self.intervalo:
+            raise ValueError(f'Intervalo do cache ({cache_cotacoes.intervalo}) difere do armazém ({self.intervalo}).')
+        tickers = list(tickers)
+        for i in range(0, len(tickers), bloco):
+            self.gravar(cache_cotacoes.carregar(tickers[i:i + bloco], inicio, fim))
+
+    def pregoes(self, tickers=None, inicio=None, fim=None):
+        """Adaptador no formato de Carteira.pregoes sobre o trecho [inicio, fim), sem montar o DataFrame."""
+        return PregoesArmazem(self, self.tickers if tickers is None else list(tickers), *self.linhas(inicio, fim))
+
+
+class PregoesArmazem:
+    """
+    Visão de um ArmazemCotacoes no formato de Carteira.pregoes (colunas (ativo, campo)), aceita por
+    setup_backtest. Suporta o que a carteira e os books consultam: index, columns, len, xs(campo, axis=1,
+    level=1), iloc com fatias de linhas e at[pregao, (ativo, campo)]. Apenas o campo consultado é lido
+    dos arquivos mapeados, e o cubo é montado diretamente dos arrays.
+
+    Operações que exigem um DataFrame completo (anexar_pregoes, varredura em processos) devem usar to_frame().
+    """
+
+    def __init__(self, armazem, tickers, inicio, fim):
+        self.armazem = armazem
+        self.tickers = tickers
+        self.inicio = inicio
+        self.fim = fim
+        self.index = pd.DatetimeIndex(np.asarray(armazem.datas[inicio:fim]), name='Date')
+        self.columns = pd.MultiIndex.from_product([tickers, CAMPOS_COTACAO], names=['Ticker', 'Price'])
+
+    def __len__(self):
+        return self.fim - self.inicio
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columns))
+
+    def xs(self, chave, axis=1, level=1):
+        if axis != 1 or level != 1:
+            raise ValueError("PregoesArmazem suporta apenas xs(campo, axis=1, level=1).")
+        valores = self.armazem.matriz(chave, self.tickers, (self.inicio, self.fim))
+        return pd.DataFrame(valores, index=self.index, columns=pd.Index(self.tickers, name='Ticker'))
+
+    @property
+    def iloc(self):
+        return _FatiadorLinhas(self)
+
+    @property
+    def at(self):
+        return _AcessoCelula(self)
+
+    def cubo(self):
+        """CuboPregoes (pregões × ativos × campos) montado diretamente dos arquivos."""
+        valores = np.stack([self.armazem.matriz(campo, self.tickers, (self.inicio, self.fim)) for campo in CAMPOS_COTACAO], axis=2)
+        return CuboPregoes.de_arrays(self.index, self.tickers, CAMPOS_COTACAO, valores)
+
+    def to_frame(self):
+        """DataFrame (pregões × (ativo, campo)) equivalente, em float64."""
+        valores = np.stack([self.armazem.matriz(campo, self.tickers, (self.inicio, self.fim)) for campo in CAMPOS_COTACAO], axis=2)
+        return pd.DataFrame(valores.reshape(len(self), -1), index=self.index, columns=self.columns)
+
+    def linha(self, data):
+        return self.index.get_loc(data)
+
+
+class _FatiadorLinhas:
+    def __init__(self, pregoes):
+        self.pregoes = pregoes
+
+    def __getitem__(self, chave):
+        if not isinstance(chave, slice) or chave.step not in (None, 1):
+            raise TypeError("PregoesArmazem.iloc aceita apenas fatias contíguas de linhas.")
+        a, b, _ = chave.indices(len(self.pregoes))
+        pregoes = self.pregoes
+        return PregoesArmazem(pregoes.armazem, pregoes.tickers, pregoes.inicio + a, pregoes.inicio + max(a, b))
+
+
+class _AcessoCelula:
+    def __init__(self, pregoes):
+        self.pregoes = pregoes
+
+    def __getitem__(self, chave):
+        data, (ativo, campo) = chave
+        pregoes = self.pregoes
+        valor = pregoes.armazem.coluna(ativo, campo)[pregoes.inicio + pregoes.linha(data)]
+        if campo == 'Volume':
+            return np.nan if valor == VOLUME_AUSENTE else float(valor)
+        return float(valor)
@@ -0,0 +1,116 @@
+import contextlib
+import numpy as np
+
+
+def _matriz(valores, datas, ativos, preenchimento, dtype=np.float64):
+    # Alinha um DataFrame (datas × ativos) ou um escalar aos pregões e ativos do backtest
+    if valores is None:
+        return None
+    if np.isscalar(valores):
+        return np.full((len(datas), len(ativos)), valores, dtype=dtype)
+    return valores.reindex(index=datas, columns=ativos).fillna(preenchimento).to_numpy(dtype=dtype)
+
+
+def executar_sinais(carteira, entradas, saidas, precos=None, stop_loss=None, stop_gain=None, prioridade=None, forca_relativa=None, tipo='BUY', pendentes=False, universo=None,
+                    avaliar_stops=False, ajuste_stop_loss=None, trailing=None, consolidar_patrimonio=False):
+    """
+    Executa o backtest a partir de matrizes booleanas de sinais (pregões × ativos), sobre uma Carteira
+    já configurada com setup_backtest.
+
+    O resultado (posicoes, operacoes e patrimonio) é idêntico ao do ciclo orientado a eventos abaixo,
+    mas as condições de cada pregão são avaliadas em arrays e só os ativos com sinal são visitados:
+
+        for pregao in carteira.pregoes.index:
+            if avaliar_stops:
+                carteira.avaliar_stops(pregao, ajuste_stop_loss[pregao], trailing)
+            for ativo in ativos (ordem da prioridade decrescente ou das colunas de 'entradas'):
+                if preço indisponível ou <= 0: continue
+                if carteira.temPosicaoAberta(ativo) and saidas[pregao, ativo]:
+                    carteira.fecharPosicao(pregao, ativo, preco)
+                if not carteira.temPosicaoAberta(ativo) and entradas[pregao, ativo] and universo[pregao, ativo]:
+                    volume = carteira.getVolumeOperacao(preco)
+                    if volume > 0 and carteira.temSaldoLiquido(volume * preco) and carteira.getQuantidadePosicoesAbertas() < diversificacao_maxima:
+                        carteira.abrirPosicao(pregao, ativo, tipo, volume, preco, forca_relativa, stop_loss, stop_gain)
+            carteira.atualizar_patrimonio_resultado_posicoes_abertas(pregao)
+
+    Parâmetros:
+    carteira (Carteira): carteira com setup_backtest realizado.
+    entradas, saidas (pd.DataFrame): sinais booleanos indexados pelos pregões, uma coluna por ativo.
+    precos (pd.DataFrame ou str): preços de negociação (datas × ativos) ou o campo de pregoes a usar. Padrão: 'Close'.
+    stop_loss, stop_gain (pd.DataFrame): stops registrados nas posições abertas em cada pregão.
+    prioridade (pd.DataFrame): pontuação que ordena os ativos dentro do pregão (maior primeiro).
+    forca_relativa (pd.DataFrame): valor gravado em 'forcaRelativa'. Padrão: a prioridade, se informada.
+    tipo (str): 'BUY' ou 'SELL'.
+    pendentes (bool): percorre apenas os pregões posteriores ao último processado (retomada após anexar_pregoes).
+    universo (pd.DataFrame): máscara booleana de pertinência ao índice; entradas só ocorrem em ativos pertencentes
+        no pregão, enquanto saídas continuam permitidas. Padrão: sem restrição.
+    avaliar_stops (bool): no início de cada pregão, fecha as posições cujos stops foram atingidos (Carteira.avaliar_stops).
+    ajuste_stop_loss (pd.DataFrame): stops candidatos por pregão; apertam o stop loss das posições abertas.
+    trailing (float): stop móvel como fração da máxima (BUY) ou da mínima (SELL) do pregão.
+    consolidar_patrimonio (bool): executa cada pregão em um lote de ordens (Carteira.lote), gravando um único
+        registro de patrimônio por pregão. Posições, operações e saldo final são os mesmos; o patrimônio deixa
+        de ter os registros intermediários de cada ordem.
+    """
+    pregoes = carteira.pregoes
+    datas = carteira.pregoes_pendentes() if pendentes else pregoes.index
+    ativos = list(entradas.columns)
+    book = carteira.book_execucao
+    diversificacao_maxima = book.diversificacao_maxima
+
+    sinal_entrada = _matriz(entradas, datas, ativos, False, bool)
+    sinal_saida = _matriz(saidas, datas, ativos, False, bool)
+    if universo is not None:
+        sinal_entrada = sinal_entrada & _matriz(universo, datas, ativos, False, bool)
+    if precos is None or isinstance(precos, str):
+        precos = pregoes.iloc[len(pregoes) - len(datas):].xs(precos or 'Close', axis=1, level=1)
+    preco = _matriz(precos, datas, ativos, np.nan)
+    negociavel = np.isfinite(preco) & (preco > 0)
+    stops_loss = _matriz(stop_loss, datas, ativos, np.nan)
+    stops_gain = _matriz(stop_gain, datas, ativos, np.nan)
+    forca = _matriz(forca_relativa if forca_relativa is not None else prioridade, datas, ativos, np.nan)
+    # Ordem de visita dos ativos em cada pregão (ordenação estável: empates mantêm a ordem das colunas)
+    ordem = np.argsort(-_matriz(prioridade, datas, ativos, -np.inf), axis=1, kind='stable') if prioridade is not None else None
+
+    ajuste = _matriz(ajuste_stop_loss, datas, ativos, np.nan)
+    indices = {ativo: j for j, ativo in enumerate(ativos)}
+
+    # Estado das posições abertas espelhado em array (a carteira pode já ter posições de execuções anteriores)
+    aberta = np.array([carteira.temPosicaoAberta(ativo) for ativo in ativos], dtype=bool)
+
+    for i, pregao in enumerate(datas):
+        with (carteira.lote() if consolidar_patrimonio else contextlib.nullcontext()):
+            if avaliar_stops:
+                novos = None
+                if ajuste is not None:
+                    novos = {ativo: ajuste[i, indices[ativo]] for ativo in carteira.book_referencia.posicoes_abertas if ativo in indices}
+                for ativo in carteira.avaliar_stops(pregao, novos, trailing):
+                    if ativo in indices:
+                        aberta[indices[ativo]] = False
+            candidatas_saida = sinal_saida[i] & negociavel[i] & aberta
+            candidatas_entrada = sinal_entrada[i] & negociavel[i] & (~aberta | candidatas_saida)
+            if (candidatas_entrada.any() and not candidatas_saida.any()
+                    and carteira.getQuantidadePosicoesAbertas() >= diversificacao_maxima):
+                # Sem vagas e sem saídas no pregão: nenhuma entrada seria aceita
+                candidatas_entrada[:] = False
+            eventos = candidatas_saida | candidatas_entrada
+            if eventos.any():
+                colunas = ordem[i][eventos[ordem[i]]] if ordem is not None else np.flatnonzero(eventos)
+                for j in colunas:
+                    ativo = ativos[j]
+                    preco_negociacao = preco[i, j]
+                    if candidatas_saida[j]:
+                        carteira.fecharPosicao(pregao, ativo, preco_negociacao)
+                        aberta[j] = False
+                    if candidatas_entrada[j] and not aberta[j]:
+                        volume = carteira.getVolumeOperacao(preco_negociacao)
+                        if (volume > 0 and carteira.temSaldoLiquido(volume * preco_negociacao)
+                                and carteira.getQuantidadePosicoesAbertas() < diversificacao_maxima):
+                            carteira.abrirPosicao(
+                                pregao, ativo, tipo, volume, preco_negociacao,
+                                forca[i, j] if forca is not None else np.nan,
+                                stops_loss[i, j] if stops_loss is not None else np.nan,
+                                stops_gain[i, j] if stops_gain is not None else np.nan
+                            )
+                            aberta[j] = True
+            carteira.atualizar_patrimonio_resultado_posicoes_abertas(pregao)
+    return carteira
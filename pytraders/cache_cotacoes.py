@@ -0,0 +1,228 @@
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+
+# Campos OHLCV na ordem em que o yfinance entrega as colunas
+CAMPOS_COTACAO = ['Close', 'High', 'Low', 'Open', 'Volume']
+DIRETORIO_CACHE_PADRAO = os.path.join(os.path.expanduser('~'), '.cache', 'pytraders')
+
+
+class ProvedorCotacoes(ABC):
+    """
+    Fonte de cotações usada pelo cache. Implementações retornam um dicionário ticker -> DataFrame
+    indexado pela data, com as colunas de CAMPOS_COTACAO, para o intervalo [inicio, fim).
+    """
+
+    # Indica se 'baixar' pode ser chamado simultaneamente de várias threads
+    concorrente = True
+
+    @abstractmethod
+    def baixar(self, tickers, inicio, fim, intervalo='1d', ajustado=True):
+        """Cotações de 'tickers' em [inicio, fim); tickers sem dados podem ser omitidos ou vir vazios."""
+
+
+class ProvedorYahoo(ProvedorCotacoes):
+    """Cotações do yahoo finance; os tickers B3 recebem o sufixo '.SA'."""
+
+    # yf.download guarda os resultados em estado global: chamadas simultâneas podem misturar ativos.
+    # O paralelismo fica a cargo do próprio yfinance (threads=True) dentro de cada requisição.
+    concorrente = False
+
+    def __init__(self, sufixo='.SA', progresso=True):
+        self.sufixo = sufixo
+        self.progresso = progresso
+
+    def baixar(self, tickers, inicio, fim, intervalo='1d', ajustado=True):
+        import yfinance as yf
+        simbolos = [ticker + self.sufixo for ticker in tickers]
+        cotacoes = yf.download(
+            tickers = simbolos,         # Símbolos das ações
+            start = inicio,             # Data inicial
+            end = fim,                  # Data final (exclusiva)
+            interval = intervalo,       # Intervalo (e.g., '1d', '1wk', '1mo')
+            auto_adjust = ajustado,     # Ajusta automaticamente preços para desdobramentos e dividendos
+            threads = True,             # Faz download de múltiplos ativos em paralelo
+            progress = self.progresso   # Mostra barra de progresso durante o download
+        )
+        resultado = {}
+        for ticker, simbolo in zip(tickers, simbolos):
+            if simbolo in cotacoes.columns.get_level_values(1):
+                resultado[ticker] = cotacoes.xs(simbolo, axis=1, level=1).dropna(how='all')
+        return resultado
+
+
+class ProvedorCSV(ProvedorCotacoes):
+    """
+    Cotações lidas de um diretório local com um arquivo '<ticker>.csv' por ativo, contendo a coluna
+    de data (primeira coluna) e as colunas Open, High, Low, Close e Volume. Útil em testes e em
+    execuções sem acesso à rede.
+    """
+
+    def __init__(self, diretorio, sep=','):
+        self.diretorio = diretorio
+        self.sep = sep
+
+    def baixar(self, tickers, inicio, fim, intervalo='1d', ajustado=True):
+        resultado = {}
+        for ticker in tickers:
+            caminho = os.path.join(self.diretorio, f'{ticker}.csv')
+            if not os.path.exists(caminho):
+                continue
+            dados = pd.read_csv(caminho, sep=self.sep, index_col=0, parse_dates=True).sort_index()
+            resultado[ticker] = dados.loc[(dados.index >= pd.Timestamp(inicio)) & (dados.index < pd.Timestamp(fim)), CAMPOS_COTACAO]
+        return resultado
+
+
+class CacheCotacoes:
+    """
+    Cache local e colunar de cotações por (ticker, intervalo, ajuste). Cada ativo é gravado como
+    dois arrays NumPy (datas e valores OHLCV) e um índice JSON registra o período já coberto.
+    Apenas os trechos ausentes do período solicitado são buscados no provedor.
+
+    Parâmetros:
+    diretorio (str): raiz do cache em disco.
+    provedor (ProvedorCotacoes): fonte das cotações ausentes.
+    intervalo (str): intervalo das cotações ('1d', '1wk', ...).
+    ajustado (bool): preços ajustados para proventos e desdobramentos.
+    """
+
+    def __init__(self, diretorio=None, provedor=None, intervalo='1d', ajustado=True):
+        self.provedor = provedor if provedor is not None else ProvedorYahoo()
+        self.intervalo = intervalo
+        self.ajustado = ajustado
+        self.diretorio = os.path.join(diretorio or os.path.join(DIRETORIO_CACHE_PADRAO, 'cotacoes'), f"{intervalo}_{'ajustado' if ajustado else 'bruto'}")
+        self.__trava = threading.Lock()
+        self.__indice = None
+
+    @property
+    def indice(self):
+        # Período coberto por ticker: {'TICKER': ['inicio', 'fim']}, fim exclusivo
+        if self.__indice is None:
+            caminho = os.path.join(self.diretorio, 'indice.json')
+            if os.path.exists(caminho):
+                with open(caminho) as arquivo:
+                    self.__indice = json.load(arquivo)
+            else:
+                self.__indice = {}
+        return self.__indice
+
+    def __gravar_indice(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        temporario = os.path.join(self.diretorio, 'indice.json.tmp')
+        with open(temporario, 'w') as arquivo:
+            json.dump(self.indice, arquivo, indent=1, sort_keys=True)
+        os.replace(temporario, os.path.join(self.diretorio, 'indice.json'))
+
+    def __caminhos(self, ticker):
+        return os.path.join(self.diretorio, f'{ticker}.datas.npy'), os.path.join(self.diretorio, f'{ticker}.valores.npy')
+
+    def ler(self, ticker, mmap=True):
+        """Retorna (datas datetime64[ns], valores OHLCV) do ativo em cache ou None."""
+        caminho_datas, caminho_valores = self.__caminhos(ticker)
+        if not os.path.exists(caminho_datas):
+            return None
+        modo = 'r' if mmap else None
+        return np.load(caminho_datas, mmap_mode=modo), np.load(caminho_valores, mmap_mode=modo)
+
+    def __gravar(self, ticker, datas, valores):
+        os.makedirs(self.diretorio, exist_ok=True)
+        for caminho, array in zip(self.__caminhos(ticker), (datas, valores)):
+            temporario = caminho + '.tmp.npy'
+            np.save(temporario, array)
+            os.replace(temporario, caminho)
+
+    def trechos_ausentes(self, ticker, inicio, fim):
+        """Intervalos [inicio, fim) ainda não cobertos pelo cache para o ticker."""
+        coberto = self.indice.get(ticker)
+        if coberto is None:
+            return [(inicio, fim)]
+        coberto_inicio, coberto_fim = pd.Timestamp(coberto[0]), pd.Timestamp(coberto[1])
+        # Os trechos partem da borda do período coberto para que a cobertura continue contígua
+        trechos = []
+        if inicio < coberto_inicio:
+            trechos.append((inicio, coberto_inicio))
+        if fim > coberto_fim:
+            trechos.append((coberto_fim, fim))
+        return trechos
+
+    def atualizar(self, tickers, inicio, fim):
+        """Busca no provedor somente os trechos ausentes de [inicio, fim) e incorpora-os ao cache."""
+        inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+        # O pregão corrente pode estar incompleto: a cobertura nunca avança além de hoje
+        limite_cobertura = min(fim, pd.Timestamp.today().normalize())
+        with self.__trava:
+            # Agrupa os tickers com o mesmo trecho ausente para uma única requisição ao provedor
+            pendentes = {}
+            for ticker in tickers:
+                for trecho in self.trechos_ausentes(ticker, inicio, fim):
+                    pendentes.setdefault(trecho, []).append(ticker)
+        # O download ocorre fora da trava, de modo que blocos distintos de ativos podem ser buscados em paralelo
+        baixados = {
+            (trecho_inicio, trecho_fim): self.provedor.baixar(grupo, trecho_inicio.strftime('%Y-%m-%d'), trecho_fim.strftime('%Y-%m-%d'), self.intervalo, self.ajustado)
+            for (trecho_inicio, trecho_fim), grupo in pendentes.items()
+        }
+        with self.__trava:
+            alterado = False
+            for (trecho_inicio, trecho_fim), grupo in pendentes.items():
+                for ticker in grupo:
+                    dados = baixados[(trecho_inicio, trecho_fim)].get(ticker)
+                    if dados is None or len(dados) == 0:
+                        # Falha de download e ausência de dados são indistinguíveis: o trecho não é marcado
+                        # como coberto e volta a ser buscado na próxima leitura
+                        continue
+                    self.__incorporar(ticker, dados)
+                    # Os trechos são adjacentes ao período já coberto, que continua contíguo
+                    coberto = self.indice.get(ticker)
+                    novo_inicio = trecho_inicio if coberto is None else min(trecho_inicio, pd.Timestamp(coberto[0]))
+                    novo_fim = min(trecho_fim, limite_cobertura)
+                    novo_fim = novo_fim if coberto is None else max(novo_fim, pd.Timestamp(coberto[1]))
+                    self.indice[ticker] = [novo_inicio.isoformat(), max(novo_inicio, novo_fim).isoformat()]
+                    alterado = True
+            if alterado:
+                self.__gravar_indice()
+
+    def __incorporar(self, ticker, dados):
+        if dados is None or len(dados) == 0:
+            return
+        indice = pd.DatetimeIndex(dados.index)
+        if indice.tz is not None:
+            indice = indice.tz_convert('UTC').tz_localize(None)
+        datas = indice.as_unit('ns').to_numpy()
+        valores = dados.reindex(columns=CAMPOS_COTACAO).to_numpy(dtype=np.float64)
+        existente = self.ler(ticker, mmap=False)
+        if existente is not None:
+            # Datas novas prevalecem sobre as já existentes
+            manter = ~np.isin(existente[0], datas)
+            datas = np.concatenate([existente[0][manter], datas])
+            valores = np.concatenate([existente[1][manter], valores])
+        ordem = np.argsort(datas, kind='stable')
+        self.__gravar(ticker, datas[ordem], valores[ordem])
+
+    def carregar(self, tickers, inicio, fim):
+        """
+        Retorna as cotações de [inicio, fim) no formato do yfinance: colunas MultiIndex (Price, Ticker)
+        e índice de datas. Trechos ausentes são buscados antes no provedor.
+        """
+        tickers = list(tickers)
+        self.atualizar(tickers, inicio, fim)
+        inicio, fim = pd.Timestamp(inicio).to_datetime64(), pd.Timestamp(fim).to_datetime64()
+        series = {}
+        for ticker in tickers:
+            dados = self.ler(ticker)
+            if dados is None:
+                continue
+            datas, valores = dados
+            a, b = np.searchsorted(datas, inicio, side='left'), np.searchsorted(datas, fim, side='left')
+            series[ticker] = (np.asarray(datas[a:b]), np.asarray(valores[a:b]))
+        # Índice comum: união das datas de todos os ativos
+        datas = np.unique(np.concatenate([d for d, _ in series.values()])) if series else np.array([], dtype='datetime64[ns]')
+        matriz = np.full((datas.size, len(CAMPOS_COTACAO), len(tickers)), np.nan)
+        for coluna, ticker in enumerate(tickers):
+            if ticker in series:
+                datas_ticker, valores = series[ticker]
+                matriz[np.searchsorted(datas, datas_ticker), :, coluna] = valores
+        colunas = pd.MultiIndex.from_product([CAMPOS_COTACAO, tickers], names=['Price', 'Ticker'])
+        return pd.DataFrame(matriz.reshape(datas.size, len(CAMPOS_COTACAO) * len(tickers)), index=pd.DatetimeIndex(datas, name='Date'), columns=colunas)
@@ -0,0 +1,138 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from .cache_cotacoes import CAMPOS_COTACAO, CacheCotacoes
+from .carteira import Carteira
+from .composicao import CacheComposicao, CarregadorComposicao
+
+
+def com_tentativas(funcao, *args, tentativas=3, espera=1.0):
+    """
+    Chama funcao(*args), repetindo após falhas com espera exponencial (espera, 2 × espera, ...).
+    A exceção da última tentativa é propagada.
+    """
+    for tentativa in range(tentativas):
+        try:
+            return funcao(*args)
+        except Exception:
+            if tentativa == tentativas - 1:
+                raise
+            time.sleep(espera * 2 ** tentativa)
+
+
+def subconjunto_colunas(cotacoes, tickers, campos=None):
+    """
+    Cotações de 'tickers' (colunas (Price, Ticker)) montadas com as próprias colunas de 'cotacoes', sem
+    cópia dos valores: cada coluna do resultado é uma visão da coluna correspondente. Operações que
+    precisam de uma matriz única (ex: to_numpy) copiam sob demanda; tickers ausentes são ignorados.
+    Como em CacheCotacoes.carregar, o índice tem apenas as datas com cotação de algum dos tickers.
+    """
+    campos = list(CAMPOS_COTACAO if campos is None else campos)
+    presentes = set(cotacoes.columns.get_level_values(1))
+    tickers = [ticker for ticker in tickers if ticker in presentes]
+    colunas = pd.MultiIndex.from_product([campos, tickers], names=cotacoes.columns.names)
+    valores = {coluna: cotacoes[coluna].to_numpy() for coluna in colunas}
+    negociados = np.zeros(len(cotacoes.index), dtype=bool)
+    for ticker in tickers:
+        negociados |= ~np.isnan(cotacoes[(CAMPOS_COTACAO[0], ticker)].to_numpy())
+    linhas = np.flatnonzero(negociados)
+    if len(linhas) and linhas[-1] - linhas[0] + 1 == len(linhas):
+        # Datas contíguas: fatias continuam sendo visões
+        linhas = slice(linhas[0], linhas[-1] + 1)
+    subconjunto = pd.DataFrame({coluna: array[linhas] for coluna, array in valores.items()}, index=cotacoes.index[linhas], copy=False)
+    subconjunto.columns = colunas
+    return subconjunto
+
+
+class CarregadorIndices:
+    """
+    Carrega as carteiras de vários índices sobre o mesmo período. As composições são resolvidas em
+    paralelo; as cotações da união dos ativos (cada ativo uma única vez, mesmo que pertença a vários
+    índices) são buscadas em blocos paralelos, com novas tentativas e espera exponencial; e cada
+    carteira recebe em cotacoes as colunas dos seus ativos, sem cópia da matriz compartilhada.
+
+    Parâmetros:
+    indices (list): índices B3 (ex: ['IBOV', 'IBXX', 'SMLL']).
+    data_inicio, data_fim: período das cotações (fim exclusivo).
+    provedor_cotacoes, diretorio_cache, provedores_composicao, intervalo: como em Carteira. Sem rede,
+        use provedores locais (ProvedorCSV, ProvedorSintetico e ProvedorComposicaoDiretorio).
+    trabalhadores (int): máximo de requisições simultâneas. Provedores não concorrentes
+        (ProvedorCotacoes.concorrente = False, como o yahoo) recebem um bloco de cada vez.
+    bloco (int): ativos por requisição de cotações.
+    tentativas (int): tentativas por requisição antes de propagar a falha.
+    espera (float): espera, em segundos, após a primeira falha; dobra a cada nova falha.
+    campos (list): campos das cotações entregues às carteiras. Padrão: CAMPOS_COTACAO.
+    """
+
+    def __init__(self, indices, data_inicio, data_fim, provedor_cotacoes=None, diretorio_cache=None, provedores_composicao=None, intervalo='1d',
+                 trabalhadores=8, bloco=50, tentativas=3, espera=1.0, campos=None):
+        self.indices = list(indices)
+        self.data_inicio = data_inicio
+        self.data_fim = data_fim
+        self.provedor_cotacoes = provedor_cotacoes
+        self.diretorio_cache = diretorio_cache
+        self.provedores_composicao = provedores_composicao
+        self.intervalo = intervalo
+        self.trabalhadores = trabalhadores
+        self.bloco = bloco
+        self.tentativas = tentativas
+        self.espera = espera
+        self.campos = campos
+        # Caches compartilhados por todas as carteiras, como os de Carteira.__init__
+        self.cache_cotacoes = CacheCotacoes(os.path.join(diretorio_cache, 'cotacoes') if diretorio_cache else None, provedor_cotacoes, intervalo)
+        cache_composicao = CacheComposicao(os.path.join(diretorio_cache, 'composicoes') if diretorio_cache else None)
+        self.carregador_composicao = CarregadorComposicao(cache_composicao, provedores_composicao)
+        self.composicoes = {}
+        self.cotacoes = None
+
+    @property
+    def tickers(self):
+        """União dos ativos das composições carregadas, na ordem dos índices e sem repetições."""
+        return list(dict.fromkeys(ticker for indice in self.indices if indice in self.composicoes for ticker in self.composicoes[indice]['Código']))
+
+    def __executar(self, funcao, itens, trabalhadores):
+        # Resultados na ordem de 'itens'; a primeira falha (após as tentativas) é propagada
+        with ThreadPoolExecutor(max_workers=max(1, min(trabalhadores, len(itens)))) as executor:
+            futuros = [executor.submit(com_tentativas, funcao, item, tentativas=self.tentativas, espera=self.espera) for item in itens]
+            return [futuro.result() for futuro in futuros]
+
+    def carregar_composicoes(self):
+        """Resolve em paralelo a composição atual de cada índice (CarregadorComposicao.carregar)."""
+        composicoes = self.__executar(self.carregador_composicao.carregar, self.indices, self.trabalhadores) if self.indices else []
+        self.composicoes = dict(zip(self.indices, composicoes))
+        return self.composicoes
+
+    def carregar_cotacoes(self):
+        """
+        Atualiza o cache com as cotações ausentes da união dos ativos, em blocos de 'bloco' ativos buscados
+        em paralelo, e monta a matriz compartilhada (colunas (Price, Ticker)) em self.cotacoes.
+        """
+        tickers = self.tickers
+        blocos = [tickers[i:i + self.bloco] for i in range(0, len(tickers), self.bloco)]
+        trabalhadores = self.trabalhadores if self.cache_cotacoes.provedor.concorrente else 1
+        if blocos:
+            self.__executar(lambda bloco: self.cache_cotacoes.atualizar(bloco, self.data_inicio, self.data_fim), blocos, trabalhadores)
+        # Todos os trechos já estão em cache: a leitura não volta ao provedor
+        self.cotacoes = self.cache_cotacoes.carregar(tickers, self.data_inicio, self.data_fim)
+        return self.cotacoes
+
+    def carteira(self, indice):
+        """Carteira do índice com ativos e cotacoes prontos (colunas da matriz compartilhada, sem cópia)."""
+        carteira = Carteira(indice, self.data_inicio, self.data_fim, self.provedor_cotacoes, self.diretorio_cache, self.provedores_composicao, self.intervalo)
+        # Os caches (e a trava das cotações) são os do carregador
+        carteira.cache_cotacoes = self.cache_cotacoes
+        carteira.carregador_composicao = self.carregador_composicao
+        carteira.ativos = self.composicoes[indice]
+        carteira.cotacoes = subconjunto_colunas(self.cotacoes, carteira.ativos['Código'], self.campos)
+        return carteira
+
+    def carregar(self):
+        """
+        Executa todas as etapas e retorna um dicionário índice -> Carteira, equivalente a chamar
+        ler_tickers e ler_cotacoes em uma carteira por índice.
+        """
+        self.carregar_composicoes()
+        self.carregar_cotacoes()
+        return {indice: self.carteira(indice) for indice in self.indices}
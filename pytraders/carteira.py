@@ -1,133 +1,361 @@
-import yfinance as yf
+import contextlib
 import pandas as pd
 import numpy as np
-from time import sleep
-from selenium.webdriver.common.by import By
 import os
-from selenium import webdriver
-import chromedriver_autoinstaller
 from .trading_book import TradingBook
+from .backtest_sinais import executar_sinais
+from .cubo_pregoes import CuboPregoes
+from .armazem_cotacoes import PregoesArmazem
+from .alocacao import maiores
+from .stops import STOP_GAIN, STOP_LOSS, AvaliadorStops, apertar_stops, avaliar_stops
+from .cache_cotacoes import CacheCotacoes
+from .composicao import CacheComposicao, CarregadorComposicao, ProvedorComposicaoSelenium, mascara_composicao
 
 class Carteira:
-    def __init__(self, indice_b3, data_inicio, data_fim):
-        chromedriver_autoinstaller.install()
+    def __init__(self, indice_b3, data_inicio, data_fim, provedor_cotacoes=None, diretorio_cache=None, provedores_composicao=None, intervalo='1d'):
         self.indice_b3 = indice_b3
         self.data_inicio = data_inicio
         self.data_fim = data_fim
         self.filtrar_operacao_curva_capital = False
         self.book_execucao = None
         self.book_referencia = None
+        self.__pregoes = None
+        self.__cubo = None
+        self.__stops = None
+        # Último pregão com marcação diária registrada: ponto de retomada do backtest
+        self.ultimo_pregao_processado = None
+        # Máscara de pertinência ao índice (pregões × ativos), montada por montar_universo
+        self.universo = None
+        # Cotações ficam em cache local; só os períodos ainda não baixados são buscados no provedor (yahoo finance por padrão)
+        self.cache_cotacoes = CacheCotacoes(os.path.join(diretorio_cache, 'cotacoes') if diretorio_cache else None, provedor_cotacoes, intervalo)
+        # Composição dos índices: cache versionado, arquivos da B3 já baixados e, por último, o navegador
+        cache_composicao = CacheComposicao(os.path.join(diretorio_cache, 'composicoes') if diretorio_cache else None)
+        self.carregador_composicao = CarregadorComposicao(cache_composicao, provedores_composicao)
 
 
-    def setup_backtest(self, capital_inicial, diversificacao_maxima, reinvestir_lucros, taxa_custo_operacional, pregoes, filtrar_operacao_curva_capital=False, sma_curva_capital=5, slippage=0.0):
+    def setup_backtest(self, capital_inicial, diversificacao_maxima, reinvestir_lucros, taxa_custo_operacional, pregoes, filtrar_operacao_curva_capital=False, sma_curva_capital=5, slippage=0.0, filtro_curva_capital='SMA'):
         self.filtrar_operacao_curva_capital = filtrar_operacao_curva_capital
-        self.book_execucao = TradingBook(self.indice_b3, self.data_inicio, self.data_fim, capital_inicial, diversificacao_maxima, reinvestir_lucros, taxa_custo_operacional, pregoes, filtrar_operacao_curva_capital, sma_curva_capital, slippage)
-        self.book_referencia = TradingBook(self.indice_b3, self.data_inicio, self.data_fim, capital_inicial, diversificacao_maxima, reinvestir_lucros, taxa_custo_operacional, pregoes, filtrar_operacao_curva_capital, sma_curva_capital, slippage)
+        self.pregoes = pregoes
+        self.ultimo_pregao_processado = None
+        self.book_execucao = TradingBook(self.indice_b3, self.data_inicio, self.data_fim, capital_inicial, diversificacao_maxima, reinvestir_lucros, taxa_custo_operacional, pregoes, filtrar_operacao_curva_capital, sma_curva_capital, slippage, filtro_curva_capital)
+        if (filtrar_operacao_curva_capital):
+            # O book de referência recebe todas as operações e alimenta o filtro da curva de capital.
+            # Os dois books compartilham a mesma matriz de preços para a marcação a mercado.
+            self.book_referencia = TradingBook(self.indice_b3, self.data_inicio, self.data_fim, capital_inicial, diversificacao_maxima, reinvestir_lucros, taxa_custo_operacional, pregoes, filtrar_operacao_curva_capital, sma_curva_capital, slippage, filtro_curva_capital, matriz_precos=self.book_execucao.matriz_precos)
+        else:
+            # Sem filtro os dois books seriam idênticos: a referência é o próprio book de execução
+            self.book_referencia = self.book_execucao
+
+    @property
+    def pregoes(self):
+        return self.__pregoes
+
+    @pregoes.setter
+    def pregoes(self, pregoes):
+        self.__pregoes = pregoes
+        self.__cubo = None
+        self.__stops = None
+
+    @property
+    def cubo(self):
+        # Compilado sob demanda na primeira consulta e descartado quando pregoes é substituído
+        if self.__cubo is None:
+            # Pregões de um ArmazemCotacoes montam o cubo direto dos arquivos mapeados
+            self.__cubo = self.__pregoes.cubo() if isinstance(self.__pregoes, PregoesArmazem) else CuboPregoes(self.__pregoes)
+        return self.__cubo
+
+    def anexar_pregoes(self, pregoes):
+        """
+        Estende pregoes com os pregões posteriores ao último já existente, preservando posições abertas,
+        stops, registros e estado do filtro da curva de capital dos books. Linhas de datas já existentes
+        são ignoradas, o que permite calcular as variáveis da estratégia sobre uma janela final das
+        cotações (com o histórico necessário às médias e canais) e repassá-la inteira.
+
+        Retorna:
+        pd.DataFrame: pregões efetivamente anexados.
+        """
+        novos = pregoes.loc[pregoes.index > self.__pregoes.index[-1]]
+        if len(novos) == 0:
+            return novos
+        self.__pregoes = pd.concat([self.__pregoes, novos])
+        # Cubo e matriz de preços já compilados recebem só as linhas novas
+        if self.__cubo is not None:
+            self.__cubo.anexar(novos)
+        if self.__stops is not None:
+            self.__stops.anexar(novos)
+        for book in self.__books():
+            book.anexar_pregoes(self.__pregoes, novos)
+        return novos
+
+    def pregoes_pendentes(self):
+        """Datas de pregoes posteriores ao último pregão processado (todas, se nenhum foi processado)."""
+        datas = self.__pregoes.index
+        if self.ultimo_pregao_processado is None:
+            return datas
+        return datas[datas.searchsorted(self.ultimo_pregao_processado, side='right'):]
+
+    def iterar_pregoes(self, pendentes=False):
+        """
+        Percorre os pregões retornando (pregao, VisaoPregao) para leitura das variáveis sem consultas ao MultiIndex.
+        Com pendentes=True, começa após o último pregão processado (retomada após anexar_pregoes).
+        """
+        cubo = self.cubo
+        inicio = len(cubo) - len(self.pregoes_pendentes()) if pendentes else 0
+        for i in range(inicio, len(cubo)):
+            visao = cubo.dia(i)
+            yield visao.data, visao
+
+    def iterar_universo(self, pendentes=False):
+        """
+        Percorre os pregões retornando (pregao, VisaoPregao, ativos), em que 'ativos' são apenas os códigos
+        com cotação no pregão que pertencem ao índice na data (universo) ou têm posição aberta. Sem
+        universo montado, todos os ativos com cotação são visitados.
+        """
+        cubo = self.cubo
+        codigos = np.array(list(cubo.ativos), dtype=object)
+        fechamento = cubo.campo('Close')
+        mascara = None
+        if self.universo is not None:
+            mascara = self.universo.reindex(index=cubo.datas, columns=codigos, fill_value=False).to_numpy(dtype=bool)
+        for pregao, visao in self.iterar_pregoes(pendentes):
+            ativos = ~np.isnan(fechamento[visao.linha])
+            if mascara is not None:
+                # Posições abertas continuam visíveis após a saída do ativo do índice
+                membros = mascara[visao.linha].copy()
+                for ativo in self.book_referencia.posicoes_abertas:
+                    if ativo in cubo.ativos:
+                        membros[cubo.ativos[ativo]] = True
+                ativos &= membros
+            yield pregao, visao, codigos[ativos].tolist()
+
+    def __books(self):
+        # Books distintos a serem atualizados (apenas um quando não há filtro de curva de capital)
+        return (self.book_execucao,) if self.book_referencia is self.book_execucao else (self.book_execucao, self.book_referencia)
 
 
     # Recebe um índice B3 e retorna um dataframe dos ativos que o compõe
     def __load_ativos(self, espera=8):
-        # 1. Define o diretório atual como local de download
-        download_dir = os.getcwd() # No Colab, isso geralmente é '/content'
-
-        # 2. Configura as opções
-        options = webdriver.ChromeOptions()
-        options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        prefs = {
-            "download.default_directory": download_dir,  # Onde salvar
-            "download.prompt_for_download": False,       # Não perguntar onde salvar
-            "download.directory_upgrade": True,
-            "safebrowsing.enabled": True                 # Necessário para alguns tipos de arquivo
-        }
-        options.add_experimental_option("prefs", prefs)
-        # open it, go to a website, and get results
-        wd = webdriver.Chrome(options=options)
-        #wd.get("https://www.google.com")
-        #print(wd.page_source)  # results
-        # divs = wd.find_elements_by_css_selector('div')
-        url = f'https://sistemaswebb3-listados.b3.com.br/indexPage/day/{self.indice_b3.upper()}?language=pt-br'
-        wd.get(url)
-        sleep(espera)
-
-        wd.find_element(By.ID, 'segment').send_keys("Setor de Atuação")
-        sleep(espera)
-
-        wd.find_element(By.LINK_TEXT, "Download").click()
-        sleep(espera)
-
-        #arquivos = !ls -1t /content/*.csv
-        # Liste arquivos diretamente com os.path
-        arquivos = sorted([f for f in os.listdir('/content') if f.endswith('.csv')], key=lambda x: os.path.getmtime(os.path.join('/content', x)), reverse=True)
-        if arquivos:
-            arquivo_csv = os.path.join('/content', arquivos[0])
-            return pd.read_csv(arquivo_csv, sep=';', encoding='ISO-8859-1', skipfooter=2, engine='python', thousands='.', decimal=',', header=1, index_col=False)
-        else:
-            raise FileNotFoundError("Nenhum arquivo CSV encontrado no diretório '/content'.")
-
+        # O navegador só é usado quando não há versão atual em cache nem arquivo da B3 já baixado
+        for provedor in self.carregador_composicao.provedores:
+            if isinstance(provedor, ProvedorComposicaoSelenium):
+                provedor.espera = espera
+        return self.carregador_composicao.carregar(self.indice_b3)
 
     def ler_tickers(self):
         self.ativos = self.__load_ativos(5)
 
+    def ler_tickers_historicos(self, diretorio_b3=None):
+        """
+        Lê todas as versões datadas da composição do índice (cache, mais os arquivos da B3 em 'diretorio_b3')
+        em self.composicoes. self.ativos passa a ser a união dos ativos que já pertenceram ao índice, para que
+        as cotações carregadas cubram todo o histórico sem viés de sobrevivência.
+        """
+        self.composicoes = self.carregador_composicao.historico(self.indice_b3, diretorio_b3)
+        self.ativos = pd.concat(list(self.composicoes.values())[::-1], ignore_index=True).drop_duplicates('Código').reset_index(drop=True)
+        return self.composicoes
+
+    def montar_universo(self, datas=None, antes_primeira=True):
+        """
+        Compila self.composicoes na máscara de pertinência (datas × ativos) em self.universo, usada por
+        iterar_universo e executar_sinais. Padrão: datas de pregoes.
+        """
+        self.universo = mascara_composicao(self.composicoes, self.pregoes.index if datas is None else datas, antes_primeira)
+        return self.universo
+
     def reler_tickers_e_cotacoes(self, indice_b3):
         self.indice_b3 = indice_b3
         self.ativos = self.__load_ativos(5)
         self.cotacoes = self.__load_cotacoes()
 
     def __load_cotacoes(self):
-        # Gera códigos de ativos no padrão yfinance
-        tickers = [ticker + '.SA' for ticker in self.ativos['Código']]
-        # Download das cotações
-        cotacoes = yf.download(
-            tickers = tickers,        # Símbolos das ações (separados por espaço, se for mais de um)
-            start = self.data_inicio, # Data inicial
-            end = self.data_fim,      # Data final
-            interval = "1d",          # Intervalo (e.g., '1d', '1wk', '1mo')
-            #group_by=None, #"ticker",# Agrupar por 'ticker' (útil para múltiplos ativos)
-            auto_adjust = True,       # Ajusta automaticamente preços para desdobramentos e dividendos
-            threads = True,           # Faz download de múltiplos ativos em paralelo
-            progress = True           # Mostra barra de progresso durante o download
-        )
-        # Dicionário mapeando os códigos yfinance em código B3
-        dict_tickers = dict(zip(tickers, self.ativos['Código']))
-        # Renomeia as colunas com códigos de ativo B3
-        return cotacoes.rename(columns = dict_tickers)
+        # Cotações diárias ajustadas com colunas (campo, código B3), no mesmo formato do yfinance
+        return self.cache_cotacoes.carregar(self.ativos['Código'], self.data_inicio, self.data_fim)
 
     def ler_cotacoes(self):
         self.cotacoes = self.__load_cotacoes()
 
+    def atualizar_cotacoes(self, data_fim):
+        """
+        Estende cotacoes até data_fim (exclusiva) buscando apenas o período após a data fim atual.
+
+        Retorna:
+        pd.DataFrame: cotações dos pregões novos.
+        """
+        novas = self.cache_cotacoes.carregar(self.ativos['Código'], self.data_fim, data_fim)
+        novas = novas.loc[novas.index > self.cotacoes.index[-1]]
+        self.cotacoes = pd.concat([self.cotacoes, novas])
+        self.data_fim = data_fim
+        return novas
+
     def reler_cotacoes(self, data_inicio, data_fim):
         self.data_inicio = data_inicio
         self.data_fim = data_fim
         self.cotacoes = self.__load_cotacoes()
 
     def atualizarPatrimonio(self, data, operacao, valor):
-        self.book_execucao.atualizarPatrimonio(data, operacao, valor)
-        self.book_referencia.atualizarPatrimonio(data, operacao, valor)
+        for book in self.__books():
+            book.atualizarPatrimonio(data, operacao, valor)
+        if operacao == 'INC_CAPITAL':
+            self.ultimo_pregao_processado = data
+
+    @contextlib.contextmanager
+    def lote(self, consolidar=True):
+        """
+        Agrupa as ordens do bloco em um lote por book (TradingBook.iniciar_lote): posições e operações
+        são registradas a cada ordem, com as verificações de saldo e de diversificação na ordem das ordens,
+        e o patrimônio é gravado ao final, em um registro por dia (consolidar=True) ou por evento. Se o bloco
+        for interrompido por uma exceção, as ordens já executadas têm o patrimônio gravado evento a evento,
+        exatamente como fora de lote, e a exceção é propagada.
+
+            with carteira.lote():
+                carteira.fecharPosicao(pregao, 'PETR4', 31.2)
+                carteira.abrirPosicao(pregao, 'VALE3', 'BUY', 300, 61.5, 1.02)
+                carteira.atualizar_patrimonio_resultado_posicoes_abertas(pregao)
+        """
+        books = self.__books()
+        for book in books:
+            book.iniciar_lote()
+        try:
+            yield self
+        except BaseException:
+            # Lote incompleto: nada é consolidado
+            for book in books:
+                book.confirmar_lote(consolidar=False)
+            raise
+        for book in books:
+            book.confirmar_lote(consolidar)
 
     def getPregoes(self):
         return self.book_referencia.pregoes
 
     def temPosicaoAberta(self, ativo):
-        return (self.book_referencia.temPosicaoAberta(ativo) or self.book_execucao.temPosicaoAberta(ativo))
+        # As posições do book de execução são um subconjunto das posições do book de referência
+        return self.book_referencia.temPosicaoAberta(ativo)
         
     def abrirPosicao(self, dataEntrada, ativo, tipo, volume, precoEntrada, forcaRelativa, stopLoss=np.nan, stopGain=np.nan):
-        if ((self.filtrar_operacao_curva_capital and self.book_referencia.curva_capital_acima_media_movel(dataEntrada)) or not self.filtrar_operacao_curva_capital):
-            self.book_execucao.abrirPosicao(dataEntrada, ativo, tipo, volume, precoEntrada, forcaRelativa, stopLoss, stopGain)
+        if (self.book_referencia is not self.book_execucao):
+            if (self.book_referencia.curva_capital_acima_media_movel(dataEntrada)):
+                self.book_execucao.abrirPosicao(dataEntrada, ativo, tipo, volume, precoEntrada, forcaRelativa, stopLoss, stopGain)
         self.book_referencia.abrirPosicao(dataEntrada, ativo, tipo, volume, precoEntrada, forcaRelativa, stopLoss, stopGain)
 
     def fecharPosicao(self, dataSaida, ativo, precoSaida):
-        self.book_referencia.fecharPosicao(dataSaida, ativo, precoSaida)
-        if (self.book_execucao.temPosicaoAberta(ativo)):
-            self.book_execucao.fecharPosicao(dataSaida, ativo, precoSaida)
+        resultado = self.book_referencia.fecharPosicao(dataSaida, ativo, precoSaida)
+        if (self.book_referencia is not self.book_execucao and self.book_execucao.temPosicaoAberta(ativo)):
+            resultado = self.book_execucao.fecharPosicao(dataSaida, ativo, precoSaida)
+        return resultado
 
     def getStopLossPosicaoAberta(self, ativo):
         return self.book_referencia.getStopLossPosicaoAberta(ativo)
         
     def getStopGainPosicaoAberta(self, ativo):
         return self.book_referencia.getStopGainPosicaoAberta(ativo)
+
+    def subirStopLossPosicaoAberta(self, ativo, novoStopLoss):
+        for book in self.__books():
+            book.subirStopLossPosicaoAberta(ativo, novoStopLoss)
+
+    def avaliar_stops(self, pregao, novos_stop_loss=None, trailing=None):
+        """
+        Avalia de uma vez os stops de todas as posições abertas contra abertura, máxima e mínima do pregão
+        (regras em stops.avaliar_stops) e fecha as disparadas, na ordem de abertura das posições. Depois,
+        ajusta o stop loss das posições restantes somente quando o novo valor o aperta, como em
+        subirStopLossPosicaoAberta.
+
+        Parâmetros:
+        pregao: data do pregão.
+        novos_stop_loss (dict ou pd.Series): stop candidato por ativo (ex: canal inferior do dia).
+        trailing (float): stop móvel como fração abaixo da máxima (BUY) ou acima da mínima (SELL) do pregão.
+
+        Retorna:
+        dict: ativo -> (STOP_LOSS ou STOP_GAIN, preço de saída) das posições fechadas.
+        """
+        book = self.book_referencia
+        if not book.posicoes_abertas:
+            return {}
+        if self.__stops is None:
+            self.__stops = AvaliadorStops(self.__pregoes)
+        ativos = list(book.posicoes_abertas)
+        linhas = np.fromiter(book.posicoes_abertas.values(), dtype=np.int64, count=len(ativos))
+        registro = book.ledger_posicoes
+        compra = registro.coluna('tipo')[linhas] == registro.codigo('tipo', 'BUY')
+        stop_loss = registro.coluna('stopLoss')[linhas]
+        abertura, maxima, minima = self.__stops.cotacoes(pregao, ativos)
+        perda, ganho, preco = avaliar_stops(compra, abertura, maxima, minima, stop_loss, registro.coluna('stopGain')[linhas])
+
+        fechadas = {}
+        for k in np.flatnonzero(perda | ganho):
+            self.fecharPosicao(pregao, ativos[k], preco[k])
+            fechadas[ativos[k]] = (STOP_LOSS if perda[k] else STOP_GAIN, float(preco[k]))
+
+        candidatos = []
+        if novos_stop_loss is not None:
+            candidatos.append(np.array([novos_stop_loss.get(ativo, np.nan) for ativo in ativos], dtype=np.float64))
+        if trailing is not None:
+            candidatos.append(np.where(compra, maxima * (1 - trailing), minima * (1 + trailing)))
+        alterados = np.zeros(len(ativos), dtype=bool)
+        for candidato in candidatos:
+            stop_loss, apertados = apertar_stops(compra, stop_loss, candidato)
+            alterados |= apertados
+        for k in np.flatnonzero(alterados & ~(perda | ganho)):
+            self.subirStopLossPosicaoAberta(ativos[k], stop_loss[k])
+        return fechadas
             
+    def alocar_entradas(self, pregao, pontuacao, precos, tipo='BUY', stop_loss=None, stop_gain=None, forca_relativa=None):
+        """
+        Abre, em uma chamada, as melhores entradas candidatas do pregão quando há mais sinais do que vagas.
+        Os candidatos são visitados em ordem decrescente de pontuação (empates na ordem de 'pontuacao'),
+        mas só os necessários para preencher as vagas são ordenados (alocacao.maiores). O volume vem de
+        getVolumesOperacao, recalculado para os restantes após cada abertura, e as verificações de saldo
+        líquido e de diversificação são as do ciclo do README, de modo que o resultado é o mesmo de:
+
+            for ativo in candidatos em ordem decrescente de pontuação:
+                volume = carteira.getVolumeOperacao(preco)
+                if volume > 0 and carteira.temSaldoLiquido(volume * preco) and carteira.getQuantidadePosicoesAbertas() < diversificacao_maxima:
+                    carteira.abrirPosicao(pregao, ativo, tipo, volume, preco, forca_relativa, stop_loss, stop_gain)
+
+        Parâmetros:
+        pregao: data do pregão.
+        pontuacao (pd.Series ou dict): pontuação de cada ativo candidato (ex: a força relativa); NaN é ignorado.
+        precos (pd.Series ou dict): preço de entrada de cada ativo; ausentes ou não positivos são ignorados.
+        tipo (str): 'BUY' ou 'SELL'.
+        stop_loss, stop_gain (pd.Series ou dict): stops registrados nas posições abertas.
+        forca_relativa (pd.Series ou dict): valor gravado em 'forcaRelativa'. Padrão: a pontuação.
+
+        Retorna:
+        list: ativos cujas posições foram abertas, na ordem de abertura.
+        """
+        pontuacao = pd.Series(pontuacao, dtype=np.float64)
+        ativos = pontuacao.index
+        preco = pd.Series(precos, dtype=np.float64).reindex(ativos).to_numpy()
+        valores = pontuacao.to_numpy()
+        validos = np.flatnonzero(np.isfinite(valores) & np.isfinite(preco) & (preco > 0) & ~ativos.isin(list(self.book_referencia.posicoes_abertas)))
+        pontos = valores[validos]
+        forca_relativa = pontuacao if forca_relativa is None else pd.Series(forca_relativa, dtype=np.float64)
+        stops = [pd.Series(stop, dtype=np.float64) if stop is not None else None for stop in (stop_loss, stop_gain)]
+        diversificacao_maxima = self.book_execucao.diversificacao_maxima
+
+        abertas = []
+        visitados = 0
+        while visitados < len(validos) and self.getQuantidadePosicoesAbertas() < diversificacao_maxima:
+            # Candidatos suficientes para as vagas restantes; a cada rodada com recusas a seleção dobra
+            vagas = diversificacao_maxima - self.getQuantidadePosicoesAbertas()
+            bloco = validos[maiores(pontos, visitados + max(vagas, visitados))[visitados:]]
+            volumes = self.book_execucao.getVolumesOperacao(preco[bloco])
+            for k, i in enumerate(bloco):
+                if self.getQuantidadePosicoesAbertas() >= diversificacao_maxima:
+                    break
+                visitados += 1
+                ativo, volume = ativos[i], volumes[k]
+                if volume > 0 and self.temSaldoLiquido(volume * preco[i]):
+                    self.abrirPosicao(
+                        pregao, ativo, tipo, volume, preco[i], forca_relativa.get(ativo, np.nan),
+                        *(stop.get(ativo, np.nan) if stop is not None else np.nan for stop in stops)
+                    )
+                    abertas.append(ativo)
+                    # O saldo mudou (custo da operação): os volumes dos restantes são recalculados
+                    volumes[k + 1:] = self.book_execucao.getVolumesOperacao(preco[bloco[k + 1:]])
+        return abertas
+
     def getTipoPosicaoAberta(self, ativo):
         return self.book_referencia.getTipoPosicaoAberta(ativo)
         
@@ -141,9 +369,46 @@ class Carteira:
         return self.book_execucao.getQuantidadePosicoesAbertas()
                   
     def arredondar_casas_decimais(self, casas=2):
-        self.book_execucao.arredondar_casas_decimais(casas)
-        self.book_referencia.arredondar_casas_decimais(casas)
+        for book in self.__books():
+            book.arredondar_casas_decimais(casas)
+
+    def executar_sinais(self, entradas, saidas, precos=None, stop_loss=None, stop_gain=None, prioridade=None, forca_relativa=None, tipo='BUY', pendentes=False, universo=None,
+                        avaliar_stops=False, ajuste_stop_loss=None, trailing=None, consolidar_patrimonio=False):
+        """
+        Executa o backtest a partir de matrizes de sinais (pregões × ativos). Ver backtest_sinais.executar_sinais.
+        As entradas são restritas a 'universo' ou, se omitido, ao universo montado por montar_universo.
+        """
+        return executar_sinais(self, entradas, saidas, precos, stop_loss, stop_gain, prioridade, forca_relativa, tipo, pendentes,
+                               self.universo if universo is None else universo, avaliar_stops, ajuste_stop_loss, trailing, consolidar_patrimonio)
+
+    def salvar_snapshot(self, diretorio):
+        """Grava o estado completo da carteira e dos books em 'diretorio'. Ver snapshot.salvar_snapshot."""
+        from .snapshot import salvar_snapshot
+        return salvar_snapshot(self, diretorio)
+
+    @classmethod
+    def carregar_snapshot(cls, diretorio, pregoes=None, mmap=True, **parametros):
+        """Restaura uma carteira gravada por salvar_snapshot. Ver snapshot.carregar_snapshot."""
+        from .snapshot import carregar_snapshot
+        return carregar_snapshot(diretorio, pregoes, mmap, **parametros)
+
+    def instrumentar(self, linhas=True):
+        """
+        Ativa a medição das chamadas da carteira e dos books (deve ser chamado após setup_backtest).
+        Retorna o objeto Instrumentacao, com relatorio(), tabela(), linhas() e to_json().
+        """
+        from .instrumentacao import Instrumentacao
+        self.remover_instrumentacao()
+        self.instrumentacao = Instrumentacao().instrumentar_carteira(self, linhas)
+        return self.instrumentacao
+
+    def remover_instrumentacao(self):
+        instrumentacao = getattr(self, 'instrumentacao', None)
+        if instrumentacao is not None:
+            instrumentacao.remover()
+            self.instrumentacao = None
 
     def atualizar_patrimonio_resultado_posicoes_abertas(self, pregao):
-        self.book_referencia.atualizarPatrimonio(pregao, 'INC_CAPITAL', self.book_referencia.getResultadoPosicoesAbertas(pregao))
-        self.book_execucao.atualizarPatrimonio(pregao, 'INC_CAPITAL', self.book_execucao.getResultadoPosicoesAbertas(pregao))
\ No newline at end of file
+        for book in reversed(self.__books()):
+            book.atualizarPatrimonio(pregao, 'INC_CAPITAL', book.getResultadoPosicoesAbertas(pregao))
+        self.ultimo_pregao_processado = pregao
\ No newline at end of file
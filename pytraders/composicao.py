@@ -0,0 +1,280 @@
+import os
+import re
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from .cache_cotacoes import DIRETORIO_CACHE_PADRAO
+
+# Arquivos baixados do site da B3 seguem o padrão '<INDICE>Dia_<dd-mm-aa>.csv'
+PADRAO_ARQUIVO_B3 = re.compile(r'^(?P<indice>[A-Za-z0-9]+)Dia_(?P<data>\d{2}-\d{2}-\d{2})(?: ?\(\d+\))?\.csv$')
+
+# Validade das composições em pregões (dias úteis): a do pregão anterior continua atual, inclusive no fim de semana
+VALIDADE_COMPOSICAO = 1
+
+
+def ler_csv_b3(caminho):
+    """Lê o arquivo CSV de composição de índice baixado do site da B3."""
+    return pd.read_csv(caminho, sep=';', encoding='ISO-8859-1', skipfooter=2, engine='python', thousands='.', decimal=',', header=1, index_col=False)
+
+
+def data_arquivo_b3(nome_arquivo):
+    """Retorna (indice, data) do nome de um arquivo da B3 ou None se o nome não seguir o padrão."""
+    encontrado = PADRAO_ARQUIVO_B3.match(os.path.basename(nome_arquivo))
+    if encontrado is None:
+        return None
+    return encontrado.group('indice').upper(), datetime.strptime(encontrado.group('data'), '%d-%m-%y').date()
+
+
+def vigente(data, validade=VALIDADE_COMPOSICAO, hoje=None):
+    """
+    Indica se a composição datada de 'data' ainda vale como atual: a sua data não pode ser anterior ao
+    'validade'-ésimo dia útil antes de hoje (no sábado e no domingo, contado a partir da segunda-feira).
+    Com a validade padrão, a composição de sexta-feira é atual até a segunda-feira. Feriados não são
+    considerados. validade=None aceita qualquer data.
+    """
+    if validade is None:
+        return True
+    hoje = datetime.now().date() if hoje is None else pd.Timestamp(hoje).date()
+    return bool(np.datetime64(data, 'D') >= np.busday_offset(hoje, -validade, roll='forward'))
+
+
+class ProvedorComposicao(ABC):
+    """Fonte de arquivos de composição: 'obter' retorna o caminho de um CSV da B3 para o índice ou None."""
+
+    @abstractmethod
+    def obter(self, indice):
+        """Caminho do arquivo de composição do índice, ou None se o provedor não o tiver."""
+
+    def liberar(self, caminho):
+        """Chamado após a cópia do arquivo obtido para o cache; permite descartar arquivos temporários."""
+
+
+class ProvedorComposicaoDiretorio(ProvedorComposicao):
+    """
+    Procura, em um diretório local, o arquivo da B3 mais recente já baixado para o índice.
+    Arquivos fora da validade (idade_maxima, em pregões; ver vigente) são ignorados, pela mesma regra
+    de CacheComposicao.atual. None aceita qualquer data.
+    """
+
+    def __init__(self, diretorio=None, idade_maxima=VALIDADE_COMPOSICAO):
+        self.diretorio = diretorio or os.getcwd()
+        self.idade_maxima = idade_maxima
+
+    def obter(self, indice):
+        if not os.path.isdir(self.diretorio):
+            return None
+        candidatos = []
+        for nome in os.listdir(self.diretorio):
+            identificacao = data_arquivo_b3(nome)
+            if identificacao is None or identificacao[0] != indice.upper():
+                continue
+            if vigente(identificacao[1], self.idade_maxima):
+                caminho = os.path.join(self.diretorio, nome)
+                candidatos.append((identificacao[1], os.path.getmtime(caminho), caminho))
+        return max(candidatos)[2] if candidatos else None
+
+
+class ProvedorComposicaoSelenium(ProvedorComposicao):
+    """
+    Baixa a composição do site da B3 com o Chrome em modo headless. É o último recurso: exige o
+    navegador e leva alguns segundos por índice.
+    """
+
+    def __init__(self, espera=5, diretorio_download=None):
+        self.espera = espera
+        self.diretorio_download = diretorio_download
+
+    def obter(self, indice):
+        from selenium import webdriver
+        from selenium.webdriver.common.by import By
+        import chromedriver_autoinstaller
+        chromedriver_autoinstaller.install()
+
+        # Diretório de download exclusivo para identificar o arquivo baixado
+        download_dir = self.diretorio_download or tempfile.mkdtemp(prefix='pytraders_b3_')
+        caminho = None
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        prefs = {
+            "download.default_directory": download_dir,  # Onde salvar
+            "download.prompt_for_download": False,       # Não perguntar onde salvar
+            "download.directory_upgrade": True,
+            "safebrowsing.enabled": True                 # Necessário para alguns tipos de arquivo
+        }
+        options.add_experimental_option("prefs", prefs)
+        wd = None
+        try:
+            wd = webdriver.Chrome(options=options)
+            url = f'https://sistemaswebb3-listados.b3.com.br/indexPage/day/{indice.upper()}?language=pt-br'
+            wd.get(url)
+            time.sleep(self.espera)
+
+            wd.find_element(By.ID, 'segment').send_keys("Setor de Atuação")
+            time.sleep(self.espera)
+
+            wd.find_element(By.LINK_TEXT, "Download").click()
+            # Aguarda o arquivo aparecer no diretório em vez de uma espera fixa
+            limite = time.monotonic() + 3 * self.espera
+            while time.monotonic() < limite:
+                arquivos = [f for f in os.listdir(download_dir) if f.endswith('.csv')]
+                if arquivos:
+                    caminho = os.path.join(download_dir, max(arquivos, key=lambda f: os.path.getmtime(os.path.join(download_dir, f))))
+                    break
+                time.sleep(0.2)
+        finally:
+            if wd is not None:
+                wd.quit()
+            if caminho is None and self.diretorio_download is None:
+                shutil.rmtree(download_dir, ignore_errors=True)
+        return caminho
+
+    def liberar(self, caminho):
+        # O diretório temporário criado em obter é removido depois que o cache copiou o arquivo
+        if self.diretorio_download is None:
+            shutil.rmtree(os.path.dirname(caminho), ignore_errors=True)
+
+
+class CacheComposicao:
+    """
+    Cache versionado dos arquivos de composição, organizado como '<diretorio>/<INDICE>/<aaaa-mm-dd>.csv'.
+    A versão mais recente é considerada atual enquanto a sua data (a da composição, não a da cópia
+    para o cache) estiver dentro da validade, em pregões (ver vigente).
+    """
+
+    def __init__(self, diretorio=None, validade=VALIDADE_COMPOSICAO):
+        self.diretorio = diretorio or os.path.join(DIRETORIO_CACHE_PADRAO, 'composicoes')
+        self.validade = validade
+
+    def versoes(self, indice):
+        """Datas das versões em cache do índice, em ordem crescente."""
+        diretorio = os.path.join(self.diretorio, indice.upper())
+        if not os.path.isdir(diretorio):
+            return []
+        return sorted(datetime.strptime(nome[:-4], '%Y-%m-%d').date() for nome in os.listdir(diretorio) if nome.endswith('.csv') and not nome.startswith('.'))
+
+    def caminho(self, indice, data):
+        return os.path.join(self.diretorio, indice.upper(), f'{data:%Y-%m-%d}.csv')
+
+    def versao(self, indice, data=None):
+        """Versão mais recente com data até 'data' (ou a mais recente de todas), ou None."""
+        versoes = [v for v in self.versoes(indice) if data is None or v <= pd.Timestamp(data).date()]
+        return versoes[-1] if versoes else None
+
+    def atual(self, indice):
+        """Caminho da versão mais recente se ainda estiver dentro da validade, ou None."""
+        versao = self.versao(indice)
+        # A data de modificação do arquivo não serve: gravar (e importar arquivos históricos) a renova
+        if versao is None or not vigente(versao, self.validade):
+            return None
+        return self.caminho(indice, versao)
+
+    def gravar(self, indice, caminho_origem):
+        # A versão é a data do arquivo da B3 (pelo nome) ou a data de hoje
+        identificacao = data_arquivo_b3(caminho_origem)
+        data = identificacao[1] if identificacao is not None else datetime.now().date()
+        destino = self.caminho(indice, data)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporario = destino + '.tmp'
+        shutil.copyfile(caminho_origem, temporario)
+        os.replace(temporario, destino)
+        return destino
+
+
+    def importar(self, indice, diretorio):
+        """
+        Grava como versões todos os arquivos da B3 do índice encontrados em 'diretorio'. Retorna as datas importadas.
+        Versões já presentes não são regravadas, e a importação não torna atual nenhuma composição histórica:
+        a validade depende apenas da data da versão (ver atual).
+        """
+        datas = []
+        for nome in sorted(os.listdir(diretorio)):
+            identificacao = data_arquivo_b3(nome)
+            if identificacao is not None and identificacao[0] == indice.upper():
+                if not os.path.exists(self.caminho(indice, identificacao[1])):
+                    self.gravar(indice, os.path.join(diretorio, nome))
+                datas.append(identificacao[1])
+        return datas
+
+
+def mascara_composicao(composicoes, datas, antes_primeira=True):
+    """
+    Compila composições datadas em uma máscara booleana de pertinência (datas × ativos). Cada versão
+    vale da sua data (inclusive) até a data da versão seguinte (exclusive).
+
+    Parâmetros:
+    composicoes (dict): data da versão -> DataFrame da B3 (coluna 'Código') ou lista de códigos.
+    datas (pd.DatetimeIndex): pregões da máscara.
+    antes_primeira (bool): aplica a versão mais antiga às datas anteriores a ela; com False, essas datas
+        não têm nenhum ativo.
+
+    Retorna:
+    pd.DataFrame: máscara booleana indexada pelas datas, uma coluna por ativo que pertenceu ao índice.
+    """
+    datas = pd.DatetimeIndex(datas)
+    versoes = sorted(composicoes)
+    membros = [list(composicoes[v]['Código'] if isinstance(composicoes[v], pd.DataFrame) else composicoes[v]) for v in versoes]
+    ativos = list(dict.fromkeys(codigo for lista in membros for codigo in lista))
+    coluna = {ativo: j for j, ativo in enumerate(ativos)}
+    # Matriz (versões × ativos) e, para cada data, a versão vigente
+    pertence = np.zeros((len(versoes) + 1, len(ativos)), dtype=bool)
+    for i, lista in enumerate(membros):
+        pertence[i, [coluna[codigo] for codigo in lista]] = True
+    vigente = np.searchsorted(pd.DatetimeIndex(versoes).as_unit('ns').to_numpy(), datas.as_unit('ns').to_numpy(), side='right') - 1
+    if antes_primeira:
+        vigente = np.maximum(vigente, 0)
+    # Datas sem versão vigente usam a linha final, vazia
+    vigente[vigente < 0] = len(versoes)
+    return pd.DataFrame(pertence[vigente], index=datas, columns=pd.Index(ativos, name='Código'))
+
+
+class CarregadorComposicao:
+    """
+    Resolve a composição de um índice: versão atual do cache, depois os provedores na ordem
+    informada (arquivos já baixados e, por último, o navegador). Se todos falharem, recorre à
+    versão mais recente do cache, mesmo vencida.
+    """
+
+    def __init__(self, cache=None, provedores=None):
+        self.cache = cache if cache is not None else CacheComposicao()
+        self.provedores = provedores if provedores is not None else [ProvedorComposicaoDiretorio(), ProvedorComposicaoSelenium()]
+
+    def carregar(self, indice):
+        caminho = self.cache.atual(indice)
+        erro = None
+        if caminho is None:
+            for provedor in self.provedores:
+                try:
+                    origem = provedor.obter(indice)
+                except Exception as e:
+                    # Falha de um provedor (ex: navegador indisponível) não impede o uso dos demais
+                    erro = e
+                    continue
+                if origem is not None:
+                    try:
+                        caminho = self.cache.gravar(indice, origem)
+                    finally:
+                        provedor.liberar(origem)
+                    break
+        if caminho is None:
+            versao = self.cache.versao(indice)
+            if versao is None:
+                raise FileNotFoundError(f"Não foi possível obter a composição do índice {indice.upper()}.") from erro
+            caminho = self.cache.caminho(indice, versao)
+        return ler_csv_b3(caminho)
+
+    def historico(self, indice, diretorio_b3=None):
+        """
+        Todas as versões da composição do índice: data -> DataFrame da B3. Arquivos da B3 em 'diretorio_b3'
+        são antes importados para o cache; sem nenhuma versão em cache, a composição atual é obtida.
+        """
+        if diretorio_b3 is not None:
+            self.cache.importar(indice, diretorio_b3)
+        if not self.cache.versoes(indice):
+            self.carregar(indice)
+        return {pd.Timestamp(versao): ler_csv_b3(self.cache.caminho(indice, versao)) for versao in self.cache.versoes(indice)}
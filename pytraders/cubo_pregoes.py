@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+
+class CuboPregoes:
+    """
+    Pregoes compilado uma única vez em um array contíguo (pregões × ativos × campos), com tabelas
+    de consulta de data -> linha, ativo -> índice e campo -> índice. Apenas campos numéricos são
+    incluídos; combinações ausentes de ativo e campo valem NaN.
+    """
+
+    def __init__(self, pregoes):
+        numericos = pregoes.select_dtypes(include=['number', 'bool'])
+        ativos = list(dict.fromkeys(numericos.columns.get_level_values(0)))
+        campos = list(dict.fromkeys(numericos.columns.get_level_values(1)))
+        colunas = pd.MultiIndex.from_product([ativos, campos])
+        if not numericos.columns.equals(colunas):
+            numericos = numericos.reindex(columns=colunas)
+        self.datas = pregoes.index
+        self.ativos = {ativo: i for i, ativo in enumerate(ativos)}
+        self.campos = {campo: i for i, campo in enumerate(campos)}
+        self.valores = np.ascontiguousarray(numericos.to_numpy(dtype=np.float64).reshape(len(self.datas), len(ativos), len(campos)))
+
+    @classmethod
+    def de_arrays(cls, datas, ativos, campos, valores):
+        """Cubo a partir de um array (pregões × ativos × campos) já montado, sem passar por um DataFrame."""
+        cubo = cls.__new__(cls)
+        cubo.datas = datas
+        cubo.ativos = {ativo: i for i, ativo in enumerate(ativos)}
+        cubo.campos = {campo: i for i, campo in enumerate(campos)}
+        cubo.valores = np.ascontiguousarray(valores, dtype=np.float64)
+        return cubo
+
+    def anexar(self, pregoes):
+        """
+        Acrescenta os pregões posteriores ao último do cubo (datas já existentes são ignoradas).
+        Ativos e campos novos são incluídos ao final, preservando os índices já atribuídos.
+        """
+        if len(self.datas) > 0:
+            pregoes = pregoes.loc[pregoes.index > self.datas[-1]]
+        if len(pregoes) == 0:
+            return
+        novo = CuboPregoes(pregoes)
+        if novo.ativos == self.ativos and novo.campos == self.campos:
+            self.valores = np.concatenate([self.valores, novo.valores])
+        else:
+            ativos, campos = dict(self.ativos), dict(self.campos)
+            for ativo in novo.ativos:
+                ativos.setdefault(ativo, len(ativos))
+            for campo in novo.campos:
+                campos.setdefault(campo, len(campos))
+            valores = np.full((len(self.datas) + len(novo.datas), len(ativos), len(campos)), np.nan)
+            valores[:len(self.datas), :len(self.ativos), :len(self.campos)] = self.valores
+            indices_ativos = np.array([ativos[ativo] for ativo in novo.ativos])
+            indices_campos = np.array([campos[campo] for campo in novo.campos])
+            valores[len(self.datas):, indices_ativos[:, None], indices_campos[None, :]] = novo.valores
+            self.ativos, self.campos, self.valores = ativos, campos, valores
+        self.datas = self.datas.append(novo.datas)
+
+    def __len__(self):
+        return len(self.datas)
+
+    def linha(self, data):
+        return self.datas.get_loc(data)
+
+    def campo(self, nome):
+        """Matriz (pregões × ativos) do campo, como visão do cubo."""
+        return self.valores[:, :, self.campos[nome]]
+
+    def dia(self, data):
+        """Visão do pregão 'data' (data do índice ou posição inteira)."""
+        i = data if isinstance(data, (int, np.integer)) else self.linha(data)
+        return VisaoPregao(self, i)
+
+    def __iter__(self):
+        for i in range(len(self.datas)):
+            yield VisaoPregao(self, i)
+
+
+class VisaoPregao:
+    """
+    Linha de um pregão no cubo, sem cópia dos dados.
+
+    Acessos:
+    visao.Close -> array com o campo de todos os ativos
+    visao['PETR4'] -> VisaoAtivo, com visao['PETR4'].Close
+    visao['PETR4', 'Close'] -> float
+    """
+
+    __slots__ = ('cubo', 'linha', 'data', 'valores')
+
+    def __init__(self, cubo, linha):
+        self.cubo = cubo
+        self.linha = linha
+        self.data = cubo.datas[linha]
+        self.valores = cubo.valores[linha]
+
+    def __getattr__(self, nome):
+        campos = self.cubo.campos
+        if nome not in campos:
+            raise AttributeError(nome)
+        return self.valores[:, campos[nome]]
+
+    def __getitem__(self, chave):
+        if isinstance(chave, tuple):
+            ativo, campo = chave
+            return float(self.valores[self.cubo.ativos[ativo], self.cubo.campos[campo]])
+        return VisaoAtivo(self.cubo.campos, self.valores[self.cubo.ativos[chave]])
+
+    def __contains__(self, ativo):
+        return ativo in self.cubo.ativos
+
+
+class VisaoAtivo:
+    """Campos de um ativo em um pregão: visao.Close ou visao['Close']."""
+
+    __slots__ = ('campos', 'valores')
+
+    def __init__(self, campos, valores):
+        self.campos = campos
+        self.valores = valores
+
+    def __getattr__(self, nome):
+        campos = self.campos
+        if nome not in campos:
+            raise AttributeError(nome)
+        return float(self.valores[campos[nome]])
+
+    def __getitem__(self, campo):
+        return float(self.valores[self.campos[campo]])
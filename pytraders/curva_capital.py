@@ -0,0 +1,161 @@
+from abc import ABC, abstractmethod
+from fractions import Fraction
+import numpy as np
+import pandas as pd
+from .ledger import Ledger
+
+
+class FiltroCurvaCapital(ABC):
+    """
+    Filtro incremental aplicado ao saldo de fechamento diário da curva de capital.
+
+    O dia corrente ainda pode receber eventos, por isso o filtro separa a consulta do valor
+    provisório ('valor') da inclusão definitiva de um dia fechado ('incluir').
+    """
+    nome = 'filtro'
+
+    @abstractmethod
+    def valor(self, atual):
+        """Valor do filtro considerando os dias fechados e o valor provisório do dia corrente."""
+
+    @abstractmethod
+    def incluir(self, fechamento):
+        """Inclui o saldo de fechamento de um dia encerrado."""
+
+
+class MediaMovelSimples(FiltroCurvaCapital):
+    """
+    Média móvel simples em buffer circular: consulta e inclusão em O(1). A soma da janela é mantida
+    de forma exata (Fraction), de modo que a média é corretamente arredondada e dias de saldo
+    constante resultam em média exatamente igual ao saldo.
+    """
+
+    def __init__(self, janela=5):
+        if janela < 1:
+            raise ValueError("A janela da média móvel deve ser maior ou igual a 1.")
+        self.janela = janela
+        self.nome = f'media_movel_{janela}d'
+        # Guarda somente os últimos (janela - 1) dias fechados; o dia corrente completa a janela
+        self.buffer = np.zeros(max(janela - 1, 1))
+        self.posicao = 0
+        self.quantidade = 0
+        self.soma = Fraction(0)
+
+    def valor(self, atual):
+        if self.quantidade < self.janela - 1:
+            return np.nan
+        return float((self.soma + Fraction(atual)) / self.janela)
+
+    def incluir(self, fechamento):
+        if self.janela == 1:
+            return
+        tamanho = self.buffer.size
+        if self.quantidade == tamanho:
+            self.soma -= Fraction(self.buffer[self.posicao])
+        else:
+            self.quantidade += 1
+        self.buffer[self.posicao] = fechamento
+        self.soma += Fraction(fechamento)
+        self.posicao = (self.posicao + 1) % tamanho
+
+
+class MediaMovelExponencial(FiltroCurvaCapital):
+    """
+    Média móvel exponencial com alfa = 2 / (janela + 1), iniciada no primeiro valor e indefinida
+    até completar a janela (equivale a ewm(span=janela, adjust=False, min_periods=janela)).
+    """
+
+    def __init__(self, janela=5):
+        if janela < 1:
+            raise ValueError("A janela da média móvel deve ser maior ou igual a 1.")
+        self.janela = janela
+        self.nome = f'media_movel_exp_{janela}d'
+        self.alfa = 2 / (janela + 1)
+        self.media = np.nan
+        self.quantidade = 0
+
+    def valor(self, atual):
+        if self.quantidade + 1 < self.janela:
+            return np.nan
+        return atual if self.quantidade == 0 else self.alfa * atual + (1 - self.alfa) * self.media
+
+    def incluir(self, fechamento):
+        self.media = fechamento if self.quantidade == 0 else self.alfa * fechamento + (1 - self.alfa) * self.media
+        self.quantidade += 1
+
+
+FILTROS_CURVA_CAPITAL = {
+    'SMA': MediaMovelSimples,
+    'EMA': MediaMovelExponencial,
+}
+
+
+def criar_filtro(filtro='SMA', janela=5):
+    """Cria o filtro pelo código ('SMA' ou 'EMA') ou retorna a instância de FiltroCurvaCapital recebida."""
+    if isinstance(filtro, FiltroCurvaCapital):
+        return filtro
+    if filtro not in FILTROS_CURVA_CAPITAL:
+        raise ValueError(f"Filtro de curva de capital inválido: {filtro}. Use {list(FILTROS_CURVA_CAPITAL)}.")
+    return FILTROS_CURVA_CAPITAL[filtro](janela)
+
+
+class CurvaCapitalDiaria:
+    """
+    Agregador da curva de capital em fechamentos diários. Cada evento do patrimônio atualiza o dia
+    corrente (o último evento do dia é o fechamento); ao mudar de dia, o dia anterior é encerrado e
+    incluído no filtro. As datas devem chegar em ordem cronológica.
+    """
+
+    def __init__(self, filtro):
+        self.filtro = filtro
+        # Dias encerrados: data, saldo, capital e valor do filtro no fechamento
+        self.dias = Ledger({'data': 'data', 'saldo': 'float', 'capital': 'float', 'media': 'float'}, capacidade=256)
+        # Dia corrente (aberto)
+        self.data = None
+        self.saldo = np.nan
+        self.capital = np.nan
+
+    def __len__(self):
+        return len(self.dias) + (self.data is not None)
+
+    def atualizar(self, data, saldo, capital):
+        # Normaliza para garantir que horas não dupliquem linhas (apenas a data importa para curva diária)
+        data_normalizada = pd.Timestamp(data).normalize()
+        if self.data is not None and data_normalizada != self.data:
+            self.__encerrar_dia()
+        self.data = data_normalizada
+        self.saldo = float(saldo)
+        self.capital = float(capital)
+
+    def __encerrar_dia(self):
+        self.dias.adicionar(data=self.data, saldo=self.saldo, capital=self.capital, media=self.filtro.valor(self.saldo))
+        self.filtro.incluir(self.saldo)
+
+    def acima_media_movel(self, data_ignorada=None):
+        """
+        Verifica se o saldo está acima (ou igual) ao filtro. Se 'data_ignorada' for o dia corrente,
+        considera o último dia encerrado. Sem dados ou com filtro indefinido, retorna True.
+        """
+        if self.data is None:
+            return True
+        saldo = self.saldo
+        media = None
+        if data_ignorada is not None and pd.Timestamp(data_ignorada).normalize() == self.data:
+            if len(self.dias) == 0:
+                return True
+            saldo = self.dias.valor(-1, 'saldo')
+            media = self.dias.valor(-1, 'media')
+        if media is None:
+            media = self.filtro.valor(saldo)
+        if np.isnan(media):
+            return True
+        return saldo >= media
+
+    def to_frame(self):
+        dias = self.dias.to_frame()
+        if self.data is not None:
+            corrente = pd.DataFrame({'data': [self.data], 'saldo': [self.saldo], 'capital': [self.capital], 'media': [self.filtro.valor(self.saldo)]})
+            dias = pd.concat([dias, corrente], ignore_index=True) if len(dias) > 0 else corrente
+        frame = dias.set_index('data').rename(columns={'media': self.filtro.nome})
+        frame.index = pd.DatetimeIndex(frame.index, name='data')
+        return frame
@@ -0,0 +1,210 @@
+import hashlib
+import os
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from .cache_cotacoes import DIRETORIO_CACHE_PADRAO
+
+
+# Indicadores calculados sobre matrizes (datas × ativos) de uma só vez, coluna a coluna em código
+# compilado do pandas. 'campos' é o dicionário campo -> matriz das cotações.
+
+def sma(campos, janela, campo='Close'):
+    """Média móvel simples (como ta.trend.SMAIndicator)."""
+    return campos[campo].rolling(janela, min_periods=janela).mean()
+
+
+def ema(campos, janela, campo='Close'):
+    """Média móvel exponencial com alfa = 2 / (janela + 1), indefinida até completar a janela."""
+    return campos[campo].ewm(span=janela, adjust=False, min_periods=janela).mean()
+
+
+def true_range(campos):
+    """Maior entre máxima - mínima e as distâncias da máxima e da mínima ao fechamento anterior."""
+    fechamento_anterior = campos['Close'].shift(1)
+    maxima, minima = campos['High'], campos['Low']
+    return np.fmax(maxima - minima, np.fmax((maxima - fechamento_anterior).abs(), (minima - fechamento_anterior).abs()))
+
+
+def atr(campos, janela):
+    """
+    ATR com a suavização de Wilder (como ta.volatility.AverageTrueRange): a primeira média é a simples
+    dos 'janela' primeiros true ranges de cada ativo e as seguintes são (anterior × (janela - 1) + TR) / janela.
+    Antes de completar a janela e nos pregões sem cotação, o valor é NaN (o ta preenche com zero).
+    """
+    intervalo = true_range(campos)
+    semente = intervalo.rolling(janela, min_periods=janela).mean()
+    # A recursão começa, em cada ativo, na primeira média completa
+    inicio = semente.notna() & ~semente.notna().cummax().shift(1, fill_value=False)
+    depois = semente.notna().cummax() & ~inicio
+    valores = intervalo.where(depois).mask(inicio, semente)
+    return valores.ewm(alpha=1 / janela, adjust=False, ignore_na=True).mean().where(depois | inicio).where(intervalo.notna())
+
+
+def donchian_superior(campos, janela):
+    """Banda superior do canal Donchian: máxima das últimas 'janela' máximas (como ta.volatility.DonchianChannel)."""
+    return campos['High'].rolling(janela, min_periods=janela).max()
+
+
+def donchian_inferior(campos, janela):
+    """Banda inferior do canal Donchian: mínima das últimas 'janela' mínimas."""
+    return campos['Low'].rolling(janela, min_periods=janela).min()
+
+
+INDICADORES = {
+    'sma': sma,
+    'ema': ema,
+    'true_range': true_range,
+    'atr': atr,
+    'donchian_superior': donchian_superior,
+    'donchian_inferior': donchian_inferior,
+}
+
+
+class CacheIndicadores:
+    """
+    Memoização dos indicadores por (indicador, parâmetros, versão dos dados): em memória, com descarte do
+    menos usado recentemente (LRU) após 'capacidade' entradas, e em disco, como um arquivo .npy por
+    entrada, com limite opcional de espaço (também LRU, pela data de último uso dos arquivos).
+
+    Parâmetros:
+    diretorio (str): diretório do cache em disco. Padrão: ~/.cache/pytraders/indicadores.
+    capacidade (int): quantidade de matrizes mantidas em memória.
+    persistir (bool): grava e lê o cache em disco.
+    limite_disco_mb (float): espaço máximo em disco; None para ilimitado.
+    """
+
+    def __init__(self, diretorio=None, capacidade=32, persistir=True, limite_disco_mb=None):
+        self.diretorio = diretorio or os.path.join(DIRETORIO_CACHE_PADRAO, 'indicadores')
+        self.capacidade = capacidade
+        self.persistir = persistir
+        self.limite_disco_mb = limite_disco_mb
+        self.memoria = OrderedDict()
+        self.acertos = 0
+        self.faltas = 0
+
+    def __caminho(self, chave):
+        return os.path.join(self.diretorio, hashlib.blake2b(repr(chave).encode(), digest_size=16).hexdigest() + '.npy')
+
+    def obter(self, chave):
+        """Matriz memoizada da chave ou None."""
+        if chave in self.memoria:
+            self.memoria.move_to_end(chave)
+            self.acertos += 1
+            return self.memoria[chave]
+        caminho = self.__caminho(chave)
+        if self.persistir and os.path.exists(caminho):
+            valores = np.load(caminho, mmap_mode='r')
+            os.utime(caminho)
+            self.__guardar(chave, valores)
+            self.acertos += 1
+            return valores
+        self.faltas += 1
+        return None
+
+    def gravar(self, chave, valores):
+        self.__guardar(chave, valores)
+        if self.persistir:
+            os.makedirs(self.diretorio, exist_ok=True)
+            caminho = self.__caminho(chave)
+            np.save(caminho + '.tmp.npy', valores)
+            os.replace(caminho + '.tmp.npy', caminho)
+            if self.limite_disco_mb is not None:
+                self.__liberar_disco()
+
+    def __guardar(self, chave, valores):
+        self.memoria[chave] = valores
+        self.memoria.move_to_end(chave)
+        while len(self.memoria) > self.capacidade:
+            self.memoria.popitem(last=False)
+
+    def __liberar_disco(self):
+        arquivos = [os.path.join(self.diretorio, nome) for nome in os.listdir(self.diretorio) if nome.endswith('.npy') and not nome.endswith('.tmp.npy')]
+        arquivos = sorted(((os.path.getmtime(caminho), os.path.getsize(caminho), caminho) for caminho in arquivos), reverse=True)
+        limite = self.limite_disco_mb * 1024 * 1024
+        total = 0
+        for _, tamanho, caminho in arquivos:
+            total += tamanho
+            if total > limite:
+                os.remove(caminho)
+
+
+class PipelineIndicadores:
+    """
+    Cálculo vetorizado das variáveis da estratégia sobre as cotações (formato de Carteira.cotacoes:
+    colunas (Price, Ticker)). Cada indicador é calculado uma vez para todos os ativos e memoizado pela
+    versão dos dados (hash das cotações), de modo que varreduras que repetem janelas não recalculam.
+
+    Parâmetros:
+    cotacoes (pd.DataFrame): cotações (datas × (campo, ativo)).
+    cache (CacheIndicadores): cache compartilhado. Padrão: um novo cache com os parâmetros padrão.
+    """
+
+    def __init__(self, cotacoes, cache=None):
+        self.cotacoes = cotacoes
+        self.campos = {campo: cotacoes.xs(campo, axis=1, level=0) for campo in dict.fromkeys(cotacoes.columns.get_level_values(0))}
+        self.ativos = self.campos['Close'].columns
+        self.cache = cache if cache is not None else CacheIndicadores()
+        self.__versao = None
+
+    @property
+    def versao(self):
+        """Hash das datas, dos ativos e dos valores das cotações."""
+        if self.__versao is None:
+            resumo = hashlib.blake2b(digest_size=16)
+            resumo.update(pd.DatetimeIndex(self.cotacoes.index).as_unit('ns').asi8.tobytes())
+            resumo.update(repr(list(self.cotacoes.columns)).encode())
+            resumo.update(np.ascontiguousarray(self.cotacoes.to_numpy(dtype=np.float64)).tobytes())
+            self.__versao = resumo.hexdigest()
+        return self.__versao
+
+    def calcular(self, nome, deslocamento=0, **parametros):
+        """
+        Matriz (datas × ativos) do indicador, deslocada 'deslocamento' pregões (1 = valor do pregão anterior).
+
+        Parâmetros:
+        nome (str): indicador de INDICADORES.
+        deslocamento (int): deslocamento aplicado após o cálculo (não faz parte da chave do cache).
+        parametros: parâmetros do indicador (ex: janela=20).
+        """
+        if nome not in INDICADORES:
+            raise ValueError(f"Indicador desconhecido: {nome}. Use {list(INDICADORES)}.")
+        chave = (nome, tuple(sorted(parametros.items())), self.versao)
+        valores = self.cache.obter(chave)
+        if valores is None:
+            valores = INDICADORES[nome](self.campos, **parametros).to_numpy(dtype=np.float64)
+            self.cache.gravar(chave, valores)
+        matriz = pd.DataFrame(valores, index=self.cotacoes.index, columns=self.ativos)
+        return matriz.shift(deslocamento) if deslocamento else matriz
+
+    def sma(self, janela, campo='Close', deslocamento=0):
+        return self.calcular('sma', deslocamento, janela=janela, campo=campo)
+
+    def ema(self, janela, campo='Close', deslocamento=0):
+        return self.calcular('ema', deslocamento, janela=janela, campo=campo)
+
+    def atr(self, janela, deslocamento=0):
+        return self.calcular('atr', deslocamento, janela=janela)
+
+    def donchian_superior(self, janela, deslocamento=0):
+        return self.calcular('donchian_superior', deslocamento, janela=janela)
+
+    def donchian_inferior(self, janela, deslocamento=0):
+        return self.calcular('donchian_inferior', deslocamento, janela=janela)
+
+    def montar_pregoes(self, variaveis):
+        """
+        Monta pregoes no formato de setup_backtest (colunas (ativo, campo)): as cotações mais as variáveis.
+
+        Parâmetros:
+        variaveis (dict): nome da variável -> matriz (datas × ativos), como as retornadas por 'calcular'.
+        """
+        nomes = list(variaveis)
+        matrizes = [variaveis[nome].reindex(index=self.cotacoes.index, columns=self.ativos).to_numpy(dtype=np.float64) for nome in nomes]
+        novas = pd.DataFrame(
+            np.stack(matrizes, axis=2).reshape(len(self.cotacoes.index), -1) if nomes else np.empty((len(self.cotacoes.index), 0)),
+            index=self.cotacoes.index,
+            columns=pd.MultiIndex.from_product([self.ativos, nomes], names=['Ticker', 'Price']),
+        )
+        base = self.cotacoes.swaplevel(axis=1)
+        return pd.concat([base, novas], axis=1).sort_index(axis=1, level=0, sort_remaining=False)
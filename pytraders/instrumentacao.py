@@ -0,0 +1,161 @@
+import inspect
+import json
+import time
+from array import array
+import numpy as np
+import pandas as pd
+
+PERCENTIS = (50, 95, 99)
+
+
+def metodos_publicos(classe):
+    """
+    Nomes dos métodos públicos definidos na classe (propriedades e atributos não são incluídos).
+    Geradores e gerenciadores de contexto (ex: iterar_pregoes, lote) ficam de fora: cronometrar a chamada
+    mediria apenas a criação do gerador, não a iteração nem o corpo do bloco.
+    """
+    return [nome for nome, membro in inspect.getmembers(classe, inspect.isfunction)
+            if not nome.startswith('_') and not inspect.isgeneratorfunction(inspect.unwrap(membro))]
+
+
+class Instrumentacao:
+    """
+    Medição opcional das chamadas de métodos: contagem, tempo acumulado e percentis de latência, além
+    da evolução da quantidade de linhas dos registros do TradingBook.
+
+    Os métodos são substituídos por versões cronometradas apenas nas instâncias instrumentadas (atributos
+    da instância), e 'remover' restaura os originais. Sem instrumentação, não há custo algum.
+
+    O tempo decorrido que não está dentro de nenhum método instrumentado ('fora_dos_metodos_s') é o
+    tempo gasto pela própria estratégia (leitura de pregoes, cálculos, laços).
+    """
+
+    def __init__(self):
+        self.latencias = {}
+        self.registros_linhas = []
+        self.__instrumentados = []
+        self.__profundidade = 0
+        self.__tempo_metodos = 0
+        self.__inicio = time.perf_counter_ns()
+
+    def instrumentar(self, objeto, rotulo, metodos=None, apos=None):
+        """
+        Substitui os métodos (padrão: todos os públicos da classe) do objeto por versões cronometradas.
+        'apos' é chamado sem argumentos depois de cada chamada.
+        """
+        for nome in metodos if metodos is not None else metodos_publicos(type(objeto)):
+            self.__envolver(objeto, rotulo, nome, apos)
+        return self
+
+    def __envolver(self, objeto, rotulo, nome, apos):
+        original = getattr(objeto, nome)
+        amostras = self.latencias.setdefault(f'{rotulo}.{nome}', array('q'))
+
+        def instrumentado(*args, **kwargs):
+            self.__profundidade += 1
+            inicio = time.perf_counter_ns()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                duracao = time.perf_counter_ns() - inicio
+                amostras.append(duracao)
+                self.__profundidade -= 1
+                # Só as chamadas de nível mais externo somam o tempo coberto pelos métodos
+                if self.__profundidade == 0:
+                    self.__tempo_metodos += duracao
+                if apos is not None:
+                    apos()
+
+        instrumentado.__wrapped__ = original
+        setattr(objeto, nome, instrumentado)
+        self.__instrumentados.append((objeto, nome))
+
+    def instrumentar_book(self, book, rotulo='book'):
+        """Instrumenta o TradingBook e seus componentes internos (registros, marcação a mercado e curva de capital)."""
+        self.instrumentar(book, rotulo)
+        for ledger in ('ledger_patrimonio', 'ledger_posicoes', 'ledger_operacoes'):
+            self.instrumentar(getattr(book, ledger), f'{rotulo}.{ledger}', ['adicionar', 'atualizar', 'valor', 'to_frame'])
+        self.instrumentar(book.marcacao_mercado, f'{rotulo}.marcacao_mercado', ['abrir', 'fechar', 'resultado', 'capital'])
+        self.instrumentar(book.curva_capital, f'{rotulo}.curva_capital', ['atualizar', 'acima_media_movel'])
+        return self
+
+    def instrumentar_carteira(self, carteira, linhas=True):
+        """
+        Instrumenta a Carteira e os books criados pelo setup_backtest. Com linhas=True, registra a quantidade
+        de linhas dos registros de cada book a cada atualização diária do patrimônio.
+        """
+        books = {'book_execucao': carteira.book_execucao}
+        if carteira.book_referencia is not carteira.book_execucao:
+            books['book_referencia'] = carteira.book_referencia
+        for rotulo, book in books.items():
+            self.instrumentar_book(book, rotulo)
+
+        def registrar():
+            self.registrar_linhas(books, carteira.book_execucao.ledger_patrimonio.valor(-1, 'data'))
+        ignorados = ('atualizar_patrimonio_resultado_posicoes_abertas', 'instrumentar', 'remover_instrumentacao')
+        self.instrumentar(carteira, 'Carteira', [nome for nome in metodos_publicos(type(carteira)) if nome not in ignorados])
+        self.instrumentar(carteira, 'Carteira', ['atualizar_patrimonio_resultado_posicoes_abertas'], registrar if linhas else None)
+        return self
+
+    def registrar_linhas(self, books, data):
+        for rotulo, book in books.items():
+            self.registros_linhas.append((data, rotulo, len(book.ledger_patrimonio), len(book.ledger_posicoes), len(book.ledger_operacoes), len(book.posicoes_abertas)))
+
+    def remover(self):
+        """Restaura os métodos originais de todas as instâncias instrumentadas."""
+        for objeto, nome in reversed(self.__instrumentados):
+            objeto.__dict__.pop(nome, None)
+        self.__instrumentados = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.remover()
+
+    def relatorio(self, ordenar='total_ms'):
+        """Tabela com uma linha por método: chamadas, tempo total e latência média, percentis e máxima."""
+        linhas = []
+        for metodo, amostras in self.latencias.items():
+            if len(amostras) == 0:
+                continue
+            microssegundos = np.frombuffer(amostras, dtype=np.int64) / 1000
+            percentis = np.percentile(microssegundos, PERCENTIS)
+            linhas.append({
+                'metodo': metodo,
+                'chamadas': microssegundos.size,
+                'total_ms': microssegundos.sum() / 1000,
+                'media_us': microssegundos.mean(),
+                **{f'p{p}_us': valor for p, valor in zip(PERCENTIS, percentis)},
+                'max_us': microssegundos.max(),
+            })
+        colunas = ['chamadas', 'total_ms', 'media_us'] + [f'p{p}_us' for p in PERCENTIS] + ['max_us']
+        if not linhas:
+            return pd.DataFrame(columns=colunas, index=pd.Index([], name='metodo'))
+        return pd.DataFrame(linhas).set_index('metodo').sort_values(ordenar, ascending=False)
+
+    def resumo(self):
+        decorrido = (time.perf_counter_ns() - self.__inicio) / 1e9
+        metodos = self.__tempo_metodos / 1e9
+        return {'decorrido_s': decorrido, 'em_metodos_s': metodos, 'fora_dos_metodos_s': decorrido - metodos}
+
+    def linhas(self):
+        """Evolução da quantidade de linhas dos registros por data e book."""
+        return pd.DataFrame(self.registros_linhas, columns=['data', 'book', 'patrimonio', 'posicoes', 'operacoes', 'posicoes_abertas'])
+
+    def tabela(self):
+        resumo = self.resumo()
+        cabecalho = f"Decorrido: {resumo['decorrido_s']:.3f} s | em métodos: {resumo['em_metodos_s']:.3f} s | fora dos métodos (estratégia): {resumo['fora_dos_metodos_s']:.3f} s"
+        return cabecalho + '\n' + self.relatorio().to_string(float_format=lambda valor: f'{valor:.1f}')
+
+    def to_json(self, caminho=None):
+        """Relatório em JSON (resumo, métodos e evolução das linhas); grava em 'caminho' se informado."""
+        conteudo = json.dumps({
+            'resumo': self.resumo(),
+            'metodos': self.relatorio().reset_index().to_dict(orient='records'),
+            'linhas': self.linhas().assign(data=lambda df: df['data'].astype(str)).to_dict(orient='records'),
+        }, indent=1, default=float)
+        if caminho is not None:
+            with open(caminho, 'w') as arquivo:
+                arquivo.write(conteudo)
+        return conteudo
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+# Tipos de coluna suportados pelo Ledger e o dtype NumPy usado no armazenamento
+# float    : float64, vazio = NaN
+# data     : datetime64[ns], vazio = NaT
+# categoria: códigos int32 em um dicionário de categorias (ex: tickers), vazio = -1
+TIPOS_COLUNA = {
+    'float': (np.float64, np.nan),
+    'data': ('datetime64[ns]', np.datetime64('NaT', 'ns')),
+    'categoria': (np.int32, -1),
+}
+
+
+class Ledger:
+    """
+    Registro colunar somente-inclusão, armazenado em arrays NumPy que crescem por duplicação
+    (inclusões em O(1) amortizado). O DataFrame equivalente é montado sob demanda e fica em
+    cache até a próxima escrita.
+
+    Parâmetros:
+    colunas (dict): mapeamento nome da coluna -> tipo ('float', 'data' ou 'categoria').
+    capacidade (int): quantidade inicial de linhas pré-alocadas.
+    """
+
+    def __init__(self, colunas, capacidade=1024):
+        self.colunas = dict(colunas)
+        for nome, tipo in self.colunas.items():
+            if tipo not in TIPOS_COLUNA:
+                raise ValueError(f"Tipo de coluna inválido para '{nome}': {tipo}")
+        self.capacidade = max(int(capacidade), 1)
+        self.tamanho = 0
+        self.arrays = {nome: self.__alocar(tipo, self.capacidade) for nome, tipo in self.colunas.items()}
+        # Dicionários das colunas categóricas: lista de categorias e lookup categoria -> código
+        self.categorias = {nome: [] for nome, tipo in self.colunas.items() if tipo == 'categoria'}
+        self.__codigos = {nome: {} for nome in self.categorias}
+        self.__frame = None
+
+    @classmethod
+    def restaurar(cls, colunas, arrays, categorias):
+        """
+        Reconstrói um registro a partir dos arrays de cada coluna (todos com o mesmo tamanho, por
+        exemplo mapeados em memória) e das listas de categorias. A primeira inclusão realoca os
+        arrays em memória, sem alterar a origem.
+        """
+        ledger = cls(colunas, capacidade=1)
+        tamanho = len(next(iter(arrays.values()))) if arrays else 0
+        if tamanho > 0:
+            ledger.arrays = {nome: arrays[nome] for nome in ledger.colunas}
+            ledger.tamanho = ledger.capacidade = tamanho
+        for nome, valores in categorias.items():
+            ledger.categorias[nome] = list(valores)
+            ledger.__codigos[nome] = {valor: codigo for codigo, valor in enumerate(valores)}
+        return ledger
+
+    def __len__(self):
+        return self.tamanho
+
+    def __alocar(self, tipo, capacidade):
+        dtype, vazio = TIPOS_COLUNA[tipo]
+        return np.full(capacidade, vazio, dtype=dtype)
+
+    def __crescer(self):
+        nova_capacidade = self.capacidade * 2
+        for nome, tipo in self.colunas.items():
+            novo = self.__alocar(tipo, nova_capacidade)
+            novo[:self.tamanho] = self.arrays[nome][:self.tamanho]
+            self.arrays[nome] = novo
+        self.capacidade = nova_capacidade
+
+    def codificar(self, coluna, valor):
+        """Retorna o código da categoria na coluna, incluindo-a no dicionário se for nova."""
+        if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+            return -1
+        codigos = self.__codigos[coluna]
+        codigo = codigos.get(valor)
+        if codigo is None:
+            codigo = len(self.categorias[coluna])
+            self.categorias[coluna].append(valor)
+            codigos[valor] = codigo
+        return codigo
+
+    def codigo(self, coluna, valor):
+        """Retorna o código de uma categoria já existente ou -1 se ela nunca foi registrada."""
+        return self.__codigos[coluna].get(valor, -1)
+
+    def __converter(self, coluna, valor):
+        tipo = self.colunas[coluna]
+        if tipo == 'float':
+            return np.nan if valor is None else float(valor)
+        if tipo == 'data':
+            if valor is None or valor is pd.NaT:
+                return np.datetime64('NaT', 'ns')
+            if isinstance(valor, np.datetime64):
+                return valor.astype('datetime64[ns]')
+            return pd.Timestamp(valor).as_unit('ns').to_datetime64()
+        return self.codificar(coluna, valor)
+
+    def adicionar(self, **valores):
+        """Inclui uma linha e retorna a sua posição. Colunas omitidas ficam vazias."""
+        if self.tamanho == self.capacidade:
+            self.__crescer()
+        linha = self.tamanho
+        for coluna, valor in valores.items():
+            self.arrays[coluna][linha] = self.__converter(coluna, valor)
+        self.tamanho += 1
+        self.__frame = None
+        return linha
+
+    def atualizar(self, linha, coluna, valor):
+        self.arrays[coluna][linha] = self.__converter(coluna, valor)
+        self.__frame = None
+
+    def valor(self, linha, coluna):
+        """Retorna o valor de uma célula, decodificando categorias."""
+        if linha < 0:
+            linha += self.tamanho
+        valor = self.arrays[coluna][linha]
+        if self.colunas[coluna] == 'categoria':
+            return self.categorias[coluna][valor] if valor >= 0 else np.nan
+        if self.colunas[coluna] == 'data':
+            return pd.Timestamp(valor)
+        return valor
+
+    def coluna(self, nome):
+        """Visão (sem cópia) dos valores armazenados; colunas categóricas retornam os códigos."""
+        return self.arrays[nome][:self.tamanho]
+
+    def arredondar(self, coluna, casas):
+        np.round(self.coluna(coluna), casas, out=self.coluna(coluna))
+        self.__frame = None
+
+    def to_frame(self, linhas=None):
+        """
+        Monta o DataFrame do registro. Sem 'linhas', o resultado fica em cache até a próxima escrita;
+        com 'linhas' (array de posições), monta apenas o subconjunto informado, sem cache.
+        """
+        if linhas is None and self.__frame is not None:
+            return self.__frame
+        dados = {}
+        for nome, tipo in self.colunas.items():
+            valores = self.coluna(nome)
+            valores = valores.copy() if linhas is None else valores[linhas]
+            if tipo == 'categoria':
+                valores = pd.Categorical.from_codes(valores, categories=pd.Index(self.categorias[nome], dtype=object))
+            dados[nome] = valores
+        frame = pd.DataFrame(dados, index=None if linhas is None else np.asarray(linhas))
+        if linhas is None:
+            self.__frame = frame
+        return frame
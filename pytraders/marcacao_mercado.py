@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+
+class MatrizPrecos:
+    """
+    Matriz de preços (pregões × ativos) de um campo de pregoes, extraída uma única vez,
+    com tabelas de consulta de data -> linha e ativo -> coluna.
+    """
+
+    def __init__(self, pregoes, campo='Close'):
+        precos = pregoes.xs(campo, axis=1, level=1)
+        self.campo = campo
+        self.datas = precos.index
+        self.ativos = {ativo: coluna for coluna, ativo in enumerate(precos.columns)}
+        self.valores = precos.to_numpy(dtype=np.float64)
+        self.__ultima_data = None
+        self.__ultima_linha = None
+
+    def linha(self, data):
+        # Consultas repetidas da mesma data (várias por pregão) não voltam ao índice
+        if data is not self.__ultima_data:
+            self.__ultima_linha = self.datas.get_loc(data)
+            self.__ultima_data = data
+        return self.__ultima_linha
+
+    def coluna(self, ativo):
+        """Coluna do ativo na matriz ou -1 se ele não existir em pregoes."""
+        return self.ativos.get(ativo, -1)
+
+    def anexar(self, pregoes):
+        """
+        Acrescenta os pregões posteriores ao último da matriz (datas já existentes são ignoradas).
+        Ativos novos recebem colunas ao final, de modo que as colunas já atribuídas não mudam.
+        """
+        precos = pregoes.xs(self.campo, axis=1, level=1)
+        if len(self.datas) > 0:
+            precos = precos.loc[precos.index > self.datas[-1]]
+        if len(precos) == 0:
+            return
+        for ativo in precos.columns:
+            if ativo not in self.ativos:
+                self.ativos[ativo] = len(self.ativos)
+        novas = np.full((len(precos), len(self.ativos)), np.nan)
+        novas[:, [self.ativos[ativo] for ativo in precos.columns]] = precos.to_numpy(dtype=np.float64)
+        anteriores = self.valores
+        if anteriores.shape[1] < len(self.ativos):
+            anteriores = np.hstack([anteriores, np.full((anteriores.shape[0], len(self.ativos) - anteriores.shape[1]), np.nan)])
+        self.valores = np.vstack([anteriores, novas])
+        self.datas = self.datas.append(precos.index)
+
+    def linhas(self, datas):
+        """Posição de cada data no índice de pregões (primeiro pregão igual ou posterior)."""
+        return self.datas.searchsorted(pd.DatetimeIndex(datas), side='left')
+
+
+class MarcacaoMercado:
+    """
+    Posições abertas mantidas como arrays paralelos (coluna na matriz de preços, volume com sinal,
+    volume e preço de entrada) na ordem de abertura. A marcação a mercado de um pregão é um
+    produto escalar entre a variação dos preços e o volume com sinal.
+    """
+
+    def __init__(self, capacidade=64):
+        self.quantidade = 0
+        self.ativos = []
+        self.colunas = np.zeros(capacidade, dtype=np.int64)
+        self.volume_sinal = np.zeros(capacidade)
+        self.volume = np.zeros(capacidade)
+        self.preco_entrada = np.zeros(capacidade)
+
+    def __crescer(self):
+        for nome in ('colunas', 'volume_sinal', 'volume', 'preco_entrada'):
+            atual = getattr(self, nome)
+            novo = np.zeros(atual.size * 2, dtype=atual.dtype)
+            novo[:self.quantidade] = atual[:self.quantidade]
+            setattr(self, nome, novo)
+
+    def abrir(self, ativo, coluna, tipo, volume, preco_entrada):
+        if self.quantidade == self.colunas.size:
+            self.__crescer()
+        i = self.quantidade
+        self.ativos.append(ativo)
+        self.colunas[i] = coluna
+        self.volume_sinal[i] = volume if tipo == 'BUY' else -volume
+        self.volume[i] = volume
+        self.preco_entrada[i] = preco_entrada
+        self.quantidade += 1
+
+    def fechar(self, ativo):
+        # Remove mantendo a ordem de abertura (poucas posições abertas: deslocamento barato)
+        i = self.ativos.index(ativo)
+        del self.ativos[i]
+        for array in (self.colunas, self.volume_sinal, self.volume, self.preco_entrada):
+            array[i:self.quantidade - 1] = array[i + 1:self.quantidade]
+        self.quantidade -= 1
+
+    def __precos(self, matriz, data):
+        colunas = self.colunas[:self.quantidade]
+        if (colunas < 0).any():
+            raise KeyError([ativo for ativo, coluna in zip(self.ativos, colunas) if coluna < 0])
+        return matriz.valores[matriz.linha(data), colunas]
+
+    def resultado(self, matriz, data):
+        """Resultado não realizado das posições abertas no fechamento do pregão (cotações ausentes valem zero)."""
+        if self.quantidade == 0:
+            return 0.0
+        variacao = np.nan_to_num(self.__precos(matriz, data) - self.preco_entrada[:self.quantidade])
+        return float(np.dot(variacao, self.volume_sinal[:self.quantidade]))
+
+    def capital(self, matriz, data):
+        """Valor de mercado (cotação × volume) das posições abertas no fechamento do pregão."""
+        if self.quantidade == 0:
+            return 0.0
+        return float(np.dot(np.nan_to_num(self.__precos(matriz, data)), self.volume[:self.quantidade]))
+
+
+def serie_marcacao_mercado(matriz, colunas, volume_sinal, volume, preco_entrada, datas_entrada, datas_saida, data_inicio=None, data_fim=None):
+    """
+    Calcula em uma única passada a marcação a mercado diária de um histórico de posições.
+
+    Uma posição está aberta no fechamento dos pregões entre a entrada (inclusive) e a saída (exclusive),
+    como no ciclo de backtest, em que a marcação diária é feita após as operações do dia.
+
+    Parâmetros:
+    matriz (MatrizPrecos): preços de fechamento.
+    colunas, volume_sinal, volume, preco_entrada (np.ndarray): dados das posições, um elemento por posição.
+    datas_entrada, datas_saida (np.ndarray): datas datetime64; saída NaT para posições ainda abertas.
+    data_inicio, data_fim: intervalo de pregões (inclusivo) do resultado.
+
+    Retorna:
+    pd.DataFrame: colunas 'resultado' (não realizado) e 'capital' (valor de mercado) indexadas pelo pregão.
+    """
+    inicio = 0 if data_inicio is None else matriz.datas.searchsorted(pd.Timestamp(data_inicio), side='left')
+    fim = len(matriz.datas) if data_fim is None else matriz.datas.searchsorted(pd.Timestamp(data_fim), side='right')
+    datas = matriz.datas[inicio:fim]
+
+    colunas = np.asarray(colunas, dtype=np.int64)
+    if (colunas < 0).any():
+        raise KeyError("Há posições em ativos ausentes de pregoes.")
+    linha_entrada = matriz.linhas(datas_entrada)
+    linha_saida = np.where(pd.isna(datas_saida), len(matriz.datas), matriz.linhas(np.where(pd.isna(datas_saida), datas_entrada, datas_saida)))
+    # Restringe às posições que estiveram abertas em algum pregão do intervalo e aos seus ativos
+    ativas = (linha_entrada < np.minimum(linha_saida, fim)) & (linha_saida > inicio)
+    if not ativas.any() or len(datas) == 0:
+        return pd.DataFrame({'resultado': np.zeros(len(datas)), 'capital': np.zeros(len(datas))}, index=datas)
+    ativos_usados, coluna_local = np.unique(colunas[ativas], return_inverse=True)
+    entrada = np.clip(linha_entrada[ativas], inicio, fim) - inicio
+    saida = np.clip(linha_saida[ativas], inicio, fim) - inicio
+
+    # Vetores de diferenças por ativo: soma na entrada, subtrai na saída e acumula ao longo dos pregões
+    forma = (len(datas) + 1, ativos_usados.size)
+    acumulados = []
+    for valores in (volume_sinal[ativas], volume_sinal[ativas] * preco_entrada[ativas], volume[ativas]):
+        diferencas = np.zeros(forma)
+        np.add.at(diferencas, (entrada, coluna_local), valores)
+        np.add.at(diferencas, (saida, coluna_local), -valores)
+        acumulados.append(np.cumsum(diferencas, axis=0)[:-1])
+    volume_sinal_dia, custo_entrada_dia, volume_dia = acumulados
+
+    precos = matriz.valores[inicio:fim][:, ativos_usados]
+    disponivel = ~np.isnan(precos)
+    precos = np.where(disponivel, precos, 0.0)
+    resultado = np.where(disponivel, precos * volume_sinal_dia - custo_entrada_dia, 0.0).sum(axis=1)
+    capital = (precos * volume_dia).sum(axis=1)
+    return pd.DataFrame({'resultado': resultado, 'capital': capital}, index=datas)
@@ -0,0 +1,89 @@
+import zlib
+import numpy as np
+import pandas as pd
+from .cache_cotacoes import CAMPOS_COTACAO, ProvedorCotacoes
+
+# Data de origem das séries do ProvedorSintetico: toda consulta recorta a mesma trajetória
+ORIGEM_SINTETICA = '2000-01-03'
+
+
+def gerar_cotacoes(quantidade_ativos=10, dias=252, inicio='2010-01-04', semente=0, tickers=None, retorno_anual=0.08,
+                   volatilidade_anual=(0.20, 0.50), preco_inicial=(5.0, 100.0), falhas=0.0):
+    """
+    Gera cotações OHLCV sintéticas e reprodutíveis no formato de Carteira.cotacoes: colunas MultiIndex
+    (Price, Ticker) e índice 'Date' de dias úteis.
+
+    Os fechamentos seguem um passeio aleatório geométrico por ativo; abertura, máxima e mínima são
+    derivadas do fechamento anterior e do atual, sempre coerentes (Low <= Open, Close <= High).
+    Os parâmetros de cada ativo e cada componente diário vêm de geradores próprios (derivados da
+    semente por SeedSequence.spawn), de modo que a série de 'dias' pregões é exatamente o início da
+    série mais longa com a mesma semente.
+
+    Parâmetros:
+    quantidade_ativos (int): quantidade de ativos (ignorado se 'tickers' for informado).
+    dias (int): quantidade de pregões.
+    inicio (str): data do primeiro pregão.
+    semente (int): semente do gerador; a mesma semente produz as mesmas cotações.
+    tickers (list): códigos dos ativos. Padrão: SINT000, SINT001, ...
+    retorno_anual (float): retorno esperado anual médio dos ativos.
+    volatilidade_anual (tuple): intervalo (mínima, máxima) da volatilidade anual sorteada por ativo.
+    preco_inicial (tuple): intervalo (mínimo, máximo) do preço inicial sorteado por ativo.
+    falhas (float): fração de cotações ausentes (NaN), como em ativos sem negociação no dia.
+
+    Retorna:
+    pd.DataFrame: cotações (pregões × (campo, ativo)).
+    """
+    tickers = list(tickers) if tickers is not None else [f'SINT{i:03d}' for i in range(quantidade_ativos)]
+    n = len(tickers)
+    parametros, choques, aberturas, amplitudes, volumes, ausencias = (np.random.default_rng(filha) for filha in np.random.SeedSequence(semente).spawn(6))
+    datas = pd.bdate_range(inicio, periods=dias, name='Date')
+
+    # Parâmetros por ativo: não dependem da quantidade de pregões
+    volatilidade = parametros.uniform(*volatilidade_anual, size=n) / np.sqrt(252)
+    tendencia = parametros.normal(retorno_anual, 0.05, size=n) / 252 - volatilidade ** 2 / 2
+    inicial = parametros.uniform(*preco_inicial, size=n)
+
+    # Componentes diários sorteados pregão a pregão (linha a linha): os primeiros pregões não mudam com 'dias'
+    retornos = tendencia + volatilidade * choques.standard_normal((dias, n))
+    fechamento = inicial * np.exp(np.cumsum(retornos, axis=0))
+    anterior = np.vstack([fechamento[:1] * np.exp(-retornos[:1]), fechamento[:-1]])
+    abertura = anterior * np.exp(volatilidade * 0.3 * aberturas.standard_normal((dias, n)))
+    amplitude = volatilidade * 0.5 * np.abs(amplitudes.standard_normal((dias, 2, n)))
+    maxima = np.maximum(abertura, fechamento) * np.exp(amplitude[:, 0])
+    minima = np.minimum(abertura, fechamento) * np.exp(-amplitude[:, 1])
+    volume = np.round(volumes.lognormal(13.0, 1.0, size=(dias, n)) / 100) * 100
+
+    # Ordem dos campos igual à de CAMPOS_COTACAO
+    valores = np.stack([fechamento, maxima, minima, abertura, volume], axis=1)
+    if falhas > 0:
+        ausente = ausencias.random((dias, n)) < falhas
+        valores[np.repeat(ausente[:, None, :], len(CAMPOS_COTACAO), axis=1)] = np.nan
+    colunas = pd.MultiIndex.from_product([CAMPOS_COTACAO, tickers], names=['Price', 'Ticker'])
+    return pd.DataFrame(valores.reshape(dias, -1), index=datas, columns=colunas)
+
+
+def montar_pregoes(cotacoes):
+    """Remodela cotações (campo, ativo) para o formato (ativo, campo) de Carteira.pregoes."""
+    return cotacoes.swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+
+class ProvedorSintetico(ProvedorCotacoes):
+    """
+    Provedor de cotações sintéticas para testes e benchmarks sem rede. Cada ticker tem uma única
+    trajetória a partir de ORIGEM_SINTETICA (semente derivada do código), de modo que consultas de
+    períodos diferentes são coerentes entre si.
+    """
+
+    def __init__(self, semente=0, falhas=0.0):
+        self.semente = semente
+        self.falhas = falhas
+
+    def baixar(self, tickers, inicio, fim, intervalo='1d', ajustado=True):
+        dias = len(pd.bdate_range(ORIGEM_SINTETICA, pd.Timestamp(fim) - pd.Timedelta(days=1)))
+        resultado = {}
+        for ticker in tickers:
+            semente = self.semente + zlib.crc32(ticker.encode())
+            cotacoes = gerar_cotacoes(dias=dias, inicio=ORIGEM_SINTETICA, semente=semente, tickers=[ticker], falhas=self.falhas)
+            dados = cotacoes.xs(ticker, axis=1, level=1)
+            resultado[ticker] = dados.loc[(dados.index >= pd.Timestamp(inicio)) & (dados.index < pd.Timestamp(fim))].dropna(how='all')
+        return resultado
@@ -0,0 +1,325 @@
+from typing import TypedDict
+import numpy as np
+import pandas as pd
+
+# Fatores de anualização do Índice de Sharpe
+FATORES_SHARPE = {'diária': 252, 'semanal': 52, 'mensal': 12}
+# Aliases de frequência removidos no pandas 3 e seus equivalentes
+ALIASES_FREQUENCIA = {'A': 'YE', 'Y': 'YE', 'M': 'ME', 'Q': 'QE'}
+
+
+class Metricas(TypedDict):
+    capital_inicial: float
+    lucro_liquido_fin: float
+    lucro_liquido_perc: float
+    rentabilidade: float
+    saldo_atual: float
+    drawdown_max_pct: float
+    drawdown_max_fin: float
+    fator_recuperacao: float
+    taxa_acerto: float
+    profit_factor: float
+    payoff: float
+    sharpe: float
+    total_operacoes: int
+    total_posicoes: int
+    maior_seq_vitorias: int
+    maior_seq_derrotas: int
+    lucro_medio_fin: float
+    perda_media_fin: float
+    lucro_medio_perc: float
+    perda_media_perc: float
+    lucro_fin_por_operacao: float
+    lucro_perc_por_operacao: float
+    expectativa_matematica: float
+    expectativa_matematica_normalizada: float
+    resultado_posicoes_abertas: float
+    capital_posicoes_abertas: float
+    capital_atual: float
+    liquido_atual: float
+    cagr: float
+
+
+def normalizar_frequencia(frequencia):
+    return ALIASES_FREQUENCIA.get(frequencia, frequencia)
+
+
+def maior_sequencia(retornos, vencedoras=True, inicio_grupos=None):
+    """
+    Maior sequência de posições vencedoras (retorno > 0) ou perdedoras (retorno < 0). Retornos nulos
+    ou ausentes (posições abertas) interrompem as duas sequências.
+
+    Parâmetros:
+    retornos (np.ndarray): vetor (uma sequência) ou matriz (uma sequência por linha).
+    vencedoras (bool): sequência de vitórias (True) ou de derrotas (False).
+    inicio_grupos (np.ndarray): para um vetor com várias sequências concatenadas, posição inicial de cada uma.
+
+    Retorna:
+    int, ou np.ndarray com o valor de cada linha ou grupo.
+    """
+    retornos = np.asarray(retornos, dtype=np.float64)
+    na_sequencia = retornos > 0 if vencedoras else retornos < 0
+    posicao = np.arange(retornos.shape[-1])
+    # Posição da última quebra até cada ponto; o comprimento corrente é a distância até ela
+    quebras = np.where(na_sequencia, -1, posicao)
+    if inicio_grupos is not None and len(inicio_grupos) > 0:
+        quebras[inicio_grupos] = np.where(na_sequencia[inicio_grupos], inicio_grupos - 1, inicio_grupos)
+    ultima_quebra = np.maximum.accumulate(quebras, axis=-1)
+    comprimento = np.where(na_sequencia, posicao - ultima_quebra, 0)
+    if inicio_grupos is not None:
+        return np.maximum.reduceat(comprimento, inicio_grupos) if comprimento.size else np.zeros(len(inicio_grupos), dtype=np.int64)
+    if comprimento.ndim == 1:
+        return int(comprimento.max(initial=0))
+    return comprimento.max(axis=-1, initial=0)
+
+
+def rentabilidade_periodica(datas, capital, frequencia='YE'):
+    """Variação do capital entre o fechamento de cada período, a partir do capital inicial."""
+    datas = pd.DatetimeIndex(datas)
+    capital_agrupado = pd.Series(capital, index=datas).resample(normalizar_frequencia(frequencia)).last()
+    capital_inicial = pd.Series([capital[0]], index=datas[:1])
+    rentabilidade = pd.DataFrame(pd.concat([capital_inicial, capital_agrupado]), columns=['capital'])
+    rentabilidade['variacao'] = rentabilidade['capital'].pct_change()
+    return rentabilidade.dropna()
+
+
+def calcular_sharpe(retornos, taxa_livre_risco_anual, freq='diária'):
+    """
+    Calcula o Índice de Sharpe para um conjunto de retornos.
+
+    Parâmetros:
+    retornos (np.ndarray): retornos percentuais (exemplo: 0.02 para 2%).
+    taxa_livre_risco_anual (float): Taxa livre de risco anual (exemplo: 0.1 para 10%).
+    freq (str): Frequência dos dados ('diária', 'semanal' ou 'mensal').
+
+    Retorna:
+    float: Índice de Sharpe calculado.
+    """
+    if freq not in FATORES_SHARPE:
+        raise ValueError("A frequência deve ser 'diária', 'semanal' ou 'mensal'.")
+    retornos = np.asarray(retornos, dtype=np.float64)
+    retornos = retornos[~np.isnan(retornos)]
+    if retornos.size < 2:
+        return np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return float((retornos.mean() - taxa_livre_risco_anual / FATORES_SHARPE[freq]) / retornos.std(ddof=1))
+
+
+def _retornos_por_data_entrada(data_entrada, retorno):
+    # Soma dos retornos das posições abertas em cada data (posições sem retorno contam como zero)
+    _, grupo = np.unique(data_entrada, return_inverse=True)
+    return np.bincount(grupo.ravel(), weights=np.nan_to_num(retorno))
+
+
+def calcular_metricas(resultado, retorno, data_entrada, datas_patrimonio, saldo, capital, liquido, total_operacoes,
+                      reinvestir_lucros=True, capital_inicial=None, resultado_posicoes_abertas=0.0, capital_posicoes_abertas=0.0,
+                      frequencia_rentabilidade='YE', taxa_livre_risco_aa=0.10):
+    """
+    Métricas de desempenho calculadas diretamente sobre os arrays das posições e do patrimônio.
+
+    Parâmetros:
+    resultado, retorno, data_entrada (np.ndarray): colunas das posições (NaN para as ainda abertas).
+    datas_patrimonio, saldo, capital, liquido (np.ndarray): colunas da evolução do patrimônio.
+    total_operacoes (int): quantidade de operações registradas.
+    reinvestir_lucros (bool): define o fator de recuperação (percentual ou financeiro).
+    capital_inicial (float): padrão: o primeiro capital do patrimônio.
+    resultado_posicoes_abertas, capital_posicoes_abertas (float): marcação a mercado no último pregão.
+    frequencia_rentabilidade (str): frequência do CAGR ('YE', 'ME', ...).
+    taxa_livre_risco_aa (float): taxa livre de risco anual do Índice de Sharpe.
+
+    Retorna:
+    Metricas
+    """
+    resultado = np.asarray(resultado, dtype=np.float64)
+    retorno = np.asarray(retorno, dtype=np.float64)
+    saldo = np.asarray(saldo, dtype=np.float64)
+    capital = np.asarray(capital, dtype=np.float64)
+    if capital_inicial is None:
+        capital_inicial = float(capital[0])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lucro_liquido_fin = float(np.nansum(resultado))
+        lucro_liquido_perc = float(np.nansum(retorno))
+        rentabilidade = lucro_liquido_fin / capital_inicial * 100
+        # Drawdown sobre o saldo das posições fechadas
+        picos = np.maximum.accumulate(saldo)
+        drawdown_fin = saldo - picos
+        drawdown_max_fin = float(-drawdown_fin.min()) if saldo.size else 0.0
+        drawdown_max_pct = float((drawdown_fin / picos).min() * -100) if saldo.size else 0.0
+        fator_recuperacao = np.float64(rentabilidade) / drawdown_max_pct if reinvestir_lucros else np.float64(lucro_liquido_fin) / drawdown_max_fin
+
+        total_posicoes = retorno.size
+        ganhou_fin, perdeu_fin = resultado > 0, resultado <= 0
+        ganhou_perc, perdeu_perc = retorno > 0, retorno <= 0
+        taxa_acerto = np.count_nonzero(ganhou_fin) / np.float64(total_posicoes)
+        lucro_medio_fin = resultado[ganhou_fin].mean() if ganhou_fin.any() else np.nan
+        perda_media_fin = abs(resultado[perdeu_fin].mean()) if perdeu_fin.any() else np.nan
+        lucro_medio_perc = retorno[ganhou_perc].mean() if ganhou_perc.any() else np.nan
+        perda_media_perc = abs(retorno[perdeu_perc].mean()) if perdeu_perc.any() else np.nan
+        payoff = lucro_medio_perc / np.float64(perda_media_perc)
+        profit_factor = retorno[ganhou_perc].sum() / np.float64(abs(retorno[perdeu_perc].sum()))
+
+        return Metricas(
+            capital_inicial=capital_inicial,
+            lucro_liquido_fin=lucro_liquido_fin,
+            lucro_liquido_perc=lucro_liquido_perc,
+            rentabilidade=rentabilidade,
+            saldo_atual=capital_inicial + lucro_liquido_fin,
+            drawdown_max_pct=drawdown_max_pct,
+            drawdown_max_fin=drawdown_max_fin,
+            fator_recuperacao=float(fator_recuperacao),
+            taxa_acerto=float(taxa_acerto),
+            profit_factor=float(profit_factor),
+            payoff=float(payoff),
+            sharpe=calcular_sharpe(_retornos_por_data_entrada(data_entrada, retorno), taxa_livre_risco_aa),
+            total_operacoes=int(total_operacoes),
+            total_posicoes=int(total_posicoes),
+            maior_seq_vitorias=maior_sequencia(retorno, True),
+            maior_seq_derrotas=maior_sequencia(retorno, False),
+            lucro_medio_fin=float(lucro_medio_fin),
+            perda_media_fin=float(perda_media_fin),
+            lucro_medio_perc=float(lucro_medio_perc),
+            perda_media_perc=float(perda_media_perc),
+            lucro_fin_por_operacao=float(lucro_liquido_fin / np.float64(total_posicoes)),
+            lucro_perc_por_operacao=float(lucro_liquido_perc / np.float64(total_posicoes)),
+            expectativa_matematica=float(taxa_acerto * lucro_medio_fin - (1 - taxa_acerto) * perda_media_fin),
+            expectativa_matematica_normalizada=float(payoff * taxa_acerto - (1 - taxa_acerto)),
+            resultado_posicoes_abertas=float(resultado_posicoes_abertas),
+            capital_posicoes_abertas=float(capital_posicoes_abertas),
+            capital_atual=float(capital[-1]),
+            liquido_atual=float(liquido[-1]),
+            cagr=float(rentabilidade_periodica(datas_patrimonio, capital, frequencia_rentabilidade)['variacao'].mean()) if capital.size else np.nan,
+        )
+
+
+def calcular_metricas_lote(books, frequencia_rentabilidade='YE', taxa_livre_risco_aa=0.10, indice=None):
+    """
+    Métricas de vários TradingBooks de uma só vez: os registros de todos os books são concatenados
+    e cada métrica é uma redução agrupada pelo book, sem laço por book nos cálculos.
+
+    Parâmetros:
+    books (list[TradingBook]): books a comparar.
+    indice (list): rótulos das linhas. Padrão: 0..n-1.
+
+    Retorna:
+    pd.DataFrame: uma linha por book com as colunas de Metricas.
+    """
+    books = list(books)
+    n = len(books)
+    indice = pd.Index(range(n) if indice is None else indice)
+    if n == 0:
+        return pd.DataFrame(columns=list(Metricas.__annotations__), index=indice)
+
+    def concatenar(ledgers, coluna):
+        return np.concatenate([ledger.coluna(coluna) for ledger in ledgers])
+
+    def grupos(ledgers):
+        tamanhos = np.array([len(ledger) for ledger in ledgers])
+        return np.repeat(np.arange(n), tamanhos), np.concatenate([[0], np.cumsum(tamanhos)[:-1]]), tamanhos
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Patrimônio
+        patrimonios = [book.ledger_patrimonio for book in books]
+        livro_patrimonio, inicio_patrimonio, tamanho_patrimonio = grupos(patrimonios)
+        saldo = concatenar(patrimonios, 'saldo')
+        capital = concatenar(patrimonios, 'capital')
+        liquido = concatenar(patrimonios, 'liquido')
+        datas = concatenar(patrimonios, 'data')
+        ultimo = inicio_patrimonio + tamanho_patrimonio - 1
+        capital_inicial = capital[inicio_patrimonio]
+        picos = pd.Series(saldo).groupby(livro_patrimonio).cummax().to_numpy()
+        drawdown_fin = saldo - picos
+        drawdown_max_fin = -np.minimum.reduceat(drawdown_fin, inicio_patrimonio)
+        drawdown_max_pct = np.minimum.reduceat(drawdown_fin / picos, inicio_patrimonio) * -100
+
+        # Posições
+        posicoes = [book.ledger_posicoes for book in books]
+        livro_posicao, inicio_posicao, total_posicoes = grupos(posicoes)
+        resultado = concatenar(posicoes, 'resultado')
+        retorno = concatenar(posicoes, 'retorno')
+        data_entrada = concatenar(posicoes, 'dataEntrada')
+
+        def soma(mascara, valores):
+            return np.bincount(livro_posicao[mascara], weights=valores[mascara], minlength=n)
+
+        def contagem(mascara):
+            return np.bincount(livro_posicao[mascara], minlength=n).astype(np.float64)
+
+        lucro_liquido_fin = soma(~np.isnan(resultado), resultado)
+        lucro_liquido_perc = soma(~np.isnan(retorno), retorno)
+        rentabilidade = lucro_liquido_fin / capital_inicial * 100
+        reinvestir = np.array([book.reinvestir_lucros for book in books], dtype=bool)
+        fator_recuperacao = np.where(reinvestir, rentabilidade / drawdown_max_pct, lucro_liquido_fin / drawdown_max_fin)
+        ganhou_fin, perdeu_fin = resultado > 0, resultado <= 0
+        ganhou_perc, perdeu_perc = retorno > 0, retorno <= 0
+        taxa_acerto = contagem(ganhou_fin) / total_posicoes
+        lucro_medio_fin = soma(ganhou_fin, resultado) / contagem(ganhou_fin)
+        perda_media_fin = np.abs(soma(perdeu_fin, resultado) / contagem(perdeu_fin))
+        lucro_medio_perc = soma(ganhou_perc, retorno) / contagem(ganhou_perc)
+        perda_media_perc = np.abs(soma(perdeu_perc, retorno) / contagem(perdeu_perc))
+        payoff = lucro_medio_perc / perda_media_perc
+        profit_factor = soma(ganhou_perc, retorno) / np.abs(soma(perdeu_perc, retorno))
+
+        # Sharpe: retornos somados por (book, data de entrada)
+        por_entrada = pd.Series(np.nan_to_num(retorno)).groupby([livro_posicao, data_entrada]).sum()
+        estatisticas = por_entrada.groupby(level=0).agg(['mean', 'std', 'count']).reindex(range(n))
+        sharpe = np.where(estatisticas['count'] >= 2, (estatisticas['mean'] - taxa_livre_risco_aa / FATORES_SHARPE['diária']) / estatisticas['std'], np.nan)
+
+        # Sequências: cada book é um grupo da sequência concatenada
+        com_posicoes = total_posicoes > 0
+        seq_vitorias = np.zeros(n, dtype=np.int64)
+        seq_derrotas = np.zeros(n, dtype=np.int64)
+        seq_vitorias[com_posicoes] = maior_sequencia(retorno, True, inicio_posicao[com_posicoes])
+        seq_derrotas[com_posicoes] = maior_sequencia(retorno, False, inicio_posicao[com_posicoes])
+
+        # CAGR: capital no fechamento de cada período por book, precedido do capital inicial
+        frequencia = normalizar_frequencia(frequencia_rentabilidade)
+        serie = pd.DataFrame({'livro': livro_patrimonio, 'data': datas, 'capital': capital})
+        fechamentos = serie.groupby(['livro', pd.Grouper(key='data', freq=frequencia)])['capital'].last()
+        livro_periodo = fechamentos.index.get_level_values(0).to_numpy()
+        periodo = fechamentos.index.get_level_values(1)
+        valores = fechamentos.to_numpy()
+        primeiro = np.r_[True, livro_periodo[1:] != livro_periodo[:-1]]
+        anterior = np.where(primeiro, capital_inicial[livro_periodo], np.r_[np.nan, valores[:-1]])
+        # Períodos sem registros interrompem a série, como na reamostragem de um único book
+        consecutivo = primeiro | np.r_[False, (periodo[:-1] + pd.tseries.frequencies.to_offset(frequencia)) == periodo[1:]]
+        variacao = np.where(consecutivo, valores / anterior - 1, np.nan)
+        cagr = pd.Series(variacao).groupby(livro_periodo).mean().reindex(range(n)).to_numpy()
+
+        # Marcação a mercado no último pregão de cada book
+        ultimos_pregoes = [book.pregoes.index[-1] for book in books]
+        resultado_abertas = [book.getResultadoPosicoesAbertas(data) for book, data in zip(books, ultimos_pregoes)]
+        capital_abertas = [book.getCapitalPosicoesAbertas(data) for book, data in zip(books, ultimos_pregoes)]
+
+        colunas = {
+            'capital_inicial': capital_inicial,
+            'lucro_liquido_fin': lucro_liquido_fin,
+            'lucro_liquido_perc': lucro_liquido_perc,
+            'rentabilidade': rentabilidade,
+            'saldo_atual': capital_inicial + lucro_liquido_fin,
+            'drawdown_max_pct': drawdown_max_pct,
+            'drawdown_max_fin': drawdown_max_fin,
+            'fator_recuperacao': fator_recuperacao,
+            'taxa_acerto': taxa_acerto,
+            'profit_factor': profit_factor,
+            'payoff': payoff,
+            'sharpe': sharpe,
+            'total_operacoes': np.array([len(book.ledger_operacoes) for book in books]),
+            'total_posicoes': total_posicoes,
+            'maior_seq_vitorias': seq_vitorias,
+            'maior_seq_derrotas': seq_derrotas,
+            'lucro_medio_fin': lucro_medio_fin,
+            'perda_media_fin': perda_media_fin,
+            'lucro_medio_perc': lucro_medio_perc,
+            'perda_media_perc': perda_media_perc,
+            'lucro_fin_por_operacao': lucro_liquido_fin / total_posicoes,
+            'lucro_perc_por_operacao': lucro_liquido_perc / total_posicoes,
+            'expectativa_matematica': taxa_acerto * lucro_medio_fin - (1 - taxa_acerto) * perda_media_fin,
+            'expectativa_matematica_normalizada': payoff * taxa_acerto - (1 - taxa_acerto),
+            'resultado_posicoes_abertas': resultado_abertas,
+            'capital_posicoes_abertas': capital_abertas,
+            'capital_atual': capital[ultimo],
+            'liquido_atual': liquido[ultimo],
+            'cagr': cagr,
+        }
+    return pd.DataFrame(colunas, index=indice)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from .metricas import maior_sequencia
+
+PERCENTIS_PADRAO = (5, 25, 50, 75, 95)
+
+
+def simular_caminhos(valores, caminhos=10000, metodo='bootstrap', semente=None):
+    """
+    Reamostra a sequência de resultados das posições fechadas em 'caminhos' trajetórias.
+
+    Parâmetros:
+    valores (array): retorno (ou resultado) de cada posição fechada, na ordem original.
+    caminhos (int): quantidade de trajetórias simuladas.
+    metodo (str): 'bootstrap' (sorteio com reposição) ou 'embaralhar' (permutação da sequência original).
+    semente (int): semente do gerador, para reprodutibilidade.
+
+    Retorna:
+    np.ndarray: matriz (caminhos × posições) com uma trajetória por linha.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    valores = valores[~np.isnan(valores)]
+    gerador = np.random.default_rng(semente)
+    if metodo == 'bootstrap':
+        return valores[gerador.integers(0, valores.size, size=(caminhos, valores.size))]
+    if metodo == 'embaralhar':
+        return gerador.permuted(np.broadcast_to(valores, (caminhos, valores.size)), axis=1)
+    raise ValueError(f"Método de simulação desconhecido: {metodo}. Use 'bootstrap' ou 'embaralhar'.")
+
+
+def curvas_capital(amostras, capital_inicial, composto=True, alocacao=1.0):
+    """
+    Curvas de capital (caminhos × posições + 1) a partir das trajetórias, começando em capital_inicial.
+
+    composto=True: as amostras são retornos por posição e cada posição usa 'alocacao' do capital corrente.
+    composto=False: as amostras são resultados financeiros somados ao capital.
+    """
+    curvas = np.empty((amostras.shape[0], amostras.shape[1] + 1))
+    curvas[:, 0] = capital_inicial
+    if composto:
+        np.cumprod(1.0 + alocacao * amostras, axis=1, out=curvas[:, 1:])
+        curvas[:, 1:] *= capital_inicial
+    else:
+        np.cumsum(amostras, axis=1, out=curvas[:, 1:])
+        curvas[:, 1:] += capital_inicial
+    return curvas
+
+
+def drawdown_maximo(curvas):
+    """Drawdown máximo (fração positiva do pico) de cada curva."""
+    picos = np.maximum.accumulate(curvas, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.nan_to_num(1.0 - curvas / picos).max(axis=1)
+
+
+def analisar(valores, capital_inicial, caminhos=10000, metodo='bootstrap', composto=True, alocacao=1.0, percentis=PERCENTIS_PADRAO, semente=None, bloco=2000):
+    """
+    Análise de Monte Carlo dos resultados das posições fechadas.
+
+    As trajetórias são processadas em blocos de 'bloco' caminhos (cada bloco inteiramente vetorizado)
+    para limitar a memória das matrizes de curvas.
+
+    Retorna:
+    tuple: (pd.DataFrame com as métricas de cada caminho, pd.DataFrame com os percentis de cada métrica)
+    """
+    gerador = np.random.default_rng(semente)
+    partes = []
+    for inicio in range(0, caminhos, bloco):
+        amostras = simular_caminhos(valores, min(bloco, caminhos - inicio), metodo, gerador)
+        curvas = curvas_capital(amostras, capital_inicial, composto, alocacao)
+        partes.append(pd.DataFrame({
+            'capital_final': curvas[:, -1],
+            'retorno_total': curvas[:, -1] / capital_inicial - 1.0,
+            'drawdown_maximo': drawdown_maximo(curvas),
+            'maior_seq_vitorias': maior_sequencia(amostras, True),
+            'maior_seq_derrotas': maior_sequencia(amostras, False),
+        }))
+    por_caminho = pd.concat(partes, ignore_index=True)
+    resumo = pd.DataFrame(np.percentile(por_caminho.to_numpy(dtype=np.float64), percentis, axis=0), index=pd.Index(percentis, name='percentil'), columns=por_caminho.columns)
+    return por_caminho, resumo
+
+
+def analisar_book(book, coluna='retorno', caminhos=10000, metodo='bootstrap', alocacao=None, percentis=PERCENTIS_PADRAO, semente=None):
+    """
+    Monte Carlo das posições fechadas de um TradingBook.
+
+    coluna='retorno' compõe os retornos com alocação padrão de 1/diversificacao_maxima do capital por posição;
+    coluna='resultado' soma os resultados financeiros ao capital inicial.
+    """
+    posicoes = book.posicoes
+    fechadas = posicoes.loc[posicoes['dataSaida'].notna()].sort_values('dataSaida', kind='stable')
+    capital_inicial = float(book.patrimonio['capital'].iloc[0])
+    composto = coluna == 'retorno'
+    if alocacao is None:
+        alocacao = 1.0 / book.diversificacao_maxima
+    return analisar(fechadas[coluna].to_numpy(dtype=np.float64), capital_inicial, caminhos, metodo, composto, alocacao, percentis, semente)
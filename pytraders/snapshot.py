@@ -0,0 +1,198 @@
+import importlib
+import json
+import os
+from fractions import Fraction
+import numpy as np
+import pandas as pd
+from .ledger import Ledger
+from .curva_capital import CurvaCapitalDiaria
+from .marcacao_mercado import MarcacaoMercado
+from .trading_book import TradingBook
+
+VERSAO_SNAPSHOT = 1
+ARQUIVO_MANIFESTO = 'manifesto.json'
+LEDGERS_BOOK = ('ledger_patrimonio', 'ledger_posicoes', 'ledger_operacoes')
+PARAMETROS_BOOK = ('indice_b3', 'data_inicio', 'data_fim', 'diversificacao_maxima', 'reinvestir_lucros', 'taxa_custo_operacional',
+                   'filtrar_operacao_curva_capital', 'sma_curva_capital', 'slippage')
+PARAMETROS_CARTEIRA = ('indice_b3', 'data_inicio', 'data_fim', 'filtrar_operacao_curva_capital', 'ultimo_pregao_processado')
+ARRAYS_MARCACAO = ('colunas', 'volume_sinal', 'volume', 'preco_entrada')
+
+# Formato do snapshot (um diretório):
+# manifesto.json                   : versão, parâmetros, categorias dos registros e estado escalar
+#                                    (dia corrente da curva de capital, filtro, posições abertas)
+# <book>.<registro>.<coluna>.npy   : uma coluna tipada por arquivo (float64, datetime64[ns] ou códigos int32)
+
+
+def _para_json(valor):
+    if isinstance(valor, dict):
+        return {chave: _para_json(item) for chave, item in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_para_json(item) for item in valor]
+    if isinstance(valor, Fraction):
+        # Soma exata da média móvel simples: numerador e denominador podem exceder 64 bits
+        return {'fracao': [str(valor.numerator), str(valor.denominator)]}
+    if isinstance(valor, np.ndarray):
+        return {'array': valor.tolist(), 'dtype': str(valor.dtype)}
+    if isinstance(valor, (pd.Timestamp, np.datetime64)):
+        return {'data': pd.Timestamp(valor).isoformat()}
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def _de_json(valor):
+    if isinstance(valor, dict):
+        if valor.keys() == {'fracao'}:
+            return Fraction(int(valor['fracao'][0]), int(valor['fracao'][1]))
+        if valor.keys() == {'array', 'dtype'}:
+            return np.array(valor['array'], dtype=valor['dtype'])
+        if valor.keys() == {'data'}:
+            return pd.Timestamp(valor['data'])
+        return {chave: _de_json(item) for chave, item in valor.items()}
+    if isinstance(valor, list):
+        return [_de_json(item) for item in valor]
+    return valor
+
+
+def _gravar_ledger(diretorio, prefixo, ledger):
+    for nome in ledger.colunas:
+        # Substituição atômica: um snapshot anterior pode estar mapeado em memória por outra carteira
+        caminho = os.path.join(diretorio, f'{prefixo}.{nome}.npy')
+        np.save(caminho + '.tmp.npy', ledger.coluna(nome))
+        os.replace(caminho + '.tmp.npy', caminho)
+    return {'colunas': ledger.colunas, 'tamanho': len(ledger), 'categorias': ledger.categorias}
+
+
+def _ler_ledger(diretorio, prefixo, estado, mmap):
+    # Cópia na escrita: alterações posteriores (inclusões, arredondamentos) não atingem o snapshot
+    modo = 'c' if mmap and estado['tamanho'] > 0 else None
+    arrays = {nome: np.load(os.path.join(diretorio, f'{prefixo}.{nome}.npy'), mmap_mode=modo) for nome in estado['colunas']}
+    return Ledger.restaurar(estado['colunas'], arrays, estado['categorias'])
+
+
+def _gravar_book(diretorio, prefixo, book):
+    if book.em_lote:
+        raise RuntimeError("O book tem um lote de ordens aberto; confirme o lote antes de gravar o snapshot.")
+    curva = book.curva_capital
+    filtro = curva.filtro
+    marcacao = book.marcacao_mercado
+    return {
+        'parametros': {nome: getattr(book, nome) for nome in PARAMETROS_BOOK},
+        'ledgers': {nome: _gravar_ledger(diretorio, f'{prefixo}.{nome}', getattr(book, nome)) for nome in LEDGERS_BOOK},
+        'posicoes_abertas': book.posicoes_abertas,
+        'curva_capital': {
+            'dias': _gravar_ledger(diretorio, f'{prefixo}.curva_capital', curva.dias),
+            'data': curva.data,
+            'saldo': curva.saldo,
+            'capital': curva.capital,
+            'filtro': {'classe': f'{type(filtro).__module__}:{type(filtro).__qualname__}', 'atributos': vars(filtro)},
+        },
+        'marcacao_mercado': {
+            'ativos': marcacao.ativos,
+            **{nome: getattr(marcacao, nome)[:marcacao.quantidade] for nome in ARRAYS_MARCACAO},
+        },
+    }
+
+
+def _ler_book(diretorio, prefixo, estado, pregoes, mmap, matriz_precos=None):
+    book = TradingBook.__new__(TradingBook)
+    for nome, valor in estado['parametros'].items():
+        setattr(book, nome, valor)
+    book.pregoes = pregoes
+    for nome in LEDGERS_BOOK:
+        setattr(book, nome, _ler_ledger(diretorio, f'{prefixo}.{nome}', estado['ledgers'][nome], mmap))
+    book.posicoes_abertas = dict(estado['posicoes_abertas'])
+
+    estado_curva = estado['curva_capital']
+    modulo, classe = estado_curva['filtro']['classe'].split(':')
+    classe_filtro = getattr(importlib.import_module(modulo), classe)
+    filtro = classe_filtro.__new__(classe_filtro)
+    vars(filtro).update(estado_curva['filtro']['atributos'])
+    curva = CurvaCapitalDiaria(filtro)
+    curva.dias = _ler_ledger(diretorio, f'{prefixo}.curva_capital', estado_curva['dias'], mmap)
+    curva.data, curva.saldo, curva.capital = estado_curva['data'], estado_curva['saldo'], estado_curva['capital']
+    book.curva_capital = curva
+
+    estado_marcacao = estado['marcacao_mercado']
+    quantidade = len(estado_marcacao['ativos'])
+    marcacao = MarcacaoMercado(max(64, quantidade))
+    marcacao.ativos = list(estado_marcacao['ativos'])
+    for nome in ARRAYS_MARCACAO:
+        getattr(marcacao, nome)[:quantidade] = estado_marcacao[nome]
+    marcacao.quantidade = quantidade
+    book.marcacao_mercado = marcacao
+    if pregoes is not None:
+        if matriz_precos is not None:
+            book.matriz_precos = matriz_precos
+        # As colunas da marcação a mercado são relativas à matriz de preços dos pregões informados
+        marcacao.colunas[:quantidade] = [book.matriz_precos.coluna(ativo) for ativo in marcacao.ativos]
+    return book
+
+
+def salvar_snapshot(objeto, diretorio):
+    """
+    Grava o estado completo de uma Carteira ou TradingBook em 'diretorio': registros de patrimônio,
+    posições e operações em arrays tipados (categorias como códigos int32 e dicionário), curva de
+    capital diária com o estado do filtro, posições abertas e parâmetros. Pregoes e cotações não são
+    gravados. O manifesto é gravado por último, de modo que um snapshot incompleto não é lido.
+
+    Parâmetros:
+    objeto (Carteira ou TradingBook): objeto a ser gravado.
+    diretorio (str): diretório de destino (criado se não existir).
+
+    Retorna:
+    str: caminho do manifesto.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    if isinstance(objeto, TradingBook):
+        manifesto = {'tipo': 'TradingBook', 'books': {'book': _gravar_book(diretorio, 'book', objeto)}}
+    else:
+        books = {'book_execucao': _gravar_book(diretorio, 'book_execucao', objeto.book_execucao)}
+        # Sem filtro de curva de capital a referência é o próprio book de execução
+        books['book_referencia'] = None if objeto.book_referencia is objeto.book_execucao else _gravar_book(diretorio, 'book_referencia', objeto.book_referencia)
+        manifesto = {'tipo': 'Carteira', 'carteira': {nome: getattr(objeto, nome) for nome in PARAMETROS_CARTEIRA}, 'books': books}
+    manifesto['versao'] = VERSAO_SNAPSHOT
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w') as arquivo:
+        json.dump(_para_json(manifesto), arquivo, indent=1)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def carregar_snapshot(diretorio, pregoes=None, mmap=True, **parametros_carteira):
+    """
+    Restaura uma Carteira ou TradingBook gravado por salvar_snapshot.
+
+    Parâmetros:
+    diretorio (str): diretório do snapshot.
+    pregoes (pd.DataFrame): pregões para a marcação a mercado e a continuação do backtest. Sem eles,
+        registros, métricas realizadas e curva de capital ficam disponíveis, mas não a avaliação das posições abertas.
+    mmap (bool): mapeia os arrays em memória (cópia na escrita) em vez de lê-los.
+    parametros_carteira: repassados ao construtor da Carteira (provedor_cotacoes, diretorio_cache, ...).
+
+    Retorna:
+    Carteira ou TradingBook.
+    """
+    with open(os.path.join(diretorio, ARQUIVO_MANIFESTO)) as arquivo:
+        manifesto = _de_json(json.load(arquivo))
+    if manifesto.get('versao') != VERSAO_SNAPSHOT:
+        raise ValueError(f"Versão de snapshot não suportada: {manifesto.get('versao')} (esperada {VERSAO_SNAPSHOT}).")
+    books = manifesto['books']
+    if manifesto['tipo'] == 'TradingBook':
+        return _ler_book(diretorio, 'book', books['book'], pregoes, mmap)
+
+    from .carteira import Carteira
+    parametros = manifesto['carteira']
+    carteira = Carteira(parametros['indice_b3'], parametros['data_inicio'], parametros['data_fim'], **parametros_carteira)
+    carteira.filtrar_operacao_curva_capital = parametros['filtrar_operacao_curva_capital']
+    carteira.pregoes = pregoes
+    carteira.book_execucao = _ler_book(diretorio, 'book_execucao', books['book_execucao'], pregoes, mmap)
+    if books['book_referencia'] is None:
+        carteira.book_referencia = carteira.book_execucao
+    else:
+        # Os dois books voltam a compartilhar a mesma matriz de preços
+        matriz_precos = carteira.book_execucao.matriz_precos if pregoes is not None else None
+        carteira.book_referencia = _ler_book(diretorio, 'book_referencia', books['book_referencia'], pregoes, mmap, matriz_precos)
+    carteira.ultimo_pregao_processado = parametros['ultimo_pregao_processado']
+    return carteira
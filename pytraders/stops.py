@@ -0,0 +1,73 @@
+import numpy as np
+from .marcacao_mercado import MatrizPrecos
+
+STOP_LOSS = 'STOP_LOSS'
+STOP_GAIN = 'STOP_GAIN'
+
+
+def avaliar_stops(compra, abertura, maxima, minima, stop_loss, stop_gain):
+    """
+    Avalia de uma vez os stops de todas as posições abertas em um pregão.
+
+    Regras (espelhadas para posições vendidas):
+    - stop loss é atingido quando a mínima (BUY) ou a máxima (SELL) alcança o stop; stop gain, quando
+      a máxima (BUY) ou a mínima (SELL) alcança o alvo;
+    - abertura além do stop (gap) executa na abertura, pois é o primeiro preço disponível;
+    - se os dois stops são alcançados no pregão sem gap, prevalece o stop loss (não se sabe qual veio antes);
+    - stops NaN e cotações ausentes nunca disparam.
+
+    Parâmetros:
+    compra (np.ndarray): True para posições BUY, False para SELL.
+    abertura, maxima, minima (np.ndarray): cotações do pregão de cada posição.
+    stop_loss, stop_gain (np.ndarray): stops de cada posição.
+
+    Retorna:
+    tuple: (perda, ganho, preco) — máscaras dos stops disparados e o preço de saída de cada posição
+    (NaN nas não disparadas).
+    """
+    sinal = np.where(compra, 1.0, -1.0)
+    adverso = np.where(compra, minima, maxima)
+    favoravel = np.where(compra, maxima, minima)
+    with np.errstate(invalid='ignore'):
+        # Comparações com NaN resultam em False
+        atingiu_perda = sinal * adverso <= sinal * stop_loss
+        atingiu_ganho = sinal * favoravel >= sinal * stop_gain
+        gap_perda = sinal * abertura <= sinal * stop_loss
+        gap_ganho = sinal * abertura >= sinal * stop_gain
+    # Gap sobre o alvo executa o ganho na abertura, antes de qualquer mínima/máxima do pregão
+    ganho = gap_ganho | (atingiu_ganho & ~atingiu_perda)
+    perda = atingiu_perda & ~gap_ganho
+    preco = np.full(len(sinal), np.nan)
+    preco[perda] = np.where(gap_perda, abertura, stop_loss)[perda]
+    preco[ganho] = np.where(gap_ganho, abertura, stop_gain)[ganho]
+    return perda, ganho, preco
+
+
+def apertar_stops(compra, stop_loss, candidatos):
+    """Novo stop loss de cada posição: o candidato só substitui o atual quando o aproxima do preço (nunca afrouxa)."""
+    with np.errstate(invalid='ignore'):
+        melhor = np.where(compra, candidatos > stop_loss, candidatos < stop_loss) | (np.isnan(stop_loss) & ~np.isnan(candidatos))
+    return np.where(melhor, candidatos, stop_loss), melhor
+
+
+class AvaliadorStops:
+    """Matrizes de abertura, máxima e mínima de pregoes, extraídas uma única vez para a avaliação diária dos stops."""
+
+    CAMPOS = ('Open', 'High', 'Low')
+
+    def __init__(self, pregoes):
+        self.matrizes = {campo: MatrizPrecos(pregoes, campo) for campo in self.CAMPOS}
+
+    def anexar(self, pregoes):
+        for matriz in self.matrizes.values():
+            matriz.anexar(pregoes)
+
+    def cotacoes(self, pregao, ativos):
+        """(abertura, maxima, minima) do pregão para cada ativo; NaN para ativos ausentes de pregoes."""
+        resultado = []
+        for campo in self.CAMPOS:
+            matriz = self.matrizes[campo]
+            colunas = np.array([matriz.coluna(ativo) for ativo in ativos], dtype=np.int64)
+            valores = matriz.valores[matriz.linha(pregao), colunas]
+            resultado.append(np.where(colunas >= 0, valores, np.nan))
+        return resultado
@@ -1,10 +1,17 @@
 from datetime import datetime
 import pandas as pd
 import numpy as np
-from matplotlib import pyplot as plt
+from .alocacao import dimensionar
+from .ledger import Ledger
+from .curva_capital import CurvaCapitalDiaria, criar_filtro
+from .marcacao_mercado import MatrizPrecos, MarcacaoMercado, serie_marcacao_mercado
+from .metricas import calcular_metricas, maior_sequencia, rentabilidade_periodica
 
 class TradingBook:
-    def __init__(self, indice_b3, data_inicio, data_fim, capital_inicial, diversificacao_maxima, reinvestir_lucros, taxa_custo_operacional, pregoes, filtrar_operacao_curva_capital=False, sma_curva_capital=5, slippage=0.0):
+    # Eventos de patrimônio do lote de ordens aberto (None fora de lote), como dicionários das colunas de ledger_patrimonio
+    __lote = None
+
+    def __init__(self, indice_b3, data_inicio, data_fim, capital_inicial, diversificacao_maxima, reinvestir_lucros, taxa_custo_operacional, pregoes, filtrar_operacao_curva_capital=False, sma_curva_capital=5, slippage=0.0, filtro_curva_capital='SMA', matriz_precos=None):
         self.indice_b3 = indice_b3
         self.data_inicio = data_inicio
         self.data_fim = data_fim
@@ -12,6 +19,10 @@ class TradingBook:
         self.reinvestir_lucros = reinvestir_lucros
         self.taxa_custo_operacional = taxa_custo_operacional
         self.pregoes = pregoes
+        # Matriz de preços opcionalmente compartilhada com outro book sobre os mesmos pregões
+        self.__matriz_precos = matriz_precos
+        # Posições abertas em arrays para a marcação a mercado diária
+        self.marcacao_mercado = MarcacaoMercado()
         self.filtrar_operacao_curva_capital = filtrar_operacao_curva_capital
         self.sma_curva_capital = sma_curva_capital
         self.slippage = slippage
@@ -20,46 +31,86 @@ class TradingBook:
         # liquido: valor em conta corrente disponível para compras
         # saldo: demonstra evolução do capital considerando somente o saldo de posições fechadas
         # capital: demonstra evolução do capital considerando também a cotação das posições abertas
-        self.patrimonio = pd.DataFrame(columns=['data', 'liquido', 'saldo', 'capital'])
-        # Dataframe das posições
-        self.posicoes = pd.DataFrame(columns=('ativo', 'tipo', 'volume', 'dataEntrada', 'precoEntrada', 'dataSaida', 'precoSaida', 'resultado', 'retorno', 'forcaRelativa', 'stopLoss', 'stopGain'))
-        # Dataframe das operações
-        self.operacoes = pd.DataFrame(columns=['data', 'ativo', 'tipo', 'direcao', 'volume', 'preco', 'custo'])
-        # Dataframe de Resumo Diário (Curva de Capital consolidada)
-        # Index será a Data (DatetimeIndex) para facilitar o resampling e upsert
-        self.capital_diario = pd.DataFrame(columns=['saldo', 'capital', 'media_movel_5d'])
-        self.capital_diario.index.name = 'data'
+        # Os registros são colunares (arrays NumPy) e os dataframes são montados sob demanda
+        self.ledger_patrimonio = Ledger({'data': 'data', 'liquido': 'float', 'saldo': 'float', 'capital': 'float'})
+        # Registro das posições
+        self.ledger_posicoes = Ledger({
+            'ativo': 'categoria', 'tipo': 'categoria', 'volume': 'float', 'dataEntrada': 'data', 'precoEntrada': 'float',
+            'dataSaida': 'data', 'precoSaida': 'float', 'resultado': 'float', 'retorno': 'float', 'forcaRelativa': 'float',
+            'stopLoss': 'float', 'stopGain': 'float'
+        })
+        # Registro das operações
+        self.ledger_operacoes = Ledger({
+            'data': 'data', 'ativo': 'categoria', 'tipo': 'categoria', 'direcao': 'categoria', 'volume': 'float',
+            'preco': 'float', 'custo': 'float'
+        })
+        # Índice das posições abertas: ativo -> linha do registro de posições
+        self.posicoes_abertas = {}
+        # Resumo Diário (Curva de Capital consolidada) mantido de forma incremental
+        # filtro_curva_capital: 'SMA', 'EMA' ou uma instância de FiltroCurvaCapital, com janela sma_curva_capital
+        self.curva_capital = CurvaCapitalDiaria(criar_filtro(filtro_curva_capital, sma_curva_capital))
         self.atualizarPatrimonio(pd.to_datetime(self.data_inicio), 'DEPOSIT', capital_inicial)
 
-    # Nova função privada para gerenciar a lógica de média móvel e dia único
-    def __atualizar_capital_diario(self, data, saldo, capital):
-        # Normaliza para garantir que horas não dupliquem linhas (apenas a data importa para curva diária)
-        data_normalizada = pd.to_datetime(data).normalize()
-
-        # Atualiza ou Cria a linha para este dia (Upsert)
-        # Usamos .loc para garantir que se houver 10 trades no dia, ficaremos com o valor do último (fechamento do dia)
-        self.capital_diario.loc[data_normalizada, 'saldo'] = float(saldo)
-        self.capital_diario.loc[data_normalizada, 'capital'] = float(capital)
+    @property
+    def pregoes(self):
+        return self.__pregoes
 
-        # Lógica da Média Móvel Simples de 5 períodos (SMA 5)
-        # Pegamos as últimas 5 linhas da coluna saldo.
-        # Como acabamos de atualizar a linha atual (data_normalizada), ela já está incluída no tail(5)
-        window = self.capital_diario['saldo'].tail(self.sma_curva_capital)
+    @pregoes.setter
+    def pregoes(self, pregoes):
+        self.__pregoes = pregoes
+        self.__matriz_precos = None
 
-        if len(window) == 5:
-            media_movel = window.mean()
-        else:
-            # Opcional: Se quiser média expandida enquanto não tem 5 dias, use window.mean()
-            # Se quiser NaN estrito até ter 5 dias, use np.nan
-            media_movel = np.nan
-
-        self.capital_diario.loc[data_normalizada, 'media_movel_5d'] = media_movel
+    def anexar_pregoes(self, pregoes, novos):
+        """
+        Substitui pregoes pela versão estendida sem descartar a matriz de preços, que recebe apenas
+        as linhas novas. Posições abertas, registros e curva de capital são mantidos.
+        """
+        self.__pregoes = pregoes
+        if self.__matriz_precos is not None:
+            self.__matriz_precos.anexar(novos)
+
+    @property
+    def matriz_precos(self):
+        # Matriz de fechamentos extraída de pregoes somente quando a primeira marcação a mercado é necessária
+        if self.__matriz_precos is None:
+            self.__matriz_precos = MatrizPrecos(self.__pregoes)
+        return self.__matriz_precos
+
+    @matriz_precos.setter
+    def matriz_precos(self, matriz_precos):
+        # Compartilhamento da matriz entre books sobre os mesmos pregões
+        self.__matriz_precos = matriz_precos
+
+    # patrimonio, posicoes e operacoes retornam cópias: alterá-las não afeta o DataFrame em cache no registro.
+    # São somente leitura; os registros são alterados pelas operações do book (ex: arredondar_casas_decimais).
+    @property
+    def patrimonio(self):
+        return self.ledger_patrimonio.to_frame().copy()
+
+    @property
+    def capital_diario(self):
+        # Dataframe indexado pela data (DatetimeIndex), montado somente quando lido
+        return self.curva_capital.to_frame()
+
+    @property
+    def posicoes(self):
+        return self.ledger_posicoes.to_frame().copy()
+
+    @property
+    def operacoes(self):
+        return self.ledger_operacoes.to_frame().copy()
+
+    def __ultimo_patrimonio(self, coluna):
+        # Dentro de um lote, o patrimônio corrente é o do último evento ainda não gravado
+        if self.__lote:
+            return self.__lote[-1][coluna]
+        return self.ledger_patrimonio.valor(-1, coluna) if (len(self.ledger_patrimonio) > 0) else 0
 
     # Funções de controle da evolução do patrimônio
     def atualizarPatrimonio(self, data, operacao, valor):
-        liquidoAtual = self.patrimonio['liquido'].iloc[-1] if (self.patrimonio.liquido.size > 0) else 0
-        saldoAtual = self.patrimonio['saldo'].iloc[-1] if (self.patrimonio.saldo.size > 0) else 0
-        capitalAtual = self.patrimonio['capital'].iloc[-1] if (self.patrimonio.capital.size > 0) else 0
+        liquidoAtual = self.__ultimo_patrimonio('liquido')
+        saldoAtual = self.__ultimo_patrimonio('saldo')
+        capitalAtual = self.__ultimo_patrimonio('capital')
         if (operacao == 'DEPOSIT'):
             liquidoAtual = liquidoAtual + valor
             capitalAtual = capitalAtual + valor
@@ -75,16 +126,57 @@ class TradingBook:
         elif (operacao == 'INC_CAPITAL'): 
             capitalAtual = saldoAtual + valor
 
-        atualizacao = pd.Series({
-            'data': data,
-            'liquido': liquidoAtual,
-            'saldo': saldoAtual,
-            'capital': capitalAtual
-        })
-        self.patrimonio = pd.concat([self.patrimonio, atualizacao.to_frame().T], ignore_index=True)
+        if self.__lote is not None:
+            # Gravação adiada para confirmar_lote; as verificações seguintes já enxergam o novo patrimônio
+            self.__lote.append({'data': data, 'liquido': liquidoAtual, 'saldo': saldoAtual, 'capital': capitalAtual})
+            return
+
+        self.ledger_patrimonio.adicionar(data=data, liquido=liquidoAtual, saldo=saldoAtual, capital=capitalAtual)
+
+        # Alimenta a curva diária consolidada após o registro do evento
+        self.curva_capital.atualizar(data, saldoAtual, capitalAtual)
+
+    @property
+    def em_lote(self):
+        return self.__lote is not None
+
+    def iniciar_lote(self):
+        """
+        Abre um lote de ordens (ex: as aberturas e os fechamentos de um pregão). Posições e operações são
+        registradas normalmente a cada ordem, mas os eventos de patrimônio ficam pendentes até confirmar_lote.
+        temSaldoLiquido e getVolumeOperacao consideram os eventos pendentes, de modo que as verificações de
+        saldo e de diversificação continuam valendo na ordem das ordens.
+        """
+        if self.__lote is not None:
+            raise RuntimeError("Já existe um lote de ordens aberto neste book.")
+        self.__lote = []
 
-        # Alimenta o dataframe diário consolidado após o registro do evento
-        self.__atualizar_capital_diario(data, saldoAtual, capitalAtual)
+    def confirmar_lote(self, consolidar=True):
+        """
+        Grava os eventos de patrimônio do lote aberto por iniciar_lote e atualiza a curva de capital diária
+        uma vez por dia.
+
+        Parâmetros:
+        consolidar (bool): grava um único registro por dia, com o patrimônio após o último evento do dia;
+            com False, grava um registro por evento, como fora de lote.
+
+        Retorna:
+        int: quantidade de registros gravados em ledger_patrimonio.
+        """
+        eventos, self.__lote = self.__lote, None
+        if not eventos:
+            return 0
+        # Último evento de cada dia (a curva diária só considera o fechamento do dia); as ordens de um
+        # pregão normalmente compartilham a mesma data, dispensando a normalização
+        datas = [evento['data'] for evento in eventos]
+        fechamentos = [k for k in range(len(datas) - 1)
+                       if datas[k] != datas[k + 1] and pd.Timestamp(datas[k]).normalize() != pd.Timestamp(datas[k + 1]).normalize()]
+        fechamentos.append(len(datas) - 1)
+        for k in (fechamentos if consolidar else range(len(eventos))):
+            self.ledger_patrimonio.adicionar(**eventos[k])
+        for k in fechamentos:
+            self.curva_capital.atualizar(eventos[k]['data'], eventos[k]['saldo'], eventos[k]['capital'])
+        return len(fechamentos) if consolidar else len(eventos)
 
     def curva_capital_acima_media_movel(self, data_ignorada=None):
         """
@@ -92,33 +184,10 @@ class TradingBook:
         Permite ignorar uma data específica (ex: data atual em um backtest), 
         olhando para o registro imediatamente anterior.
         """
-        if self.capital_diario.empty:
-            return True
-        # Pega a data do último registro existente
-        ultimo_indice_df = self.capital_diario.index[-1]
-        # Define o índice padrão como o último (-1)
-        idx_alvo = -1
-        # Normaliza a data recebida para garantir compatibilidade com o índice
-        if (data_ignorada is not None):
-            dt_ignorada = pd.to_datetime(data_ignorada).normalize()
-            # Verifica se o último registro deve ser ignorado
-            if ultimo_indice_df == dt_ignorada:
-                # Se só existe uma linha e ela é a data ignorada, tratamos como sem dados (True)
-                if len(self.capital_diario) < 2:
-                    return True
-                # Caso contrário, olhamos para a penúltima linha
-                idx_alvo = -2
-        # Obtém a linha alvo
-        linha_alvo = self.capital_diario.iloc[idx_alvo]
-        saldo_atual = linha_alvo['saldo']
-        media_movel_5d = linha_alvo['media_movel_5d']
-        # Se a média móvel for NaN (início da série), permite a operação
-        if pd.isna(media_movel_5d):
-            return True
-        return saldo_atual >= media_movel_5d
+        return self.curva_capital.acima_media_movel(data_ignorada)
 
     def temSaldoLiquido(self, valor):
-        liquidoAtual = self.patrimonio['liquido'].iloc[-1] if (self.patrimonio.liquido.size > 0) else 0
+        liquidoAtual = self.__ultimo_patrimonio('liquido')
         return True if (liquidoAtual >= valor) else False
 
     # Funções de controle das posições
@@ -131,30 +200,28 @@ class TradingBook:
             precoEntrada = precoEntrada - self.slippage
 
         # Grava nova posição aberta
-        novaPosicao = pd.Series({
-            'ativo'        : ativo,
-            'tipo'         : tipo,
-            'volume'       : volume,
-            'dataEntrada'  : dataEntrada,
-            'precoEntrada' : precoEntrada,
-            'forcaRelativa': forcaRelativa,
-            'stopLoss'     : stopLoss,
-            'stopGain'     : stopGain
-        })
+        self.posicoes_abertas[ativo] = self.ledger_posicoes.adicionar(
+            ativo         = ativo,
+            tipo          = tipo,
+            volume        = volume,
+            dataEntrada   = dataEntrada,
+            precoEntrada  = precoEntrada,
+            forcaRelativa = forcaRelativa,
+            stopLoss      = stopLoss,
+            stopGain      = stopGain
+        )
+        self.marcacao_mercado.abrir(ativo, self.matriz_precos.coluna(ativo), tipo, volume, precoEntrada)
 
         custo_operacional = volume * precoEntrada * self.taxa_custo_operacional
-        novaOperacao = pd.Series({
-            'data'    : dataEntrada,
-            'ativo'   : ativo,
-            'tipo'    : tipo,
-            'direcao' : 'IN',
-            'volume'  : volume,
-            'preco'   : precoEntrada,
-            'custo'   : custo_operacional
-        })
-            
-        self.posicoes = pd.concat([self.posicoes, novaPosicao.to_frame().T], ignore_index=True)
-        self.operacoes = pd.concat([self.operacoes, novaOperacao.to_frame().T], ignore_index=True)
+        self.ledger_operacoes.adicionar(
+            data    = dataEntrada,
+            ativo   = ativo,
+            tipo    = tipo,
+            direcao = 'IN',
+            volume  = volume,
+            preco   = precoEntrada,
+            custo   = custo_operacional
+        )
 
         if tipo == 'BUY':
             self.atualizarPatrimonio(dataEntrada, 'DEC_LIQUIDO', (volume * precoEntrada) + custo_operacional)
@@ -167,9 +234,10 @@ class TradingBook:
         if (type(dataSaida) == str):
             dataSaida = datetime.strptime(dataSaida, '%Y-%m-%d')
 
-        posicaoAberta = (self.posicoes['ativo'] == ativo) & self.posicoes['precoSaida'].isna()
-        if (self.posicoes.loc[posicaoAberta, 'dataEntrada'].size == 1):
-            tipo_posicao_aberta = self.posicoes.loc[posicaoAberta, 'tipo'].values[0]
+        linha = self.posicoes_abertas.pop(ativo, None)
+        if (linha is not None):
+            self.marcacao_mercado.fechar(ativo)
+            tipo_posicao_aberta = self.ledger_posicoes.valor(linha, 'tipo')
             tipo_operacao_saida = 'SELL' if tipo_posicao_aberta == 'BUY' else 'BUY'
             if tipo_operacao_saida == 'BUY':
                 precoSaida = precoSaida + self.slippage
@@ -177,26 +245,25 @@ class TradingBook:
                 precoSaida = precoSaida - self.slippage
             
             # Atualiza a posição fechando-a
-            self.posicoes.loc[posicaoAberta, 'dataSaida'] = dataSaida
-            self.posicoes.loc[posicaoAberta, 'precoSaida'] = precoSaida
-            precoEntrada = self.posicoes.loc[posicaoAberta, 'precoEntrada'].values[0]
-            volume = self.posicoes.loc[posicaoAberta, 'volume'].values[0]
+            self.ledger_posicoes.atualizar(linha, 'dataSaida', dataSaida)
+            self.ledger_posicoes.atualizar(linha, 'precoSaida', precoSaida)
+            precoEntrada = self.ledger_posicoes.valor(linha, 'precoEntrada')
+            volume = self.ledger_posicoes.valor(linha, 'volume')
             custo_operacional = volume * precoSaida * self.taxa_custo_operacional
             lucro = (precoSaida - precoEntrada) if tipo_posicao_aberta == "BUY" else (precoEntrada - precoSaida)
             resultado = lucro * volume
-            self.posicoes.loc[posicaoAberta, 'resultado'] = round(resultado, 2)
-            self.posicoes.loc[posicaoAberta, 'retorno'] = round(lucro / precoEntrada, 4)
+            self.ledger_posicoes.atualizar(linha, 'resultado', round(resultado, 2))
+            self.ledger_posicoes.atualizar(linha, 'retorno', round(lucro / precoEntrada, 4))
             # Grava nova operação
-            novaOperacao = pd.Series({
-                'data'    : dataSaida,
-                'ativo'   : ativo,
-                'tipo'    : tipo_operacao_saida,
-                'direcao' : 'OUT',
-                'volume'  : volume,
-                'preco'   : precoSaida,
-                'custo'   : custo_operacional
-            })
-            self.operacoes = pd.concat([self.operacoes, novaOperacao.to_frame().T], ignore_index=True)
+            self.ledger_operacoes.adicionar(
+                data    = dataSaida,
+                ativo   = ativo,
+                tipo    = tipo_operacao_saida,
+                direcao = 'OUT',
+                volume  = volume,
+                preco   = precoSaida,
+                custo   = custo_operacional
+            )
             # Atualiza patrimônio
             if tipo_posicao_aberta == 'BUY':
                 self.atualizarPatrimonio(dataSaida, 'INC_LIQUIDO', (volume * precoSaida) - custo_operacional)
@@ -207,33 +274,33 @@ class TradingBook:
         return resultado
 
     def temPosicaoAberta(self, ativo):
-        return True if self.posicoes.loc[(self.posicoes['ativo'] == ativo) & self.posicoes['precoSaida'].isna(), 'tipo'].size == 1 else False
+        return ativo in self.posicoes_abertas
 
     def getStopLossPosicaoAberta(self, ativo):
-        return self.posicoes.loc[(self.posicoes['ativo'] == ativo) & self.posicoes['precoSaida'].isna(), 'stopLoss'].iloc[0]
+        return self.ledger_posicoes.valor(self.posicoes_abertas[ativo], 'stopLoss')
 
     def getStopGainPosicaoAberta(self, ativo):
-        return self.posicoes.loc[(self.posicoes['ativo'] == ativo) & self.posicoes['precoSaida'].isna(), 'stopGain'].iloc[0]
+        return self.ledger_posicoes.valor(self.posicoes_abertas[ativo], 'stopGain')
 
     def subirStopLossPosicaoAberta(self, ativo, novoStopLoss):
-        posicaoAberta = (self.posicoes['ativo'] == ativo) & self.posicoes['precoSaida'].isna()
-        if (self.posicoes.loc[posicaoAberta, 'dataEntrada'].size == 1):
+        linha = self.posicoes_abertas.get(ativo)
+        if (linha is not None):
             # Atualiza stoploss da posição
-            self.posicoes.loc[posicaoAberta, 'stopLoss'] = novoStopLoss
+            self.ledger_posicoes.atualizar(linha, 'stopLoss', novoStopLoss)
 
     def getQuantidadePosicoesAbertas(self):
-        return self.posicoes.loc[self.posicoes['precoSaida'].isna(), 'ativo'].count()
+        return len(self.posicoes_abertas)
 
     def getTipoPosicaoAberta(self, ativo):
-        posicoesAbertas = self.posicoes.loc[(self.posicoes['ativo'] == ativo) & self.posicoes['precoSaida'].isna(), 'tipo']
-        return posicoesAbertas.values[0] if posicoesAbertas.size == 1 else np.nan
+        linha = self.posicoes_abertas.get(ativo)
+        return self.ledger_posicoes.valor(linha, 'tipo') if linha is not None else np.nan
 
     def getResultadoPosicaoAberta(self, ativo, precoAtual):
-        posicaoAberta = (self.posicoes['ativo'] == ativo) & self.posicoes['precoSaida'].isna()
-        if (self.posicoes.loc[posicaoAberta, 'dataEntrada'].size == 1):
-            precoEntrada = self.posicoes.loc[posicaoAberta, 'precoEntrada'].values[0]
-            volume = self.posicoes.loc[posicaoAberta, 'volume'].values[0]
-            tipo = self.posicoes.loc[posicaoAberta, 'tipo'].values[0]
+        linha = self.posicoes_abertas.get(ativo)
+        if (linha is not None):
+            precoEntrada = self.ledger_posicoes.valor(linha, 'precoEntrada')
+            volume = self.ledger_posicoes.valor(linha, 'volume')
+            tipo = self.ledger_posicoes.valor(linha, 'tipo')
             if (tipo == 'BUY'):
                 resultado = (precoAtual - precoEntrada) * volume
             else:
@@ -241,33 +308,39 @@ class TradingBook:
         return resultado
 
     def getResultadoPosicoesAbertas(self, data):
-        posicoesAbertas = self.posicoes.loc[self.posicoes['precoSaida'].isna(), ['ativo', 'volume', 'precoEntrada', 'tipo']].copy()
+        # Marcação a mercado: resultado não realizado das posições abertas no fechamento do pregão
+        return self.marcacao_mercado.resultado(self.matriz_precos, data)
 
-        # Obter os preços de fechamento na data fornecida
-        precos_fechamento = self.pregoes.loc[data, (posicoesAbertas['ativo'], 'Close')]
+    def getCapitalPosicoesAbertas(self, data):
+        return self.marcacao_mercado.capital(self.matriz_precos, data)
 
-        # Associar os preços de fechamento aos ativos da posição aberta
-        posicoesAbertas['Close'] = posicoesAbertas['ativo'].map(precos_fechamento)
+    def get_serie_marcacao_mercado(self, data_inicio=None, data_fim=None):
+        """
+        Marcação a mercado diária de todo o histórico de posições em uma única chamada.
 
-        #posicoesAbertas = posicoesAbertas.assign(Close = self.pregoes.loc[data, (posicoesAbertas['ativo'], 'Close')].values)
-        # Calcular o resultado com base no tipo de posição (BUY ou SELL)
-        posicoesAbertas['resultado'] = posicoesAbertas.apply(
-            lambda row: (row['Close'] - row['precoEntrada']) * row['volume']
-            if row['tipo'] == 'BUY'
-            else (row['precoEntrada'] - row['Close']) * row['volume'],
-            axis=1
+        Retorna:
+        pd.DataFrame: 'resultado' (não realizado) e 'capital' (valor de mercado) das posições abertas
+        no fechamento de cada pregão entre data_inicio e data_fim.
+        """
+        posicoes = self.ledger_posicoes
+        coluna_por_codigo = np.array([self.matriz_precos.coluna(ativo) for ativo in posicoes.categorias['ativo']], dtype=np.int64)
+        volume = posicoes.coluna('volume')
+        compra = posicoes.coluna('tipo') == posicoes.codigo('tipo', 'BUY')
+        return serie_marcacao_mercado(
+            self.matriz_precos,
+            coluna_por_codigo[posicoes.coluna('ativo')] if len(posicoes) > 0 else np.zeros(0, dtype=np.int64),
+            np.where(compra, volume, -volume),
+            volume,
+            posicoes.coluna('precoEntrada'),
+            posicoes.coluna('dataEntrada'),
+            posicoes.coluna('dataSaida'),
+            data_inicio,
+            data_fim
         )
-        return posicoesAbertas['resultado'].sum()
-
-    def getCapitalPosicoesAbertas(self, data):
-        posicoesAbertas = self.posicoes.loc[self.posicoes['precoSaida'].isna(), ['ativo', 'volume', 'precoEntrada']].copy().reset_index()
-        posicoesAbertas = posicoesAbertas.assign(Close = self.pregoes.loc[data, (posicoesAbertas['ativo'], 'Close')].values)
-        posicoesAbertas['capital'] = posicoesAbertas['Close'] * posicoesAbertas['volume']
-        return posicoesAbertas['capital'].sum()
 
     def getVolumeOperacao(self, preco):
-        capitalInicial = self.patrimonio['capital'].iloc[0]
-        saldoAtual = self.patrimonio['saldo'].iloc[-1] if (self.patrimonio.saldo.size > 0) else 0
+        capitalInicial = self.ledger_patrimonio.valor(0, 'capital')
+        saldoAtual = self.__ultimo_patrimonio('saldo')
         if self.reinvestir_lucros or (saldoAtual < capitalInicial):
             valorOperacao = saldoAtual / self.diversificacao_maxima
         else:
@@ -275,143 +348,101 @@ class TradingBook:
         result = 100 * int(valorOperacao / 100 / preco) if (preco > 0) else 0
         return result
 
+    def getVolumesOperacao(self, precos):
+        """Versão vetorizada de getVolumeOperacao: volume de uma entrada em cada preço, com o saldo atual."""
+        return dimensionar(precos, self.__ultimo_patrimonio('saldo'), self.ledger_patrimonio.valor(0, 'capital'),
+                           self.diversificacao_maxima, self.reinvestir_lucros)
+
     def fmtMonetario(self, valor):
         return "R$ {:,.2f}".format(valor).replace(",", "X").replace(".", ",").replace("X", ".")
 
-    def get_rentabilidade_media(self, frequencia='A'):
-        # Certificando que a coluna 'data' é do tipo datetime
-        self.patrimonio['data'] = pd.to_datetime(self.patrimonio['data'])
-
-        # Rentabilidade média conforme a frequência informada
-        capital_agrupado = self.patrimonio.set_index('data', inplace=False)['capital'].resample(frequencia).last()
-        capital_inicial_index = pd.Index([self.patrimonio.iloc[0]['data']]).infer_objects()
-        capital_inicial = pd.Series([self.patrimonio.iloc[0]['capital']], index=capital_inicial_index)
-        capital_agrupado = pd.concat([capital_inicial, capital_agrupado])
-        rentabilidade_media = pd.DataFrame(capital_agrupado, columns=['capital'])
-        rentabilidade_media['variacao'] = rentabilidade_media['capital'].pct_change()
-        rentabilidade_media.dropna(inplace=True)
+    def get_rentabilidade_media(self, frequencia='YE'):
+        # Rentabilidade média conforme a frequência informada ('YE' ano a ano, 'ME' mês a mês)
+        rentabilidade_media = rentabilidade_periodica(self.ledger_patrimonio.coluna('data'), self.ledger_patrimonio.coluna('capital'), frequencia)
         rentabilidade_media['retorno'] = rentabilidade_media['variacao'].map(lambda x: "{:.2%}".format(x))
         return rentabilidade_media
 
-    def getMetricas(self, frequencia_rentabilidade='A', taxa_livre_risco_aa=0.10):
-        capitalInicial = self.patrimonio['capital'].iloc[0]
-        # Lucro
-        lucroLiquidoFin = self.posicoes.resultado.sum()
-        lucroLiquidoPerc = self.posicoes.retorno.sum()
-        rentabilidade = (lucroLiquidoFin / capitalInicial) * 100
-        # Drawdown
-        picos = self.patrimonio['saldo'].cummax()
-        drawdownFin = (self.patrimonio['saldo'] - picos)
-        drawdownPercent = drawdownFin / picos
-        drawdownMaxFin = -drawdownFin.min()
-        drawdownMaxPercent = drawdownPercent.min() * -100
-        # Fator de recuperação
-        try:
-            if (self.reinvestir_lucros):
-                fatorRecuperacao = rentabilidade / drawdownMaxPercent
-            else:
-                fatorRecuperacao = lucroLiquidoFin / drawdownMaxFin
-        except ZeroDivisionError:
-            fatorRecuperacao = 0
-        totalPosicoes = self.posicoes.dataEntrada.count()
-        totalOperacoes = self.operacoes.data.count()
-        lucroFinPorOperacao = lucroLiquidoFin / totalPosicoes
-        lucroPercPorOperacao = lucroLiquidoPerc / totalPosicoes
-        posicoesVencedoras = self.posicoes.loc[self.posicoes['resultado'] > 0, 'dataEntrada'].count()
-        taxaAcerto = posicoesVencedoras / totalPosicoes
-        lucroMedioFin = self.posicoes.loc[self.posicoes['resultado'] > 0, 'resultado'].mean()
-        perdaMediaFin = abs(self.posicoes.loc[self.posicoes['resultado'] <= 0, 'resultado'].mean())
-        lucroMedioPerc = self.posicoes.loc[self.posicoes['retorno'] > 0, 'retorno'].mean()
-        perdaMediaPerc = abs(self.posicoes.loc[self.posicoes['retorno'] <= 0, 'retorno'].mean())
-        payoff = lucroMedioPerc / perdaMediaPerc
-        somaLucrosPerc = self.posicoes.loc[self.posicoes['retorno'] > 0, 'retorno'].sum()
-        somaPrejuizosPerc = abs(self.posicoes.loc[self.posicoes['retorno'] <= 0, 'retorno'].sum())
-        profitFactor = somaLucrosPerc / somaPrejuizosPerc
-        expectativaMatematica = (taxaAcerto * lucroMedioFin) - ((1-taxaAcerto) * perdaMediaFin)
-        expectativaMatematicaNormalizada = (payoff * taxaAcerto) - (1-taxaAcerto)
-        ultimoPregao = self.pregoes.index[-1]
-        resultadoPosicoesAbertas = self.getResultadoPosicoesAbertas(ultimoPregao)
-        capitalPosicoesAbertas = self.getCapitalPosicoesAbertas(ultimoPregao)
-        capitalAtual = self.patrimonio['capital'].iloc[-1]
-        liquidoAtual = self.patrimonio['liquido'].iloc[-1]
-        rentabilidade_media = self.get_rentabilidade_media(frequencia_rentabilidade)
+    def compute_metrics(self, frequencia_rentabilidade='YE', taxa_livre_risco_aa=0.10):
+        """
+        Métricas de desempenho do book, calculadas sobre os arrays dos registros de posições e patrimônio.
 
-        # Cálculo do Índice de Sharpe para dados diários
-        retornos_diarios = self.posicoes.groupby("dataEntrada").agg(total_retorno=("retorno", "sum")).reset_index()
-        sharpe = self.__calcular_sharpe(retornos_diarios, 'total_retorno', taxa_livre_risco_aa, freq='diária')
+        Parâmetros:
+        frequencia_rentabilidade (str): frequência do CAGR ('YE' ao ano, 'ME' ao mês).
+        taxa_livre_risco_aa (float): taxa livre de risco anual do Índice de Sharpe.
 
-        # Cálculo das maiores sequências de vitórias e derrotas
-        longest_winning_streak, longest_losing_streak = self.get_longest_streak()
+        Retorna:
+        Metricas: dicionário com as métricas apresentadas por getMetricas.
+        """
+        posicoes = self.ledger_posicoes
+        patrimonio = self.ledger_patrimonio
+        ultimoPregao = self.pregoes.index[-1]
+        return calcular_metricas(
+            posicoes.coluna('resultado'),
+            posicoes.coluna('retorno'),
+            posicoes.coluna('dataEntrada'),
+            patrimonio.coluna('data'),
+            patrimonio.coluna('saldo'),
+            patrimonio.coluna('capital'),
+            patrimonio.coluna('liquido'),
+            len(self.ledger_operacoes),
+            self.reinvestir_lucros,
+            resultado_posicoes_abertas=self.getResultadoPosicoesAbertas(ultimoPregao),
+            capital_posicoes_abertas=self.getCapitalPosicoesAbertas(ultimoPregao),
+            frequencia_rentabilidade=frequencia_rentabilidade,
+            taxa_livre_risco_aa=taxa_livre_risco_aa
+        )
+
+    def getMetricas(self, frequencia_rentabilidade='YE', taxa_livre_risco_aa=0.10):
+        m = self.compute_metrics(frequencia_rentabilidade, taxa_livre_risco_aa)
 
         # Apresentação dos resultados
         print('Ativos operados     :', self.indice_b3)
         print('Data início         :', self.data_inicio)
         print('Data fim            :', self.data_fim)
-        print('Capital inicial     :', self.fmtMonetario(capitalInicial))
+        print('Capital inicial     :', self.fmtMonetario(m['capital_inicial']))
         print('Diversificação max. :', self.diversificacao_maxima)
         print('Reinvestir lucros   :', 'Sim' if self.reinvestir_lucros else 'Não')
         print('Taxa custo bolsa    : %.3f %%' %(self.taxa_custo_operacional*100))
         print('--------------------')
-        print('Lucro líquido       :', self.fmtMonetario(lucroLiquidoFin))
-        print('Rentabilidade       : %.2f %%' %rentabilidade)
-        print('Saldo atual         :', self.fmtMonetario(capitalInicial + lucroLiquidoFin))
+        print('Lucro líquido       :', self.fmtMonetario(m['lucro_liquido_fin']))
+        print('Rentabilidade       : %.2f %%' %m['rentabilidade'])
+        print('Saldo atual         :', self.fmtMonetario(m['saldo_atual']))
         print('--------------------')
-        print('Drawdown máximo pct.: %.2f %%' %drawdownMaxPercent)
-        print('Drawdown máximo fin.:', self.fmtMonetario(drawdownMaxFin))
-        print('Fator de recuperação: %.2f' %fatorRecuperacao)
+        print('Drawdown máximo pct.: %.2f %%' %m['drawdown_max_pct'])
+        print('Drawdown máximo fin.:', self.fmtMonetario(m['drawdown_max_fin']))
+        print('Fator de recuperação: %.2f' %m['fator_recuperacao'])
         print('--------------------')
-        print('Taxa de acerto      : %.2f %%' %(taxaAcerto*100))
-        print('Fator de Lucro      : %.2f' %profitFactor)
-        print('Payoff              : %.2f' %payoff)
-        print(f"Índice de Sharpe    : {sharpe:.2f}")
+        print('Taxa de acerto      : %.2f %%' %(m['taxa_acerto']*100))
+        print('Fator de Lucro      : %.2f' %m['profit_factor'])
+        print('Payoff              : %.2f' %m['payoff'])
+        print(f"Índice de Sharpe    : {m['sharpe']:.2f}")
         print('--------------------')
-        print('Total de operações  : %d' %totalOperacoes)
-        print('Total de posições   : %d' %totalPosicoes)
-        print(f"Maior seq vitórias : {longest_winning_streak}")
-        print(f"Maior seq derrotas : {longest_losing_streak}")        
+        print('Total de operações  : %d' %m['total_operacoes'])
+        print('Total de posições   : %d' %m['total_posicoes'])
+        print(f"Maior seq vitórias : {m['maior_seq_vitorias']}")
+        print(f"Maior seq derrotas : {m['maior_seq_derrotas']}")
         print('--------------------')
-        print('Lucro médio         :', self.fmtMonetario(lucroMedioFin), '(%.2f %%)' %(lucroMedioPerc * 100))
-        print('Perda média         :', self.fmtMonetario(perdaMediaFin), '(%.2f %%)' %(perdaMediaPerc * 100))
-        print('Lucro por operação  :', self.fmtMonetario(lucroFinPorOperacao), '(%.2f %%)' %(lucroPercPorOperacao * 100))
+        print('Lucro médio         :', self.fmtMonetario(m['lucro_medio_fin']), '(%.2f %%)' %(m['lucro_medio_perc'] * 100))
+        print('Perda média         :', self.fmtMonetario(m['perda_media_fin']), '(%.2f %%)' %(m['perda_media_perc'] * 100))
+        print('Lucro por operação  :', self.fmtMonetario(m['lucro_fin_por_operacao']), '(%.2f %%)' %(m['lucro_perc_por_operacao'] * 100))
         print('--------------------')
-        print('Expect. mat.        :', self.fmtMonetario(expectativaMatematica))
-        print('Expect. mat. norm.  : %.2f' %expectativaMatematicaNormalizada)
+        print('Expect. mat.        :', self.fmtMonetario(m['expectativa_matematica']))
+        print('Expect. mat. norm.  : %.2f' %m['expectativa_matematica_normalizada'])
         print('--------------------')
-        print('Result. pos. abertas:', self.fmtMonetario(resultadoPosicoesAbertas))
-        print('Capital atual       :', self.fmtMonetario(capitalAtual))
+        print('Result. pos. abertas:', self.fmtMonetario(m['resultado_posicoes_abertas']))
+        print('Capital atual       :', self.fmtMonetario(m['capital_atual']))
         print('--------------------')
-        print('Conta corrente:     :', self.fmtMonetario(liquidoAtual))
-        print('Capital pos. abertas:', self.fmtMonetario(capitalPosicoesAbertas))
-        print(f"CAGR                : {rentabilidade_media['variacao'].mean() * 100:.2f}% {frequencia_rentabilidade}")
-        #"Rentabilidade média anual: {:.2f}%".format(rentabilidade_media['variacao'].mean() * 100)
+        print('Conta corrente:     :', self.fmtMonetario(m['liquido_atual']))
+        print('Capital pos. abertas:', self.fmtMonetario(m['capital_posicoes_abertas']))
+        print(f"CAGR                : {m['cagr'] * 100:.2f}% {frequencia_rentabilidade}")
 
     def get_longest_streak(self):
-        longest_winning_streak = 0
-        longest_losing_streak = 0
-        current_winning_streak = 0
-        current_losing_streak = 0
-
-        for retorno_value in self.posicoes['retorno']:
-            if retorno_value > 0:
-                current_winning_streak += 1
-                current_losing_streak = 0
-            elif retorno_value < 0:
-                current_losing_streak += 1
-                current_winning_streak = 0
-            else:
-                # Assuming a 0 return resets both streaks
-                current_winning_streak = 0
-                current_losing_streak = 0
-            
-            if current_winning_streak > longest_winning_streak:
-                longest_winning_streak = current_winning_streak
-            
-            if current_losing_streak > longest_losing_streak:
-                longest_losing_streak = current_losing_streak
-
-        return longest_winning_streak, longest_losing_streak
+        # Maiores sequências de vitórias e derrotas na ordem de abertura das posições
+        retornos = self.ledger_posicoes.coluna('retorno')
+        return maior_sequencia(retornos, True), maior_sequencia(retornos, False)
 
     def plotar_curva_capital(self, plot_saldo=True, plot_capital=True, plot_liquido=True):
+        from matplotlib import pyplot as plt
         datas = self.patrimonio['data']
         plt.figure(figsize=(20,10))
         if (plot_saldo):
@@ -428,9 +459,12 @@ class TradingBook:
         plt.show()
 
     def plotar_curva_capital_diario(self):
+        from matplotlib import pyplot as plt
+        capital_diario = self.capital_diario
+        filtro = self.curva_capital.filtro
         plt.figure(figsize=(20,10))
-        plt.plot(self.capital_diario.index, self.capital_diario['capital'], label='Capital Diário')
-        plt.plot(self.capital_diario.index, self.capital_diario['media_movel_5d'], label='MM5 Capital', linestyle='--')
+        plt.plot(capital_diario.index, capital_diario['capital'], label='Capital Diário')
+        plt.plot(capital_diario.index, capital_diario[filtro.nome], label=f'{filtro.nome} Capital', linestyle='--')
         plt.xlabel("Data")
         plt.ylabel("Lucro")
         plt.legend()
@@ -438,47 +472,12 @@ class TradingBook:
         plt.grid(True)  # Adicionar grade
         plt.show()
 
-    def __calcular_sharpe(self, df, coluna_retorno, taxa_livre_risco_anual, freq='diária'):
-        """
-        Calcula o Índice de Sharpe para um conjunto de retornos.
-        
-        Parâmetros:
-        df (pd.DataFrame): DataFrame contendo os retornos dos trades.
-        coluna_retorno (str): Nome da coluna no DataFrame com os retornos percentuais (exemplo: 0.02 para 2%).
-        taxa_livre_risco_anual (float): Taxa livre de risco anual (exemplo: 0.1 para 10%).
-        freq (str): Frequência dos dados ('diária', 'semanal' ou 'mensal').
-
-        Retorna:
-        float: Índice de Sharpe calculado.
-        """
-
-        # Definir o fator de ajuste para a taxa livre de risco e volatilidade
-        fatores = {'diária': 252, 'semanal': 52, 'mensal': 12}
-        if freq not in fatores:
-            raise ValueError("A frequência deve ser 'diária', 'semanal' ou 'mensal'.")
-
-        fator_ajuste = fatores[freq]
-
-        # Calcular retorno médio da estratégia (ajustado para a periodicidade)
-        retorno_medio = df[coluna_retorno].mean()
-
-        # Ajustar a taxa livre de risco para a periodicidade correspondente
-        taxa_livre_risco = taxa_livre_risco_anual / fator_ajuste
-
-        # Calcular volatilidade dos retornos (desvio padrão)
-        volatilidade = df[coluna_retorno].std()
-
-        # Calcular Índice de Sharpe
-        sharpe_ratio = (retorno_medio - taxa_livre_risco) / volatilidade
-
-        return sharpe_ratio
-
     def arredondar_casas_decimais(self, casas=2):
-        self.patrimonio["liquido"] = self.patrimonio["liquido"].astype(float).round(casas)
-        self.patrimonio["saldo"] = self.patrimonio["saldo"].astype(float).round(casas)
-        self.patrimonio["capital"] = self.patrimonio["capital"].astype(float).round(casas)
-        self.operacoes["preco"] = self.operacoes["preco"].astype(float).round(casas)
-        self.posicoes["precoEntrada"] = self.posicoes["precoEntrada"].astype(float).round(casas)
-        self.posicoes["precoSaida"] = self.posicoes["precoSaida"].astype(float).round(casas)
-        self.posicoes["forcaRelativa"] = self.posicoes["forcaRelativa"].astype(float).round(casas)
-        self.posicoes["stopLoss"] = self.posicoes["stopLoss"].astype(float).round(casas)
+        self.ledger_patrimonio.arredondar("liquido", casas)
+        self.ledger_patrimonio.arredondar("saldo", casas)
+        self.ledger_patrimonio.arredondar("capital", casas)
+        self.ledger_operacoes.arredondar("preco", casas)
+        self.ledger_posicoes.arredondar("precoEntrada", casas)
+        self.ledger_posicoes.arredondar("precoSaida", casas)
+        self.ledger_posicoes.arredondar("forcaRelativa", casas)
+        self.ledger_posicoes.arredondar("stopLoss", casas)
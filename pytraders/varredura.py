@@ -0,0 +1,146 @@
+import itertools
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from .carteira import Carteira
+from .metricas import calcular_metricas
+
+# Parâmetros de configuração repassados ao setup_backtest; os demais vão para a estratégia
+PARAMETROS_SETUP = ('capital_inicial', 'diversificacao_maxima', 'reinvestir_lucros', 'taxa_custo_operacional', 'filtrar_operacao_curva_capital', 'sma_curva_capital', 'slippage', 'filtro_curva_capital')
+SETUP_PADRAO = {'capital_inicial': 100000, 'diversificacao_maxima': 10, 'reinvestir_lucros': True, 'taxa_custo_operacional': 0.0004}
+
+# Pregoes compartilhado pelos processos da varredura (carregado uma vez por processo)
+_pregoes_processo = None
+
+
+def grade(**valores):
+    """Produto cartesiano dos valores informados: grade(slippage=[0, 0.01], diversificacao_maxima=[5, 10]) -> lista de dicionários."""
+    nomes = list(valores)
+    return [dict(zip(nomes, combinacao)) for combinacao in itertools.product(*(valores[nome] for nome in nomes))]
+
+
+def _gravar_pregoes(pregoes, diretorio):
+    # Apenas os valores numéricos vão para o arquivo; índice e colunas são pequenos e seguem por pickle
+    numericos = pregoes.select_dtypes(include=['number', 'bool'])
+    caminho = os.path.join(diretorio, 'pregoes.npy')
+    np.save(caminho, numericos.to_numpy(dtype=np.float64))
+    return caminho, numericos.index, numericos.columns
+
+
+def _carregar_pregoes(caminho, indice, colunas):
+    global _pregoes_processo
+    valores = np.load(caminho, mmap_mode='r')
+    # Sem cópia: o DataFrame aponta para as páginas do arquivo, compartilhadas entre os processos
+    _pregoes_processo = pd.DataFrame(valores, index=indice, columns=colunas, copy=False)
+
+
+def resumo_metricas(book, data_inicio=None, data_fim=None):
+    """
+    Métricas de um TradingBook (ver metricas.calcular_metricas) para comparação entre configurações.
+    Com data_inicio/data_fim, considera apenas o patrimônio do período e as posições fechadas nele,
+    tomando como capital inicial o saldo anterior ao período.
+    """
+    if data_inicio is None and data_fim is None:
+        return book.compute_metrics()
+    posicoes = book.ledger_posicoes
+    patrimonio = book.ledger_patrimonio
+    datas = patrimonio.coluna('data')
+    inicio = np.datetime64(pd.Timestamp(data_inicio), 'ns') if data_inicio is not None else datas[0]
+    fim = np.datetime64(pd.Timestamp(data_fim), 'ns') if data_fim is not None else datas[-1]
+    no_periodo = (datas >= inicio) & (datas <= fim)
+    anteriores = np.flatnonzero(datas < inicio)
+    capital_inicial = patrimonio.coluna('saldo')[anteriores[-1]] if anteriores.size else patrimonio.coluna('capital')[0]
+    saida = posicoes.coluna('dataSaida')
+    fechadas = (saida >= inicio) & (saida <= fim)
+    operacoes = book.ledger_operacoes.coluna('data')
+    marcacao = book.get_serie_marcacao_mercado(fim, fim)
+    return calcular_metricas(
+        posicoes.coluna('resultado')[fechadas],
+        posicoes.coluna('retorno')[fechadas],
+        posicoes.coluna('dataEntrada')[fechadas],
+        datas[no_periodo],
+        patrimonio.coluna('saldo')[no_periodo],
+        patrimonio.coluna('capital')[no_periodo],
+        patrimonio.coluna('liquido')[no_periodo],
+        np.count_nonzero((operacoes >= inicio) & (operacoes <= fim)),
+        book.reinvestir_lucros,
+        capital_inicial=float(capital_inicial),
+        resultado_posicoes_abertas=marcacao['resultado'].iloc[-1] if len(marcacao) else 0.0,
+        capital_posicoes_abertas=marcacao['capital'].iloc[-1] if len(marcacao) else 0.0
+    )
+
+
+def executar_configuracao(estrategia, pregoes, configuracao, indice_b3='', data_inicio=None, data_fim=None, curva_capital=False):
+    """
+    Executa uma configuração: setup_backtest com os parâmetros de PARAMETROS_SETUP e a estratégia com os demais.
+
+    Retorna:
+    tuple: (linha de métricas, saldo diário em float32 como pd.Series ou None)
+    """
+    setup = dict(SETUP_PADRAO)
+    parametros = {}
+    for nome, valor in configuracao.items():
+        (setup if nome in PARAMETROS_SETUP else parametros)[nome] = valor
+    carteira = Carteira(indice_b3, data_inicio or pregoes.index[0], data_fim or pregoes.index[-1])
+    carteira.setup_backtest(pregoes=pregoes, **setup)
+    estrategia(carteira, **parametros)
+    curva = carteira.book_execucao.capital_diario['saldo'].astype(np.float32) if curva_capital else None
+    return resumo_metricas(carteira.book_execucao), curva
+
+
+def _executar_tarefa(estrategia, configuracao, janela, indice_b3, curva_capital):
+    # A janela (linhas inicial e final) é uma fatia do pregoes compartilhado, sem cópia
+    pregoes = _pregoes_processo if janela is None else _pregoes_processo.iloc[janela[0]:janela[1]]
+    return executar_configuracao(estrategia, pregoes, configuracao, indice_b3, curva_capital=curva_capital)
+
+
+def executar_tarefas(estrategia, pregoes, tarefas, processos=None, curva_capital=False, indice_b3=''):
+    """
+    Executa tarefas (configuracao, janela) em um pool de processos que compartilham pregoes mapeado em memória.
+    A janela é uma tupla (linha inicial, linha final) de pregoes ou None para todo o período.
+
+    Retorna:
+    list: (linha de métricas, curva) de cada tarefa, na ordem recebida.
+    """
+    tarefas = list(tarefas)
+    if processos == 1:
+        return [executar_configuracao(estrategia, pregoes if janela is None else pregoes.iloc[janela[0]:janela[1]], configuracao, indice_b3, curva_capital=curva_capital) for configuracao, janela in tarefas]
+    diretorio = tempfile.mkdtemp(prefix='pytraders_varredura_')
+    try:
+        with ProcessPoolExecutor(max_workers=processos, initializer=_carregar_pregoes, initargs=_gravar_pregoes(pregoes, diretorio)) as pool:
+            futuros = [pool.submit(_executar_tarefa, estrategia, configuracao, janela, indice_b3, curva_capital) for configuracao, janela in tarefas]
+            return [futuro.result() for futuro in futuros]
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def varrer(estrategia, pregoes, configuracoes, processos=None, curva_capital=False, indice_b3=''):
+    """
+    Executa o backtest para cada configuração em um pool de processos.
+
+    Os processos compartilham uma cópia somente leitura de pregoes, gravada uma única vez em um
+    arquivo .npy temporário e mapeada em memória por cada processo (apenas colunas numéricas).
+
+    Parâmetros:
+    estrategia (callable): função de nível de módulo estrategia(carteira, **parametros) que executa o ciclo de negociação sobre a carteira já configurada.
+    pregoes (pd.DataFrame): cotações e variáveis no formato de Carteira.pregoes.
+    configuracoes (list[dict]): parâmetros de cada execução (ver grade); chaves de PARAMETROS_SETUP vão para setup_backtest.
+    processos (int): tamanho do pool. Padrão: os.cpu_count(). Com 1, executa no próprio processo.
+    curva_capital (bool): retorna também o saldo diário de cada configuração.
+    indice_b3 (str): rótulo do índice para as carteiras.
+
+    Retorna:
+    pd.DataFrame: uma linha por configuração (parâmetros e métricas), na ordem de 'configuracoes'.
+    Com curva_capital=True, retorna (resultados, curvas), com curvas indexadas pelo pregão e uma coluna por configuração.
+    """
+    configuracoes = list(configuracoes)
+    execucoes = executar_tarefas(estrategia, pregoes, [(configuracao, None) for configuracao in configuracoes], processos, curva_capital, indice_b3)
+
+    resultados = pd.concat([pd.DataFrame(configuracoes), pd.DataFrame([metricas for metricas, _ in execucoes])], axis=1)
+    if not curva_capital:
+        return resultados
+    curvas = pd.concat({i: curva for i, (_, curva) in enumerate(execucoes)}, axis=1) if execucoes else pd.DataFrame()
+    return resultados, curvas
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+from .carteira import Carteira
+from .varredura import PARAMETROS_SETUP, SETUP_PADRAO, executar_tarefas, resumo_metricas
+
+# Parâmetros de setup que podem mudar entre folds sem reiniciar os books
+PARAMETROS_AJUSTAVEIS = ('diversificacao_maxima', 'reinvestir_lucros', 'taxa_custo_operacional', 'slippage')
+
+
+class WalkForward:
+    """
+    Otimização walk-forward: em cada fold, as configurações são avaliadas na janela de treino e a
+    melhor (pelo 'criterio') é aplicada na janela de teste seguinte.
+
+    As janelas são fatias de pregoes por posição, sem cópia. Os treinos de todos os folds são
+    independentes e rodam juntos em um pool de processos (ver varredura.executar_tarefas). Os testes
+    rodam em sequência sobre uma única Carteira, de modo que posições abertas no fim de um fold
+    seguem para o próximo e o patrimônio fora da amostra é uma curva contínua.
+
+    Parâmetros:
+    estrategia (callable): função de nível de módulo estrategia(carteira, **parametros), que opera sobre carteira.pregoes.
+    pregoes (pd.DataFrame): cotações e variáveis já carregadas, no formato de Carteira.pregoes.
+    configuracoes (list[dict]): candidatas de cada fold. Entre os parâmetros de setup, só os de PARAMETROS_AJUSTAVEIS podem variar.
+    janela_treino, janela_teste (int): tamanho das janelas em pregões; os folds avançam janela_teste pregões.
+    criterio (str): coluna de resumo_metricas usada na escolha.
+    maximizar (bool): escolhe o maior (True) ou o menor valor do critério.
+    ancorado (bool): treino sempre a partir do primeiro pregão (janela crescente).
+    setup (dict): parâmetros fixos do setup_backtest (capital_inicial, filtro da curva de capital, ...).
+    processos (int): tamanho do pool dos treinos.
+    """
+
+    def __init__(self, estrategia, pregoes, configuracoes, janela_treino, janela_teste, criterio='fator_recuperacao', maximizar=True, ancorado=False, setup=None, processos=None, indice_b3=''):
+        configuracoes = list(configuracoes)
+        fixos = sorted({nome for configuracao in configuracoes for nome in configuracao if nome in PARAMETROS_SETUP and nome not in PARAMETROS_AJUSTAVEIS})
+        if fixos:
+            raise ValueError(f"Parâmetros que não podem variar entre folds devem ir em 'setup': {fixos}")
+        if janela_treino <= 0 or janela_teste <= 0:
+            raise ValueError("As janelas de treino e teste devem ter ao menos um pregão.")
+        self.estrategia = estrategia
+        self.pregoes = pregoes
+        self.configuracoes = configuracoes
+        self.janela_treino = janela_treino
+        self.janela_teste = janela_teste
+        self.criterio = criterio
+        self.maximizar = maximizar
+        self.ancorado = ancorado
+        self.setup = {**SETUP_PADRAO, **(setup or {})}
+        self.processos = processos
+        self.indice_b3 = indice_b3
+        self.resultados_treino = None
+        self.folds = None
+        self.carteira = None
+
+    def janelas(self):
+        """Lista de folds ((inicio_treino, fim_treino), (inicio_teste, fim_teste)) em linhas de pregoes, fim exclusivo."""
+        janelas = []
+        inicio_teste = self.janela_treino
+        while inicio_teste < len(self.pregoes):
+            fim_teste = min(inicio_teste + self.janela_teste, len(self.pregoes))
+            inicio_treino = 0 if self.ancorado else inicio_teste - self.janela_treino
+            janelas.append(((inicio_treino, inicio_teste), (inicio_teste, fim_teste)))
+            inicio_teste = fim_teste
+        return janelas
+
+    def __escolher(self, resultados):
+        valores = resultados[self.criterio].to_numpy(dtype=np.float64)
+        if np.isnan(valores).all():
+            return 0
+        return int(np.nanargmax(valores) if self.maximizar else np.nanargmin(valores))
+
+    def executar(self):
+        """Executa treinos e testes; preenche resultados_treino, folds e carteira e retorna o próprio objeto."""
+        janelas = self.janelas()
+        if not janelas:
+            raise ValueError("Pregões insuficientes para ao menos um fold.")
+
+        # Treinos: todas as combinações (fold, configuração) em um único pool
+        tarefas = [({**self.setup, **configuracao}, treino) for treino, _ in janelas for configuracao in self.configuracoes]
+        execucoes = executar_tarefas(self.estrategia, self.pregoes, tarefas, self.processos, indice_b3=self.indice_b3)
+        resultados = pd.DataFrame([metricas for metricas, _ in execucoes])
+        resultados.insert(0, 'fold', np.repeat(np.arange(len(janelas)), len(self.configuracoes)))
+        resultados.insert(1, 'configuracao', np.tile(np.arange(len(self.configuracoes)), len(janelas)))
+        self.resultados_treino = resultados
+
+        # Testes: uma carteira contínua sobre todo o período fora da amostra
+        inicio_oos, fim_oos = janelas[0][1][0], janelas[-1][1][1]
+        pregoes_oos = self.pregoes.iloc[inicio_oos:fim_oos]
+        carteira = Carteira(self.indice_b3, pregoes_oos.index[0], pregoes_oos.index[-1])
+        carteira.setup_backtest(pregoes=pregoes_oos, **self.setup)
+        books = {id(book): book for book in (carteira.book_execucao, carteira.book_referencia)}.values()
+
+        folds = []
+        for fold, (treino, teste) in enumerate(janelas):
+            escolhida = self.__escolher(resultados[resultados['fold'] == fold])
+            parametros = {}
+            for nome, valor in self.configuracoes[escolhida].items():
+                if nome in PARAMETROS_AJUSTAVEIS:
+                    for book in books:
+                        setattr(book, nome, valor)
+                else:
+                    parametros[nome] = valor
+            carteira.pregoes = self.pregoes.iloc[teste[0]:teste[1]]
+            self.estrategia(carteira, **parametros)
+            data_inicio, data_fim = self.pregoes.index[teste[0]], self.pregoes.index[teste[1] - 1]
+            folds.append({
+                'fold': fold,
+                'inicio_treino': self.pregoes.index[treino[0]],
+                'fim_treino': self.pregoes.index[treino[1] - 1],
+                'inicio_teste': data_inicio,
+                'fim_teste': data_fim,
+                'configuracao': escolhida,
+                **self.configuracoes[escolhida],
+                f'{self.criterio}_treino': resultados.at[fold * len(self.configuracoes) + escolhida, self.criterio],
+                **resumo_metricas(carteira.book_execucao, data_inicio, data_fim),
+            })
+        # A carteira volta a enxergar todo o período fora da amostra
+        carteira.pregoes = pregoes_oos
+        self.carteira = carteira
+        self.folds = pd.DataFrame(folds)
+        return self
+
+    @property
+    def curva(self):
+        """Curva de capital diária fora da amostra, contínua entre os folds."""
+        return self.carteira.book_execucao.capital_diario
+
+    @property
+    def patrimonio(self):
+        return self.carteira.book_execucao.patrimonio
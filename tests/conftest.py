@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pytraders.carteira import Carteira
+from pytraders.mercado_sintetico import gerar_cotacoes, montar_pregoes
+
+# Cotações sintéticas (sem rede) com as variáveis de um rompimento de canal Donchian, como no README
+
+
+@pytest.fixture(scope='session')
+def pregoes():
+    cotacoes = gerar_cotacoes(20, 320, semente=3, falhas=0.01)
+    novas = {}
+    for ativo in cotacoes.columns.get_level_values('Ticker').unique():
+        novas[(ativo, 'fechamento_ontem')] = cotacoes[('Close', ativo)].shift(1)
+        novas[(ativo, 'dcHighOntem')] = cotacoes[('High', ativo)].rolling(15).max().shift(1)
+        novas[(ativo, 'dcLowOntem')] = cotacoes[('Low', ativo)].rolling(8).min().shift(1)
+    pregoes = montar_pregoes(cotacoes)
+    return pregoes.join(pd.DataFrame(novas, index=pregoes.index))
+
+
+def nova_carteira(pregoes, filtrar_operacao_curva_capital=False):
+    carteira = Carteira('SINT', pregoes.index[0], pregoes.index[-1])
+    carteira.setup_backtest(100000, 6, True, 0.0004, pregoes, filtrar_operacao_curva_capital=filtrar_operacao_curva_capital, sma_curva_capital=7)
+    return carteira
+
+
+def executar_ciclo(carteira, pendentes=False):
+    """Ciclo de negociação do README sobre os pregões (ou apenas os pendentes) da carteira."""
+    codigos = list(carteira.cubo.ativos)
+    for pregao, dia in carteira.iterar_pregoes(pendentes=pendentes):
+        for ativo in codigos:
+            cotacao = dia[ativo]
+            fechamento = cotacao.Close
+            if np.isnan(fechamento) or np.isnan(cotacao.fechamento_ontem) or np.isnan(cotacao.dcHighOntem):
+                continue
+            if carteira.temPosicaoAberta(ativo):
+                stop = carteira.getStopLossPosicaoAberta(ativo)
+                if cotacao.Low <= stop:
+                    carteira.fecharPosicao(pregao, ativo, min(stop, cotacao.Open))
+                elif fechamento < cotacao.dcLowOntem:
+                    carteira.fecharPosicao(pregao, ativo, fechamento)
+            if not carteira.temPosicaoAberta(ativo) and fechamento > cotacao.dcHighOntem and cotacao.fechamento_ontem < cotacao.dcHighOntem:
+                volume = carteira.getVolumeOperacao(fechamento)
+                if volume > 0 and carteira.temSaldoLiquido(volume * fechamento) and carteira.getQuantidadePosicoesAbertas() < 6:
+                    carteira.abrirPosicao(pregao, ativo, 'BUY', volume, fechamento, fechamento / cotacao.fechamento_ontem, cotacao.dcLowOntem)
+        carteira.atualizar_patrimonio_resultado_posicoes_abertas(pregao)
+
+
+def assert_carteiras_iguais(esperada, obtida):
+    for nome in ('book_execucao', 'book_referencia'):
+        a, b = getattr(esperada, nome), getattr(obtida, nome)
+        for registro in ('patrimonio', 'posicoes', 'operacoes', 'capital_diario'):
+            pd.testing.assert_frame_equal(getattr(a, registro), getattr(b, registro))
+        assert a.compute_metrics() == b.compute_metrics()
@@ -0,0 +1,96 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import assert_carteiras_iguais, nova_carteira
+
+
+def sinais(pregoes, tipo):
+    campo = lambda nome: pregoes.xs(nome, axis=1, level=1)
+    fechamento = campo('Close')
+    rompe_maxima = fechamento > campo('dcHighOntem')
+    rompe_minima = fechamento < campo('dcLowOntem')
+    entradas, saidas = (rompe_maxima, rompe_minima) if tipo == 'BUY' else (rompe_minima, rompe_maxima)
+    return entradas, saidas, campo('dcLowOntem'), fechamento / campo('fechamento_ontem')
+
+
+def ciclo_eventos(carteira, entradas, saidas, stop_loss, prioridade, tipo):
+    """Ciclo orientado a eventos descrito na docstring de executar_sinais."""
+    pregoes = carteira.pregoes
+    for pregao in pregoes.index:
+        ordem = entradas.columns if prioridade is None else prioridade.loc[pregao].sort_values(ascending=False, kind='stable').index
+        for ativo in ordem:
+            preco = pregoes.at[pregao, (ativo, 'Close')]
+            if math.isnan(preco) or preco <= 0:
+                continue
+            if carteira.temPosicaoAberta(ativo) and saidas.at[pregao, ativo]:
+                carteira.fecharPosicao(pregao, ativo, preco)
+            if not carteira.temPosicaoAberta(ativo) and entradas.at[pregao, ativo]:
+                volume = carteira.getVolumeOperacao(preco)
+                if volume > 0 and carteira.temSaldoLiquido(volume * preco) and carteira.getQuantidadePosicoesAbertas() < 6:
+                    forca_relativa = prioridade.at[pregao, ativo] if prioridade is not None else np.nan
+                    carteira.abrirPosicao(pregao, ativo, tipo, volume, preco, forca_relativa, stop_loss.at[pregao, ativo], np.nan)
+        carteira.atualizar_patrimonio_resultado_posicoes_abertas(pregao)
+
+
+@pytest.mark.parametrize('tipo', ['BUY', 'SELL'])
+@pytest.mark.parametrize('usar_prioridade', [False, True])
+@pytest.mark.parametrize('filtrar_operacao_curva_capital', [False, True])
+def test_sinais_iguais_ao_ciclo_de_eventos(pregoes, filtrar_operacao_curva_capital, usar_prioridade, tipo):
+    entradas, saidas, stop_loss, prioridade = sinais(pregoes, tipo)
+    prioridade = prioridade if usar_prioridade else None
+
+    esperada = nova_carteira(pregoes, filtrar_operacao_curva_capital)
+    ciclo_eventos(esperada, entradas, saidas, stop_loss, prioridade, tipo)
+    obtida = nova_carteira(pregoes, filtrar_operacao_curva_capital)
+    obtida.executar_sinais(entradas, saidas, stop_loss=stop_loss, prioridade=prioridade, tipo=tipo)
+
+    assert len(obtida.book_execucao.posicoes) > 0
+    assert_carteiras_iguais(esperada, obtida)
+
+
+@pytest.mark.parametrize('filtrar_operacao_curva_capital', [False, True])
+def test_patrimonio_consolidado_mantem_operacoes(pregoes, filtrar_operacao_curva_capital):
+    entradas, saidas, stop_loss, prioridade = sinais(pregoes, 'BUY')
+    detalhada = nova_carteira(pregoes, filtrar_operacao_curva_capital)
+    detalhada.executar_sinais(entradas, saidas, stop_loss=stop_loss, prioridade=prioridade)
+    consolidada = nova_carteira(pregoes, filtrar_operacao_curva_capital)
+    consolidada.executar_sinais(entradas, saidas, stop_loss=stop_loss, prioridade=prioridade, consolidar_patrimonio=True)
+
+    for nome in ('book_referencia', 'book_execucao'):
+        esperado, obtido = getattr(detalhada, nome), getattr(consolidada, nome)
+        pd.testing.assert_frame_equal(esperado.posicoes, obtido.posicoes)
+        pd.testing.assert_frame_equal(esperado.operacoes, obtido.operacoes)
+        pd.testing.assert_frame_equal(esperado.capital_diario, obtido.capital_diario)
+        # Além do registro inicial, um único registro de patrimônio por pregão, igual ao último da execução detalhada
+        assert len(obtido.patrimonio) == len(pregoes) + 1
+        ultimo = lambda patrimonio: patrimonio.groupby(patrimonio['data'].dt.normalize()).tail(1).reset_index(drop=True)
+        pd.testing.assert_frame_equal(ultimo(esperado.patrimonio), ultimo(obtido.patrimonio))
+
+
+def test_alocar_entradas_igual_a_visita_sequencial(pregoes):
+    entradas, saidas, stop_loss, prioridade = sinais(pregoes, 'BUY')
+    sequencial = nova_carteira(pregoes)
+    alocada = nova_carteira(pregoes)
+    for pregao in pregoes.index:
+        candidatos = entradas.columns[entradas.loc[pregao].to_numpy()]
+        pontuacao = prioridade.loc[pregao, candidatos].dropna()
+        precos = pregoes.loc[pregao].xs('Close', level=1)
+        for carteira in (sequencial, alocada):
+            for ativo in entradas.columns[saidas.loc[pregao].to_numpy()]:
+                if carteira.temPosicaoAberta(ativo):
+                    carteira.fecharPosicao(pregao, ativo, precos[ativo])
+        for ativo in pontuacao.sort_values(ascending=False, kind='stable').index:
+            if sequencial.temPosicaoAberta(ativo):
+                continue
+            preco = precos[ativo]
+            volume = sequencial.getVolumeOperacao(preco)
+            if volume > 0 and sequencial.temSaldoLiquido(volume * preco) and sequencial.getQuantidadePosicoesAbertas() < 6:
+                sequencial.abrirPosicao(pregao, ativo, 'BUY', volume, preco, pontuacao[ativo], stop_loss.at[pregao, ativo], np.nan)
+        livres = [ativo for ativo in pontuacao.index if not alocada.temPosicaoAberta(ativo)]
+        alocada.alocar_entradas(pregao, pontuacao[livres], precos, stop_loss=stop_loss.loc[pregao])
+        for carteira in (sequencial, alocada):
+            carteira.atualizar_patrimonio_resultado_posicoes_abertas(pregao)
+
+    assert len(alocada.book_execucao.posicoes) > 0
+    assert_carteiras_iguais(sequencial, alocada)
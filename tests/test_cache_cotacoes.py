@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from pytraders.cache_cotacoes import CAMPOS_COTACAO, CacheCotacoes, ProvedorCotacoes, ProvedorCSV
+from pytraders.mercado_sintetico import ProvedorSintetico
+
+
+class ProvedorRegistrado(ProvedorSintetico):
+    """Provedor sintético que registra as requisições e pode omitir ativos nas primeiras chamadas."""
+
+    def __init__(self, omitir=(), falhas_omissao=1):
+        super().__init__(semente=1)
+        self.requisicoes = []
+        self.omitir = set(omitir)
+        self.falhas_omissao = falhas_omissao
+
+    def baixar(self, tickers, inicio, fim, intervalo='1d', ajustado=True):
+        self.requisicoes.append((tuple(tickers), inicio, fim))
+        resultado = super().baixar(tickers, inicio, fim, intervalo, ajustado)
+        if self.falhas_omissao > 0:
+            self.falhas_omissao -= 1
+            for ticker in self.omitir:
+                resultado.pop(ticker, None)
+        return resultado
+
+
+def test_busca_apenas_trechos_ausentes(tmp_path):
+    provedor = ProvedorRegistrado()
+    cache = CacheCotacoes(str(tmp_path), provedor)
+    primeira = cache.carregar(['AAA', 'BBB'], '2015-01-01', '2016-01-01')
+    estendida = cache.carregar(['AAA', 'BBB'], '2015-06-01', '2017-01-01')
+    assert provedor.requisicoes == [
+        (('AAA', 'BBB'), '2015-01-01', '2016-01-01'),
+        (('AAA', 'BBB'), '2016-01-01', '2017-01-01'),
+    ]
+    # Período já coberto: nenhuma nova requisição
+    repetida = cache.carregar(['AAA', 'BBB'], '2015-06-01', '2017-01-01')
+    assert len(provedor.requisicoes) == 2
+    pd.testing.assert_frame_equal(estendida, repetida)
+    sobreposicao = primeira.loc['2015-06-01':]
+    pd.testing.assert_frame_equal(sobreposicao, estendida.loc[:sobreposicao.index[-1]], check_freq=False)
+
+
+def test_cache_persistente_entre_instancias(tmp_path):
+    provedor = ProvedorRegistrado()
+    esperado = CacheCotacoes(str(tmp_path), provedor).carregar(['AAA'], '2015-01-01', '2016-01-01')
+    obtido = CacheCotacoes(str(tmp_path), provedor).carregar(['AAA'], '2015-01-01', '2016-01-01')
+    assert len(provedor.requisicoes) == 1
+    pd.testing.assert_frame_equal(esperado, obtido)
+
+
+def test_download_falho_nao_e_marcado_como_coberto(tmp_path):
+    provedor = ProvedorRegistrado(omitir={'XXX'})
+    cache = CacheCotacoes(str(tmp_path), provedor)
+    primeira = cache.carregar(['XXX', 'YYY'], '2024-01-01', '2024-02-01')
+    assert primeira[('Close', 'XXX')].isna().all()
+    assert 'XXX' not in cache.indice
+    segunda = cache.carregar(['XXX', 'YYY'], '2024-01-01', '2024-02-01')
+    # Apenas o ativo que falhou é buscado novamente
+    assert provedor.requisicoes[-1] == (('XXX',), '2024-01-01', '2024-02-01')
+    assert segunda[('Close', 'XXX')].notna().any()
+
+
+def test_carregar_sem_dados_retorna_frame_vazio(tmp_path):
+    class ProvedorVazio(ProvedorCotacoes):
+        def baixar(self, tickers, inicio, fim, intervalo='1d', ajustado=True):
+            return {}
+
+    cotacoes = CacheCotacoes(str(tmp_path), ProvedorVazio()).carregar(['ZZZZ3', 'WWWW4'], '2024-01-01', '2024-02-01')
+    assert cotacoes.shape == (0, 2 * len(CAMPOS_COTACAO))
+    assert list(cotacoes.columns.names) == ['Price', 'Ticker']
+
+
+def test_provedor_csv(tmp_path):
+    datas = pd.bdate_range('2020-01-01', periods=30)
+    valores = np.arange(30, dtype=np.float64) + 10
+    pd.DataFrame({'Open': valores, 'High': valores + 1, 'Low': valores - 1, 'Close': valores + 0.5, 'Volume': 1000.0},
+                 index=pd.Index(datas, name='Date')).to_csv(tmp_path / 'ABCD3.csv')
+    cache = CacheCotacoes(str(tmp_path / 'cache'), ProvedorCSV(str(tmp_path)))
+    cotacoes = cache.carregar(['ABCD3'], '2020-01-10', '2020-02-01')
+    assert cotacoes.index[0] == pd.Timestamp('2020-01-10')
+    assert cotacoes.index[-1] < pd.Timestamp('2020-02-01')
+    np.testing.assert_array_equal(cotacoes[('Close', 'ABCD3')].to_numpy(), valores[(datas >= '2020-01-10') & (datas < '2020-02-01')] + 0.5)
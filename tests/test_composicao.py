@@ -0,0 +1,149 @@
+import os
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import nova_carteira
+from pytraders.composicao import CacheComposicao, CarregadorComposicao, ProvedorComposicao, ProvedorComposicaoDiretorio, mascara_composicao, vigente
+
+
+def gravar_arquivo_b3(diretorio, indice, data, codigos):
+    """Arquivo no formato do download da B3: '<INDICE>Dia_<dd-mm-aa>.csv'."""
+    caminho = os.path.join(diretorio, f'{indice}Dia_{data:%d-%m-%y}.csv')
+    with open(caminho, 'w', encoding='ISO-8859-1') as arquivo:
+        arquivo.write(f'{indice} - Carteira do Dia\nSetor;Código;Ação;Tipo;Qtde. Teórica;Part. (%)\n')
+        for codigo in codigos:
+            arquivo.write(f'Setor;{codigo};ACAO;ON;1.000;1,0\n')
+        arquivo.write('Quantidade Teórica Total;;;;1.000;\nRedutor;;;;1,0;\n')
+    return caminho
+
+
+class ProvedorIndisponivel(ProvedorComposicao):
+    def __init__(self):
+        self.chamadas = 0
+
+    def obter(self, indice):
+        self.chamadas += 1
+        raise ConnectionError('sem rede')
+
+
+@pytest.fixture
+def diretorios(tmp_path):
+    for nome in ('cache', 'b3', 'historico'):
+        (tmp_path / nome).mkdir()
+    return {nome: str(tmp_path / nome) for nome in ('cache', 'b3', 'historico')}
+
+
+def test_arquivo_de_hoje_e_a_versao_atual(diretorios):
+    gravar_arquivo_b3(diretorios['b3'], 'IBOV', date.today(), ['PETR4', 'VALE3'])
+    cache = CacheComposicao(diretorios['cache'])
+    composicao = CarregadorComposicao(cache, [ProvedorComposicaoDiretorio(diretorios['b3'])]).carregar('IBOV')
+    assert composicao['Código'].tolist() == ['PETR4', 'VALE3']
+    assert cache.atual('IBOV') == cache.caminho('IBOV', date.today())
+    # Versão atual em cache: os provedores não são consultados
+    provedor = ProvedorIndisponivel()
+    assert CarregadorComposicao(cache, [provedor]).carregar('IBOV')['Código'].tolist() == ['PETR4', 'VALE3']
+    assert provedor.chamadas == 0
+
+
+def test_versao_vencida_nao_e_atual_mesmo_recem_gravada(diretorios):
+    cache = CacheComposicao(diretorios['cache'])
+    cache.gravar('IBOV', gravar_arquivo_b3(diretorios['b3'], 'IBOV', date.today() - timedelta(days=10), ['PETR4']))
+    assert cache.atual('IBOV') is None
+
+
+@pytest.mark.parametrize('hoje, atual', [
+    (date(2026, 10, 16), True),   # sexta-feira
+    (date(2026, 10, 18), True),   # domingo
+    (date(2026, 10, 19), True),   # segunda-feira
+    (date(2026, 10, 20), False),  # terça-feira
+])
+def test_composicao_de_sexta_vale_ate_segunda(hoje, atual):
+    assert vigente(date(2026, 10, 16), hoje=hoje) is atual
+    assert not vigente(date(2026, 10, 15), hoje=date(2026, 10, 19))
+
+
+def test_cache_e_diretorio_seguem_a_mesma_validade(diretorios):
+    # Composição do pregão anterior: o diretório a aceita e o cache a considera atual, sem nova cópia
+    anterior = np.busday_offset(date.today(), -1, roll='forward').astype(object)
+    gravar_arquivo_b3(diretorios['b3'], 'IBOV', anterior, ['PETR4'])
+    cache = CacheComposicao(diretorios['cache'])
+    assert CarregadorComposicao(cache, [ProvedorComposicaoDiretorio(diretorios['b3'])]).carregar('IBOV')['Código'].tolist() == ['PETR4']
+    assert cache.atual('IBOV') == cache.caminho('IBOV', anterior)
+    modificacao = os.path.getmtime(cache.caminho('IBOV', anterior))
+    provedor = ProvedorIndisponivel()
+    assert CarregadorComposicao(cache, [provedor]).carregar('IBOV')['Código'].tolist() == ['PETR4']
+    assert provedor.chamadas == 0
+    assert os.path.getmtime(cache.caminho('IBOV', anterior)) == modificacao
+
+
+def test_provedores_indisponiveis_recorrem_a_versao_vencida(diretorios):
+    cache = CacheComposicao(diretorios['cache'])
+    cache.gravar('IBOV', gravar_arquivo_b3(diretorios['b3'], 'IBOV', date(2020, 1, 2), ['PETR4']))
+    provedor = ProvedorIndisponivel()
+    assert CarregadorComposicao(cache, [provedor]).carregar('IBOV')['Código'].tolist() == ['PETR4']
+    assert provedor.chamadas == 1
+
+
+def test_sem_nenhuma_versao_levanta_erro(diretorios):
+    carregador = CarregadorComposicao(CacheComposicao(diretorios['cache']), [ProvedorIndisponivel()])
+    with pytest.raises(FileNotFoundError):
+        carregador.carregar('IBOV')
+
+
+def test_importar_historico_nao_torna_versao_atual(diretorios):
+    gravar_arquivo_b3(diretorios['historico'], 'IBOV', date(2020, 1, 2), ['OIBR3'])
+    gravar_arquivo_b3(diretorios['historico'], 'IBOV', date(2021, 1, 4), ['PETR4'])
+    gravar_arquivo_b3(diretorios['b3'], 'IBOV', date.today(), ['VALE3'])
+    cache = CacheComposicao(diretorios['cache'])
+    assert cache.importar('IBOV', diretorios['historico']) == [date(2020, 1, 2), date(2021, 1, 4)]
+    assert cache.atual('IBOV') is None
+    # A composição atual vem do provedor, não do arquivo histórico mais recente
+    assert CarregadorComposicao(cache, [ProvedorComposicaoDiretorio(diretorios['b3'])]).carregar('IBOV')['Código'].tolist() == ['VALE3']
+
+
+def test_importar_novamente_nao_regrava_versoes(diretorios):
+    gravar_arquivo_b3(diretorios['historico'], 'IBOV', date(2020, 1, 2), ['OIBR3'])
+    cache = CacheComposicao(diretorios['cache'])
+    cache.importar('IBOV', diretorios['historico'])
+    caminho = cache.caminho('IBOV', date(2020, 1, 2))
+    os.utime(caminho, (0, 0))
+    cache.importar('IBOV', diretorios['historico'])
+    assert os.path.getmtime(caminho) == 0
+
+
+def test_historico_e_mascara_de_composicao(diretorios):
+    versoes = {date(2020, 1, 2): ['AAAA3', 'BBBB3'], date(2020, 3, 2): ['BBBB3', 'CCCC3']}
+    for data, codigos in versoes.items():
+        gravar_arquivo_b3(diretorios['historico'], 'SMLL', data, codigos)
+    carregador = CarregadorComposicao(CacheComposicao(diretorios['cache']), [ProvedorIndisponivel()])
+    composicoes = carregador.historico('SMLL', diretorios['historico'])
+    assert sorted(composicoes) == [pd.Timestamp(data) for data in versoes]
+
+    datas = pd.DatetimeIndex(['2019-12-30', '2020-01-02', '2020-02-28', '2020-03-02', '2020-06-01'])
+    mascara = mascara_composicao(composicoes, datas)
+    esperado = pd.DataFrame({
+        'AAAA3': [True, True, True, False, False],
+        'BBBB3': [True, True, True, True, True],
+        'CCCC3': [False, False, False, True, True],
+    }, index=datas)
+    pd.testing.assert_frame_equal(mascara[esperado.columns], esperado, check_names=False)
+    # Sem a composição anterior à primeira versão, os pregões anteriores ficam fora do universo
+    assert not mascara_composicao(composicoes, datas, antes_primeira=False).iloc[0].any()
+
+
+def test_entradas_restritas_ao_universo(pregoes):
+    fechamento = pregoes.xs('Close', axis=1, level=1)
+    entradas = fechamento > pregoes.xs('dcHighOntem', axis=1, level=1)
+    saidas = fechamento < pregoes.xs('dcLowOntem', axis=1, level=1)
+    ativos = list(fechamento.columns)
+    meio = pregoes.index[len(pregoes) // 2]
+    composicoes = {pregoes.index[0]: pd.DataFrame({'Código': ativos[:10]}), meio: pd.DataFrame({'Código': ativos[5:15]})}
+    universo = mascara_composicao(composicoes, pregoes.index)
+
+    carteira = nova_carteira(pregoes)
+    carteira.executar_sinais(entradas, saidas, universo=universo)
+    posicoes = carteira.book_execucao.posicoes
+    assert len(posicoes) > 0
+    membros = np.array([universo.at[data, ativo] for data, ativo in zip(posicoes['dataEntrada'], posicoes['ativo'])])
+    assert membros.all()
@@ -0,0 +1,27 @@
+import pandas as pd
+from pytraders.mercado_sintetico import ProvedorSintetico, gerar_cotacoes
+
+
+def test_serie_curta_e_inicio_da_longa():
+    curta = gerar_cotacoes(5, 40, semente=11, falhas=0.05)
+    longa = gerar_cotacoes(5, 300, semente=11, falhas=0.05)
+    pd.testing.assert_frame_equal(curta, longa.iloc[:40])
+
+
+def test_consultas_sobrepostas_coincidem():
+    provedor = ProvedorSintetico(semente=2, falhas=0.02)
+    curta = provedor.baixar(['AAAA3', 'BBBB4'], '2020-01-01', '2020-03-01')
+    longa = provedor.baixar(['AAAA3', 'BBBB4'], '2020-02-01', '2020-06-01')
+    for ticker in ('AAAA3', 'BBBB4'):
+        comuns = curta[ticker].index.intersection(longa[ticker].index)
+        assert len(comuns) > 0
+        pd.testing.assert_frame_equal(curta[ticker].loc[comuns], longa[ticker].loc[comuns], check_freq=False)
+        assert longa[ticker].index.max() > curta[ticker].index.max()
+
+
+def test_cotacoes_coerentes():
+    cotacoes = gerar_cotacoes(8, 500, semente=4)
+    assert not cotacoes.isna().any().any()
+    for campo in ('Open', 'Close'):
+        assert (cotacoes['Low'] <= cotacoes[campo]).all().all()
+        assert (cotacoes[campo] <= cotacoes['High']).all().all()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from conftest import assert_carteiras_iguais, executar_ciclo, nova_carteira
+
+
+@pytest.mark.parametrize('filtrar_operacao_curva_capital', [False, True])
+def test_ciclo_em_partes_igual_ao_continuo(pregoes, filtrar_operacao_curva_capital):
+    continua = nova_carteira(pregoes, filtrar_operacao_curva_capital)
+    executar_ciclo(continua)
+    assert len(continua.book_execucao.posicoes) > 0
+
+    incremental = nova_carteira(pregoes.iloc[:150], filtrar_operacao_curva_capital)
+    executar_ciclo(incremental, pendentes=True)
+    # Trechos com sobreposição: pregões já existentes são ignorados
+    for fim in (151, 240, len(pregoes)):
+        incremental.anexar_pregoes(pregoes.iloc[100:fim])
+        executar_ciclo(incremental, pendentes=True)
+    assert incremental.ultimo_pregao_processado == pregoes.index[-1]
+    assert_carteiras_iguais(continua, incremental)
+
+
+@pytest.mark.parametrize('filtrar_operacao_curva_capital', [False, True])
+def test_sinais_em_partes_igual_ao_continuo(pregoes, filtrar_operacao_curva_capital):
+    fechamento = pregoes.xs('Close', axis=1, level=1)
+    entradas = fechamento > pregoes.xs('dcHighOntem', axis=1, level=1)
+    saidas = fechamento < pregoes.xs('dcLowOntem', axis=1, level=1)
+
+    continua = nova_carteira(pregoes, filtrar_operacao_curva_capital)
+    continua.executar_sinais(entradas, saidas)
+    assert len(continua.book_execucao.posicoes) > 0
+    incremental = nova_carteira(pregoes.iloc[:170], filtrar_operacao_curva_capital)
+    incremental.executar_sinais(entradas, saidas, pendentes=True)
+    incremental.anexar_pregoes(pregoes.iloc[170:])
+    assert len(incremental.pregoes_pendentes()) == len(pregoes) - 170
+    incremental.executar_sinais(entradas, saidas, pendentes=True)
+    assert_carteiras_iguais(continua, incremental)
+
+
+def test_anexar_ativo_novo_mantem_colunas(pregoes):
+    novo = pregoes.columns.get_level_values(0)[-1]
+    carteira = nova_carteira(pregoes.iloc[:150].drop(columns=[novo], level=0))
+    matriz = carteira.book_execucao.matriz_precos
+    colunas = dict(matriz.ativos)
+    carteira.anexar_pregoes(pregoes.iloc[150:])
+    # A matriz é estendida, não recriada, e as colunas já atribuídas não mudam
+    assert carteira.book_execucao.matriz_precos is matriz
+    assert {ativo: matriz.ativos[ativo] for ativo in colunas} == colunas
+    np.testing.assert_array_equal(carteira.cubo.campo('Close')[150:, carteira.cubo.ativos[novo]], pregoes[(novo, 'Close')].iloc[150:].to_numpy())
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import assert_carteiras_iguais, executar_ciclo, nova_carteira
+from pytraders.carteira import Carteira
+from pytraders.snapshot import carregar_snapshot, salvar_snapshot
+
+
+@pytest.mark.parametrize('filtrar_operacao_curva_capital', [False, True])
+def test_snapshot_e_retomada_igual_ao_continuo(pregoes, tmp_path, filtrar_operacao_curva_capital):
+    continua = nova_carteira(pregoes, filtrar_operacao_curva_capital)
+    executar_ciclo(continua)
+
+    parcial = nova_carteira(pregoes.iloc[:160], filtrar_operacao_curva_capital)
+    executar_ciclo(parcial)
+    parcial.salvar_snapshot(str(tmp_path))
+
+    restaurada = Carteira.carregar_snapshot(str(tmp_path), pregoes=pregoes.iloc[:160])
+    assert (restaurada.book_referencia is restaurada.book_execucao) == (not filtrar_operacao_curva_capital)
+    assert restaurada.book_referencia.matriz_precos is restaurada.book_execucao.matriz_precos
+    assert restaurada.ultimo_pregao_processado == parcial.ultimo_pregao_processado
+    assert_carteiras_iguais(parcial, restaurada)
+
+    restaurada.anexar_pregoes(pregoes)
+    executar_ciclo(restaurada, pendentes=True)
+    assert_carteiras_iguais(continua, restaurada)
+
+
+def test_snapshot_sem_pregoes_mantem_registros(pregoes, tmp_path):
+    carteira = nova_carteira(pregoes)
+    executar_ciclo(carteira)
+    carteira.salvar_snapshot(str(tmp_path))
+    restaurada = Carteira.carregar_snapshot(str(tmp_path))
+    for registro in ('patrimonio', 'posicoes', 'operacoes', 'capital_diario'):
+        pd.testing.assert_frame_equal(getattr(carteira.book_execucao, registro), getattr(restaurada.book_execucao, registro))
+
+
+def test_alteracoes_nao_atingem_o_snapshot(pregoes, tmp_path):
+    carteira = nova_carteira(pregoes)
+    executar_ciclo(carteira)
+    book = carteira.book_execucao
+    salvar_snapshot(book, str(tmp_path))
+    gravado = np.load(tmp_path / 'book.ledger_posicoes.precoEntrada.npy').copy()
+
+    # Arrays mapeados em cópia na escrita: arredondar o book restaurado não altera os arquivos
+    restaurado = carregar_snapshot(str(tmp_path), pregoes=pregoes)
+    restaurado.arredondar_casas_decimais(0)
+    np.testing.assert_array_equal(np.load(tmp_path / 'book.ledger_posicoes.precoEntrada.npy'), gravado)
+    assert restaurado.getResultadoPosicoesAbertas(pregoes.index[-1]) == pytest.approx(book.getResultadoPosicoesAbertas(pregoes.index[-1]))
+
+
+def test_book_em_lote_nao_e_gravado(pregoes, tmp_path):
+    carteira = nova_carteira(pregoes)
+    with pytest.raises(RuntimeError):
+        with carteira.lote():
+            carteira.salvar_snapshot(str(tmp_path))
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+from conftest import executar_ciclo, nova_carteira
+
+
+def test_registros_retornam_copias(pregoes):
+    carteira = nova_carteira(pregoes)
+    executar_ciclo(carteira)
+    book = carteira.book_execucao
+    for registro in ('patrimonio', 'posicoes', 'operacoes'):
+        original = getattr(book, registro).copy()
+        getattr(book, registro).drop(original.index, inplace=True)
+        pd.testing.assert_frame_equal(getattr(book, registro), original)
+        with pytest.raises(AttributeError):
+            setattr(book, registro, original)
+
+
+def test_edicao_de_coluna_nao_altera_o_registro(pregoes):
+    carteira = nova_carteira(pregoes)
+    executar_ciclo(carteira)
+    book = carteira.book_execucao
+    saldo = book.patrimonio['saldo'].to_numpy().copy()
+    patrimonio = book.patrimonio
+    patrimonio['saldo'] *= 0
+    patrimonio.loc[0, 'capital'] = -1
+    assert (book.patrimonio['saldo'].to_numpy() == saldo).all()
+    assert book.patrimonio.loc[0, 'capital'] != -1